@@ -0,0 +1,62 @@
+"""
+Benchmark CompiledDocumentCleaner against DocumentCleaner.
+
+Checks that both produce the same text for every cleaning step on a document and reports the time
+taken by each.
+
+Usage:
+    python -m analysis.doc_cleaner_benchmark [path/to/document.pdf] [--repeat 3]
+"""
+import argparse
+import time
+
+from pypdf import PdfReader
+
+from rag.nlp.doc_cleaner import CompiledDocumentCleaner, DocumentCleaner
+
+DEFAULT_DOCUMENT = "./documents/JUKNIS SPMB JATIM 2025_sign/JUKNIS SPMB JATIM 2025_sign.pdf"
+STEPS = (
+    "normalize_unicode",
+    "remove_headers_footers",
+    "preserve_important_patterns",
+    "clean_special_characters",
+    "normalize_indonesian_text",
+    "minimal_clean",
+)
+
+
+def load_text(path: str) -> str:
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def bench(cleaner: DocumentCleaner, step: str, text: str, repeat: int) -> tuple[str, float]:
+    method = getattr(cleaner, step)
+    result = ""
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = method(text)
+        best = min(best, time.perf_counter() - started_at)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=DEFAULT_DOCUMENT, help="PDF document to clean")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = load_text(args.path)
+    print(f"Document: {args.path} ({len(text)} characters)")
+
+    reference, candidate = DocumentCleaner(), CompiledDocumentCleaner()
+    for step in STEPS:
+        expected, reference_seconds = bench(reference, step, text, args.repeat)
+        actual, candidate_seconds = bench(candidate, step, text, args.repeat)
+        print(f"{step:<28} {reference_seconds:8.3f}s -> {candidate_seconds:8.3f}s  "
+              f"x{reference_seconds / candidate_seconds:5.1f}  identical: {expected == actual}")
+
+
+if __name__ == "__main__":
+    main()
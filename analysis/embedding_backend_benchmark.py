@@ -0,0 +1,99 @@
+"""
+Compare the ONNX Runtime embedding backend against PyTorch on a corpus.
+
+The corpus is one or more PDF or text documents, chunked like the ingestion pipeline. Every chunk
+is embedded by the PyTorch model, the float32 ONNX model and the int8 ONNX model. Reports the cosine
+similarity of the ONNX vectors to the PyTorch ones and the throughput of each backend. Exits with
+status 1 when the lowest similarity of an ONNX model is below --min-cosine.
+
+Usage:
+    python -m analysis.embedding_backend_benchmark [path/to/document.pdf ...] [--model Default]
+        [--onnx-dir files/onnx] [--min-cosine 0.98] [--limit 512] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from rag.embedding.embedding_factory import MODELS
+from rag.embedding.onnx_embedding import MODEL_FILE, QUANTIZED_MODEL_FILE, OnnxEmbedding
+from rag.nlp.doc_chunking import TokenAwareChunker
+
+DEFAULT_DOCUMENT = "./documents/JUKNIS SPMB JATIM 2025_sign/JUKNIS SPMB JATIM 2025_sign.pdf"
+
+
+def load_text(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def bench(model, texts: list, batch_size: int, repeat: int) -> tuple[np.ndarray, float]:
+    # Warm up once so the first allocations are not measured
+    model.encode_queries(texts[:batch_size])
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        vectors = np.concatenate([np.asarray(model.encode_queries(texts[start:start + batch_size]))
+                                  for start in range(0, len(texts), batch_size)])
+        best = min(best, time.perf_counter() - started_at)
+    return vectors.astype(np.float32), best
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DOCUMENT], help="PDF or text documents")
+    parser.add_argument("--model", default="Default", choices=sorted(MODELS))
+    parser.add_argument("--onnx-dir", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--limit", type=int, default=512, help="Maximum number of chunks")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunker = TokenAwareChunker()
+    texts = [chunk for path in args.paths for chunk in chunker.chunk_text(load_text(path))][:args.limit]
+    if not texts:
+        sys.exit("The corpus has no text")
+    print(f"Corpus: {len(texts)} chunks, {sum(len(text) for text in texts)} characters")
+
+    model_dir = os.path.join(args.onnx_dir, args.model)
+    backends = {"torch": MODELS[args.model].builder()}
+    for name, quantized, file_name in (("onnx-fp32", False, MODEL_FILE), ("onnx-int8", True, QUANTIZED_MODEL_FILE)):
+        if os.path.exists(os.path.join(model_dir, file_name)):
+            backends[name] = OnnxEmbedding(model_dir, quantized=quantized, batch_size=args.batch_size)
+        else:
+            print(f"Skipping {name}: no {file_name} in {model_dir}, see analysis.onnx_export")
+    if len(backends) == 1:
+        sys.exit("No exported ONNX model to compare")
+
+    results = {}
+    for name, model in backends.items():
+        vectors, seconds = bench(model, texts, args.batch_size, args.repeat)
+        results[name] = vectors
+        print(f"{name:<10} {seconds:8.3f}s  {len(texts) / seconds:10.1f} texts/sec")
+
+    failed = False
+    reference = results.pop("torch")
+    for name, vectors in results.items():
+        similarities = cosine(reference, vectors)
+        print(f"{name:<10} cosine to torch: min {similarities.min():.5f}, mean {similarities.mean():.5f}, "
+              f"below {args.min_cosine}: {(similarities < args.min_cosine).sum()}/{len(texts)}")
+        failed = failed or similarities.min() < args.min_cosine
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
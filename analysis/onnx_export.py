@@ -0,0 +1,33 @@
+"""
+Export embedding models to ONNX for the onnx embedding backend, with an int8 quantized copy.
+
+Each model is written to a subdirectory named after it, the layout EMBEDDING_ONNX_DIR expects.
+
+Usage:
+    python -m analysis.onnx_export [Default LinqAI ...] [--output-dir files/onnx] [--no-quantize]
+"""
+import argparse
+import json
+import os
+
+from app.core.config import settings
+from rag.embedding.embedding_factory import MODELS
+from rag.embedding.onnx_embedding import export_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", default=["Default"], choices=sorted(MODELS), help="Model names")
+    parser.add_argument("--output-dir", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="Only export the float32 model")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    for model_name in args.models:
+        output_dir = os.path.join(args.output_dir, model_name)
+        config = export_onnx(MODELS[model_name].source, output_dir, quantize=not args.no_quantize, opset=args.opset)
+        print(f"{model_name}: {output_dir}\n{json.dumps(config, indent=2)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the regex tokenizer backend of DocumentCleaner against the NLTK backend on a golden corpus.
+
+The corpus is one or more PDF or text documents, cleaned with minimal_clean as in standard_clean.
+Reports sentence boundary agreement, word token agreement, identical smart_stopword_removal output
+and the time taken by each backend. Exits with status 1 when the stopword removal agreement is below
+--min-agreement.
+
+Usage:
+    python -m analysis.tokenizer_parity [path/to/document.pdf ...] [--min-agreement 0.95]
+"""
+import argparse
+import sys
+import time
+
+from rag.nlp.doc_cleaner import CompiledDocumentCleaner
+from rag.nlp.tokenizers import NLTKTokenizer, RegexTokenizer
+
+DEFAULT_DOCUMENT = "./documents/JUKNIS SPMB JATIM 2025_sign/JUKNIS SPMB JATIM 2025_sign.pdf"
+
+
+def load_pages(path: str) -> list:
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        return [page.extract_text() or "" for page in PdfReader(path).pages]
+    with open(path, encoding="utf-8") as f:
+        return f.read().split("\f")
+
+
+def timed(function, texts: list) -> tuple[list, float]:
+    started_at = time.perf_counter()
+    results = [function(text) for text in texts]
+    return results, time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DOCUMENT], help="PDF or text documents")
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    reference = CompiledDocumentCleaner(tokenizer=NLTKTokenizer())
+    candidate = CompiledDocumentCleaner(tokenizer=RegexTokenizer())
+
+    texts = [reference.minimal_clean(page) for path in args.paths for page in load_pages(path)]
+    texts = [text for text in texts if text]
+    if not texts:
+        sys.exit("The corpus has no text")
+    print(f"Corpus: {len(texts)} pages, {sum(len(text) for text in texts)} characters")
+
+    reference_sentences = [reference.tokenizer.sent_tokenize(text) for text in texts]
+    candidate_sentences = [candidate.tokenizer.sent_tokenize(text) for text in texts]
+    same_sentences = sum(a == b for a, b in zip(reference_sentences, candidate_sentences))
+    print(f"Sentence boundaries identical: {same_sentences}/{len(texts)} pages")
+
+    sentences = [sentence.lower() for page in reference_sentences for sentence in page]
+    same_words = sum(
+        reference.tokenizer.word_tokenize(sentence) == candidate.tokenizer.word_tokenize(sentence)
+        for sentence in sentences
+    )
+    print(f"Word tokens identical:         {same_words}/{len(sentences)} sentences")
+
+    expected, reference_seconds = timed(reference.smart_stopword_removal, texts)
+    actual, candidate_seconds = timed(candidate.smart_stopword_removal, texts)
+    agreement = sum(a == b for a, b in zip(expected, actual)) / len(texts)
+    print(f"Stopword removal identical:    {agreement:.1%} of pages")
+    print(f"Time: nltk {reference_seconds:.3f}s, regex {candidate_seconds:.3f}s "
+          f"(x{reference_seconds / candidate_seconds:.1f})")
+
+    if agreement < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Report recall@k against bytes per stored vector for truncated vectors on the evaluation set.
+
+The corpus is one or more PDF or text documents, chunked like the ingestion pipeline, and the
+queries are the questions of the evaluation set. For every number of kept dimensions, the top k
+chunks of each question are searched among the truncated vectors with the truncated question vector,
+as collections with vector_dimensions are queried. Recall@k is measured against the exact top k of
+the full vectors. Bytes are those Chroma stores, float32 components.
+
+Usage:
+    python -m analysis.vector_compression_report [path/to/document.pdf ...] [--k 10]
+        [--questions evaluation/rag_evaluation_results.csv] [--dimensions 768 512 256 128]
+        [--csv report.csv]
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from app.core.config import settings
+from rag.embedding.embedding_factory import MODELS
+from rag.embedding.vector_codec import VectorCodec
+from rag.nlp.doc_chunking import TokenAwareChunker
+
+DEFAULT_DOCUMENT = "./documents/JUKNIS SPMB JATIM 2025_sign/JUKNIS SPMB JATIM 2025_sign.pdf"
+DEFAULT_QUESTIONS = "./evaluation/rag_evaluation_results.csv"
+
+
+def load_text(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def load_questions(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [row["question"] for row in csv.DictReader(f) if row.get("question")]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def top_k(queries: np.ndarray, documents: np.ndarray, k: int) -> np.ndarray:
+    # Exact cosine search, the rows of the result are sorted by decreasing similarity
+    scores = normalize(queries) @ normalize(documents).T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def recall(found: np.ndarray, reference: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, reference)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DOCUMENT], help="PDF or text documents")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="CSV with a question column")
+    parser.add_argument("--model", default="Default", choices=sorted(MODELS))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimensions", type=int, nargs="*", default=[768, 512, 384, 256, 128, 64])
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--csv", help="Also write the report to this CSV file")
+    args = parser.parse_args()
+
+    chunker = TokenAwareChunker()
+    texts = [chunk for path in args.paths for chunk in chunker.chunk_text(load_text(path))]
+    questions = load_questions(args.questions)
+    if len(texts) < args.k or not questions:
+        sys.exit(f"Need at least {args.k} chunks and one question")
+    print(f"Corpus: {len(texts)} chunks, {len(questions)} questions, recall@{args.k}")
+
+    model = MODELS[args.model].builder()
+    documents = np.concatenate([np.asarray(model.encode_queries(texts[start:start + args.batch_size]),
+                                           dtype=np.float32) for start in range(0, len(texts), args.batch_size)])
+    queries = np.asarray(model.encode_queries(questions), dtype=np.float32)
+    model_dimensions = documents.shape[1]
+    reference = top_k(queries, documents, args.k)
+    full_bytes = VectorCodec().bytes_per_vector(model_dimensions)
+
+    rows = []
+    print(f"{'dimensions':>10} {'bytes':>6} {'ratio':>6} {'recall':>8}")
+    for dimensions in sorted({min(dimensions, model_dimensions) for dimensions in args.dimensions}, reverse=True):
+        codec = VectorCodec(dimensions)
+        row = {
+            "dimensions": dimensions,
+            "bytes_per_vector": codec.bytes_per_vector(model_dimensions),
+            "recall": recall(top_k(codec.compact(queries), codec.compact(documents), args.k), reference),
+        }
+        row["compression"] = round(full_bytes / row["bytes_per_vector"], 2)
+        rows.append(row)
+        print(f"{dimensions:>10} {row['bytes_per_vector']:>6} {row['compression']:>5}x {row['recall']:>8.3f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@ from fastapi import APIRouter, Depends
 
 from app.core.container import Container
 from app.core.middleware import inject
+from app.pipeline.collection_reindexer import CollectionReindexer
 from app.schema.base_schema import BaseResponse, PaginatedResponse
 from app.schema.collection_schema import FindCollection, CreateCollectionRequest, BaseCollection, ListCollection
 from app.services.collection_service import CollectionsService
+from app.services.files_service import FilesService
+from app.services.ingestion_jobs_service import IngestionJobsService
 
 router = APIRouter(prefix="/collection", tags=["collection"])
 
@@ -53,6 +56,62 @@ def get_collection(
     )
 
 
+@router.post("/{collection_name}/rebuild", tags=["post"])
+@inject
+def rebuild_collection(
+        collection_name: str,
+        reembed: bool = False,
+        service: CollectionsService = Depends(Provide[Container.collection_service]),
+        files_service: FilesService = Depends(Provide[Container.files_service]),
+        ingestion_service: IngestionJobsService = Depends(Provide[Container.ingestion_jobs_service])):
+    """
+    Re-chunk the files of a collection from their stored artifacts, re-embedding every chunk if asked
+    """
+    collection = service.get_by_name(collection_name)
+    files = files_service.prepare_rebuild(collection.id, reembed=reembed)
+    for file in files:
+        ingestion_service.enqueue(file)
+
+    return BaseResponse(
+        message="Collection rebuild queued successfully",
+        data={"files": len(files), "reembed": reembed}
+    )
+
+
+@router.post("/{collection_name}/reindex", tags=["post"])
+@inject
+def reindex_collection(
+        collection_name: str,
+        service: CollectionsService = Depends(Provide[Container.collection_service]),
+        reindexer: CollectionReindexer = Depends(Provide[Container.collection_reindexer])):
+    """
+    Re-index a collection into a shadow collection and swap to it once complete, queries keep being served
+    """
+    collection = service.get_by_name(collection_name)
+
+    return BaseResponse(
+        message="Collection re-index started successfully",
+        data=reindexer.start(collection.id)
+    )
+
+
+@router.get("/{collection_name}/reindex", tags=["get"])
+@inject
+def reindex_status(
+        collection_name: str,
+        service: CollectionsService = Depends(Provide[Container.collection_service]),
+        reindexer: CollectionReindexer = Depends(Provide[Container.collection_reindexer])):
+    """
+    Get the state of the last re-index of a collection
+    """
+    collection = service.get_by_name(collection_name)
+
+    return BaseResponse(
+        message="Collection re-index state retrieved successfully",
+        data=reindexer.status(collection.id) or {"state": "idle", "shadow_name": collection.shadow_name}
+    )
+
+
 @router.delete("/{collection_name}", tags=["delete"])
 @inject
 def delete_collection(
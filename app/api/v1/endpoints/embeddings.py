@@ -0,0 +1,84 @@
+from typing import Optional
+
+from dependency_injector.wiring import Provide
+from fastapi import APIRouter, Depends
+
+from app.core.container import Container
+from app.core.middleware import inject
+from app.schema.base_schema import BaseResponse
+from rag.embedding.embedding_cache import EmbeddingCache
+from rag.embedding.embedding_factory import EmbeddingFactory
+
+router = APIRouter(prefix="/embeddings", tags=["embeddings"])
+
+
+@router.get("/cache", tags=["get"])
+@inject
+def cache_stats(
+        cache: Optional[EmbeddingCache] = Depends(Provide[Container.embedding_cache])
+):
+    """
+    Get the hit, miss and eviction counters of the embedding cache in this process
+    """
+    return BaseResponse(
+        message="Embedding cache stats retrieved successfully",
+        data=cache.stats() if cache is not None else {"enabled": False}
+    )
+
+
+@router.delete("/cache", tags=["delete"])
+@inject
+def clear_cache(
+        cache: Optional[EmbeddingCache] = Depends(Provide[Container.embedding_cache])
+):
+    """
+    Drop every cached embedding, e.g. after changing the weights behind a model name
+    """
+    if cache is not None:
+        cache.clear()
+    return BaseResponse(
+        message="Embedding cache cleared successfully",
+        data=None
+    )
+
+
+@router.get("/scheduler", tags=["get"])
+@inject
+def scheduler_stats(
+        factory: EmbeddingFactory = Depends(Provide[Container.embedding_factory])
+):
+    """
+    Get the batch sizes and queueing time of the embedding schedulers in this process
+    """
+    return BaseResponse(
+        message="Embedding scheduler stats retrieved successfully",
+        data=factory.scheduler_stats()
+    )
+
+
+@router.get("/models", tags=["get"])
+@inject
+def models(
+        factory: EmbeddingFactory = Depends(Provide[Container.embedding_factory])
+):
+    """
+    Get which embedding models are loaded in this process and the memory they take against the budget
+    """
+    return BaseResponse(
+        message="Embedding models retrieved successfully",
+        data=factory.models()
+    )
+
+
+@router.get("/pools", tags=["get"])
+@inject
+def pool_stats(
+        factory: EmbeddingFactory = Depends(Provide[Container.embedding_factory])
+):
+    """
+    Get the throughput of the embedding pools open in this process, e.g. during a re-index
+    """
+    return BaseResponse(
+        message="Embedding pool stats retrieved successfully",
+        data=factory.pool_stats()
+    )
@@ -1,14 +1,20 @@
 import uuid
+from typing import Optional
 
 from dependency_injector.wiring import Provide
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
 
 from app.core.container import Container
 from app.core.middleware import inject
-from app.pipeline.pipeline_service import PipelineService
+from app.pipeline.staged_pipeline import StagedPipeline
+from app.pipeline.vector_purger import VectorPurger
 from app.schema.base_schema import BaseResponse
-from app.schema.file_schema import FindFiles, CreateFileRequest, ResponseFiles
+from app.schema.file_schema import FindFiles, CreateFileRequest, ResponseFiles, UpdateFileRequest, \
+    InitiateUploadRequest, ResponseFileUpload
+from app.services.file_uploads_service import FileUploadsService
 from app.services.files_service import FilesService
+from app.services.ingestion_jobs_service import IngestionJobsService
 
 router = APIRouter(prefix="/files", tags=["files"])
 
@@ -25,42 +31,245 @@ def index(
     return service.get_list(query)
 
 
+@router.get("/stats", tags=["get"])
+@inject
+def stats(
+        collection_id: Optional[uuid.UUID] = None,
+        service: FilesService = Depends(Provide[Container.files_service])
+):
+    """
+    Get the ingestion time and throughput of each pipeline stage, aggregated over the completed files
+    """
+    return BaseResponse(
+        message="File stats retrieved successfully",
+        data=service.get_stats(collection_id)
+    )
+
+
+@router.get("/pipeline", tags=["get"])
+@inject
+def pipeline_stats(
+        staged_pipeline: StagedPipeline = Depends(Provide[Container.staged_pipeline])
+):
+    """
+    Get the queue depth and busy workers of each stage of the staged ingestion pipeline in this process
+    """
+    return BaseResponse(
+        message="Pipeline stats retrieved successfully",
+        data=staged_pipeline.stats()
+    )
+
+
+@router.post("/purge", tags=["post"])
+@inject
+def purge(
+        vector_purger: VectorPurger = Depends(Provide[Container.vector_purger])
+):
+    """
+    Delete the chunks of files that no longer exist or were deleted, and report how many were reclaimed
+    """
+    return BaseResponse(
+        message="Orphaned chunks purged successfully",
+        data=vector_purger.purge()
+    )
+
+
 # Create a new file
 @router.post("", tags=["post"], response_model=BaseResponse[ResponseFiles])
 @inject
 def create(
-        background_tasks: BackgroundTasks,
         payload: CreateFileRequest = Depends(),
         service: FilesService = Depends(Provide[Container.files_service]),
-        pipeline_service: PipelineService = Depends(Provide[Container.pipeline_service])
+        ingestion_service: IngestionJobsService = Depends(Provide[Container.ingestion_jobs_service])
 ):
     """
     Create a new file
     """
+    # Reject the upload early when the ingestion queue is full
+    ingestion_service.ensure_capacity()
     response = service.create(payload)
 
-    # Add the file to the pipeline
-    background_tasks.add_task(
-        pipeline_service.run_pipeline,
-        files=response
+    # Add the file to the ingestion queue, duplicates are already completed
+    if response.status != "completed":
+        ingestion_service.enqueue(response)
+
+    return BaseResponse(
+        message="File created successfully",
+        data=response
     )
 
+
+# Start a resumable upload
+@router.post("/uploads", tags=["post"], response_model=BaseResponse[ResponseFileUpload])
+@inject
+def initiate_upload(
+        payload: InitiateUploadRequest,
+        service: FileUploadsService = Depends(Provide[Container.file_uploads_service]),
+        ingestion_service: IngestionJobsService = Depends(Provide[Container.ingestion_jobs_service])
+):
+    """
+    Start a resumable upload, the content is sent afterwards in byte ranges
+    """
+    ingestion_service.ensure_capacity()
+    response = service.initiate(payload)
+
+    return BaseResponse(
+        message="Upload initiated successfully",
+        data=response
+    )
+
+
+@router.put("/uploads/{upload_id}", tags=["put"], response_model=BaseResponse[ResponseFileUpload])
+@inject
+async def upload_range(
+        upload_id: uuid.UUID,
+        request: Request,
+        content_range: str = Header(...),
+        service: FileUploadsService = Depends(Provide[Container.file_uploads_service])
+):
+    """
+    Upload a byte range of a resumable upload, the Content-Range header gives its position
+    """
+    response = await service.write_range(upload_id, content_range, request.stream())
+
+    return BaseResponse(
+        message="Range uploaded successfully",
+        data=response
+    )
+
+
+@router.get("/uploads/{upload_id}", tags=["get"], response_model=BaseResponse[ResponseFileUpload])
+@inject
+def get_upload(
+        upload_id: uuid.UUID,
+        service: FileUploadsService = Depends(Provide[Container.file_uploads_service])
+):
+    """
+    Get the state of a resumable upload, received_bytes is the offset to resume from
+    """
+    return BaseResponse(
+        message="Upload retrieved successfully",
+        data=service.get_by_id(upload_id)
+    )
+
+
+@router.post("/uploads/{upload_id}/finalize", tags=["post"], response_model=BaseResponse[ResponseFiles])
+@inject
+async def finalize_upload(
+        upload_id: uuid.UUID,
+        service: FileUploadsService = Depends(Provide[Container.file_uploads_service]),
+        ingestion_service: IngestionJobsService = Depends(Provide[Container.ingestion_jobs_service])
+):
+    """
+    Finish a resumable upload, create the file and queue it for ingestion
+    """
+    await run_in_threadpool(ingestion_service.ensure_capacity)
+    response = await service.finalize(upload_id)
+
+    if response.status != "completed":
+        await run_in_threadpool(ingestion_service.enqueue, response)
+
     return BaseResponse(
         message="File created successfully",
         data=response
     )
 
 
-@router.delete("/{file_id}", tags=["delete"])
+@router.delete("/uploads/{upload_id}", tags=["delete"], response_model=BaseResponse[ResponseFileUpload])
+@inject
+def abort_upload(
+        upload_id: uuid.UUID,
+        service: FileUploadsService = Depends(Provide[Container.file_uploads_service])
+):
+    """
+    Abort a resumable upload and discard the received data
+    """
+    return BaseResponse(
+        message="Upload aborted successfully",
+        data=service.abort(upload_id)
+    )
+
+
+# Upload a revised version of a file
+@router.put("/{file_id}", tags=["put"], response_model=BaseResponse[ResponseFiles])
+@inject
+def update(
+        file_id: uuid.UUID,
+        payload: UpdateFileRequest = Depends(),
+        service: FilesService = Depends(Provide[Container.files_service]),
+        ingestion_service: IngestionJobsService = Depends(Provide[Container.ingestion_jobs_service])
+):
+    """
+    Replace the content of a file and re-ingest the chunks that changed
+    """
+    ingestion_service.ensure_capacity()
+    response = service.replace_content(file_id, payload)
+
+    ingestion_service.enqueue(response)
+
+    return BaseResponse(
+        message="File updated successfully",
+        data=response
+    )
+
+
+@router.post("/{file_id}/archive", tags=["post"], response_model=BaseResponse[ResponseFiles])
+@inject
+def archive(
+        file_id: uuid.UUID,
+        service: FilesService = Depends(Provide[Container.files_service])
+):
+    """
+    Move the chunks of a file out of its collection into cold storage
+    """
+    response = service.archive(file_id)
+
+    return BaseResponse(
+        message="File archived successfully",
+        data=response
+    )
+
+
+@router.post("/{file_id}/restore", tags=["post"], response_model=BaseResponse[ResponseFiles])
+@inject
+def restore(
+        file_id: uuid.UUID,
+        service: FilesService = Depends(Provide[Container.files_service]),
+        ingestion_service: IngestionJobsService = Depends(Provide[Container.ingestion_jobs_service])
+):
+    """
+    Bring the chunks of an archived file back into its collection, or re-embed them when the collection
+    is now embedded otherwise
+    """
+    response = service.restore(file_id)
+    if response.status == "pending":
+        ingestion_service.enqueue(response)
+        return BaseResponse(
+            message="File rebuild queued successfully",
+            data=response
+        )
+
+    return BaseResponse(
+        message="File restored successfully",
+        data=response
+    )
+
+
+@router.delete("/{file_id}", tags=["delete"], response_model=BaseResponse[ResponseFiles])
 @inject
 def delete(
         file_id: uuid.UUID,
         service: FilesService = Depends(Provide[Container.files_service])
 ):
     """
-    Delete a file
+    Delete a file and its chunks
     """
-    return service.remove_by_id(file_id)
+    response = service.delete(file_id)
+
+    return BaseResponse(
+        message="File deleted successfully",
+        data=response
+    )
 
 
 @router.get("/{file_id}", tags=["get"])
@@ -75,6 +75,74 @@ class Settings(BaseSettings):
             path=f"{self.POSTGRES_DB}",
         )
 
+    # Resumable uploads, uploads without a new range for UPLOAD_TTL_SECONDS are aborted by a sweep
+    # every UPLOAD_SWEEP_INTERVAL_SECONDS, the sweep is disabled with an interval of 0
+    UPLOAD_MAX_SIZE: int = 1024 * 1024 * 1024
+    UPLOAD_TTL_SECONDS: int = 24 * 3600
+    UPLOAD_SWEEP_INTERVAL_SECONDS: int = 3600
+
+    # Ingestion pipeline
+    PIPELINE_UPSERT_BATCH_SIZE: int = 128
+    EMBEDDING_BATCH_SIZE: int = 32
+    # Concurrent embedding calls are batched up to this many texts, 0 disables the scheduler
+    EMBEDDING_SCHEDULER_MAX_BATCH_SIZE: int = 64
+    EMBEDDING_SCHEDULER_MAX_WAIT_MS: float = 5
+    # Total memory the loaded embedding models may take, idle models are evicted to make room, 0 for no budget
+    EMBEDDING_MEMORY_BUDGET_MB: int = 0
+    # Unload embedding models unused for this long, 0 keeps them loaded
+    EMBEDDING_MODEL_IDLE_SECONDS: float = 0
+    # Embedding models loaded in the background at startup
+    EMBEDDING_WARMUP_MODELS: list[str] = ["Default"]
+    # "onnx" runs the models exported with analysis.onnx_export on ONNX Runtime, from one subdirectory per model
+    EMBEDDING_BACKEND: Literal["torch", "onnx"] = "torch"
+    EMBEDDING_ONNX_DIR: str = os.path.join(FILE_PATH, "onnx")
+    EMBEDDING_ONNX_QUANTIZED: bool = True
+    PDF_EXTRACT_WORKERS: int = os.cpu_count() or 1
+    PDF_EXTRACT_MIN_PAGES: int = 32
+    PDF_EXTRACT_PAGES_PER_TASK: int = 16
+    # Split every page on its own, with the overlap carried over, so a revised file keeps the chunks of unchanged pages
+    PIPELINE_ANCHOR_PAGES: bool = True
+    PIPELINE_CLEAN_LEVEL: Literal["none", "minimal", "standard", "aggressive"] = "standard"
+    CLEANER_TOKENIZER: Literal["regex", "nltk"] = "regex"
+    CLEANER_WORKERS: int = os.cpu_count() or 1
+    CLEANER_BATCH_PAGES: int = 64
+
+    # Staged ingestion pipeline, number of workers of each stage and size of the queues between them
+    PIPELINE_STAGED: bool = True
+    PIPELINE_EXTRACT_WORKERS: int = 2
+    PIPELINE_CLEAN_WORKERS: int = 2
+    PIPELINE_CHUNK_WORKERS: int = 2
+    PIPELINE_EMBED_WORKERS: int = 1
+    PIPELINE_UPSERT_WORKERS: int = 2
+    PIPELINE_STAGE_QUEUE_SIZE: int = 8
+
+    # Ingestion job queue and workers
+    INGESTION_WORKERS: int = 2
+    INGESTION_WORKER_MODE: Literal["thread", "process"] = "thread"
+    INGESTION_MAX_QUEUED_JOBS: int = 100
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_LEASE_SECONDS: int = 300
+    INGESTION_RETRY_BACKOFF_SECONDS: float = 30
+    INGESTION_POLL_INTERVAL_SECONDS: float = 2
+    INGESTION_RETRY_AFTER_SECONDS: int = 30
+
+    # Deleting chunks of removed files, the purge of orphaned chunks is disabled with an interval of 0
+    VECTOR_DELETE_BATCH_SIZE: int = 1000
+    VECTOR_PURGE_INTERVAL_SECONDS: int = 3600
+
+    # Seconds the previous Chroma collection is kept after a re-index swapped it out
+    REINDEX_GC_DELAY_SECONDS: int = 300
+    # Re-indexes embed in a pool of spawned processes, each loading the model, 0 embeds in the re-index thread
+    REINDEX_EMBEDDING_PROCESSES: int = 0
+    # Threads of each embedding process, 0 shares the cores between them
+    REINDEX_EMBEDDING_THREADS: int = 0
+
+    # Embedding cache: vectors kept in memory per process, and in a SQLite database shared on the node
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_SIZE: int = 50000
+    EMBEDDING_CACHE_PATH: str = os.path.join(FILE_PATH, "cache", "embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_DISK_ENTRIES: int = 2000000
+
 
 load_env()
 settings = Settings()  # type: ignore
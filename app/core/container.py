@@ -3,15 +3,26 @@ from dependency_injector import containers, providers
 from agents.augment_query_generated import AugmentQueryGenerated
 from app.core.config import settings
 from app.core.database import Database
+from app.pipeline.collection_reindexer import CollectionReindexer
+from app.pipeline.ingestion_worker import IngestionWorkerPool
 from app.pipeline.pipeline_service import PipelineService
+from app.pipeline.staged_pipeline import StagedPipeline
+from app.pipeline.upload_sweeper import UploadSweeper
+from app.pipeline.vector_purger import VectorPurger
 from app.repositories import CollectionsRepository
+from app.repositories.file_uploads_repository import FileUploadsRepository
 from app.repositories.files_repository import FilesRepository
+from app.repositories.ingestion_jobs_repository import IngestionJobsRepository
 from app.repositories.questions_repository import QuestionsRepository
 from app.services.collection_service import CollectionsService
+from app.services.file_uploads_service import FileUploadsService
 from app.services.files_service import FilesService
+from app.services.ingestion_jobs_service import IngestionJobsService
 from app.services.question_service import QuestionsService
 from rag.chroma.client import ChromaDBHttpClient
+from rag.embedding.embedding_cache import EmbeddingCache
 from rag.embedding.embedding_factory import EmbeddingFactory
+from rag.embedding.local_embedding_function import LocalEmbeddingFunction
 
 
 class Container(containers.DeclarativeContainer):
@@ -20,17 +31,34 @@ class Container(containers.DeclarativeContainer):
             "app.api.v1.endpoints.questions",
             "app.api.v1.endpoints.collections",
             "app.api.v1.endpoints.files",
+            "app.api.v1.endpoints.embeddings",
             "app.core.dependencies",
         ]
     )
+    embedding_cache = providers.Singleton(
+        EmbeddingCache,
+        capacity=settings.EMBEDDING_CACHE_SIZE,
+        path=settings.EMBEDDING_CACHE_PATH or None,
+        max_disk_entries=settings.EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+    ) if settings.EMBEDDING_CACHE_ENABLED else providers.Object(None)
     embedding_factory = providers.Singleton(
         EmbeddingFactory,
+        cache=embedding_cache,
+        max_batch_size=settings.EMBEDDING_SCHEDULER_MAX_BATCH_SIZE,
+        max_wait_ms=settings.EMBEDDING_SCHEDULER_MAX_WAIT_MS,
+        memory_budget_mb=settings.EMBEDDING_MEMORY_BUDGET_MB,
+        idle_seconds=settings.EMBEDDING_MODEL_IDLE_SECONDS,
+        backend=settings.EMBEDDING_BACKEND,
+        onnx_dir=settings.EMBEDDING_ONNX_DIR,
+        onnx_quantized=settings.EMBEDDING_ONNX_QUANTIZED,
     )
     embedding_model = providers.ThreadSafeSingleton(
         lambda factory: factory.get("Default"),
         embedding_factory,
     )
-    chromadb_client = providers.Singleton(ChromaDBHttpClient, host='localhost', port=9000)
+    embedding_function = providers.Singleton(LocalEmbeddingFunction, factory=embedding_factory, model_name="Default")
+    chromadb_client = providers.Singleton(ChromaDBHttpClient, host='localhost', port=9000,
+                                          embedding_function=embedding_function)
     db = providers.Singleton(Database, db_url=str(settings.SQLALCHEMY_DATABASE_URI))
     augment_query_generator = providers.Singleton(AugmentQueryGenerated, api_key=str(settings.OPENAI_API_KEY))
 
@@ -38,14 +66,63 @@ class Container(containers.DeclarativeContainer):
     collections_repository = providers.Factory(CollectionsRepository, session_factory=db.provided.session)
     files_repository = providers.Factory(FilesRepository, session_factory=db.provided.session)
     questions_repository = providers.Factory(QuestionsRepository, session_factory=db.provided.session)
+    ingestion_jobs_repository = providers.Factory(IngestionJobsRepository, session_factory=db.provided.session)
+    file_uploads_repository = providers.Factory(FileUploadsRepository, session_factory=db.provided.session)
 
     # Service layer
     pipeline_service = providers.Factory(PipelineService, files_repository=files_repository,
-                                         chromadb_client=chromadb_client)
+                                         chromadb_client=chromadb_client, embedding_model=embedding_model)
     collection_service = providers.Factory(CollectionsService, collections_repository=collections_repository,
-                                           chromadb_client=chromadb_client, embedding_model=embedding_model)
-    files_service = providers.Factory(FilesService, files_repository=files_repository)
+                                           chromadb_client=chromadb_client, embedding_model=embedding_model,
+                                           embedding_function=embedding_function)
+    files_service = providers.Factory(FilesService, files_repository=files_repository,
+                                      chromadb_client=chromadb_client,
+                                      embedding_model_name=embedding_factory.provided.cache_name.call("Default"))
+    file_uploads_service = providers.Factory(FileUploadsService, file_uploads_repository=file_uploads_repository,
+                                             files_service=files_service)
+    ingestion_jobs_service = providers.Factory(IngestionJobsService,
+                                               ingestion_jobs_repository=ingestion_jobs_repository)
     question_service = providers.Factory(QuestionsService, questions_repository=questions_repository,
                                          collections_repository=collections_repository,
                                          chromadb_client=chromadb_client,
+                                         embedding_function=embedding_function,
                                          augment_query_generator=augment_query_generator)
+
+    # Ingestion workers
+    staged_pipeline = providers.Singleton(StagedPipeline,
+                                          pipeline_service_factory=pipeline_service.provider,
+                                          extract_workers=settings.PIPELINE_EXTRACT_WORKERS,
+                                          clean_workers=settings.PIPELINE_CLEAN_WORKERS,
+                                          chunk_workers=settings.PIPELINE_CHUNK_WORKERS,
+                                          embed_workers=settings.PIPELINE_EMBED_WORKERS,
+                                          upsert_workers=settings.PIPELINE_UPSERT_WORKERS,
+                                          queue_size=settings.PIPELINE_STAGE_QUEUE_SIZE,
+                                          window_pages=settings.CLEANER_BATCH_PAGES,
+                                          batch_size=settings.PIPELINE_UPSERT_BATCH_SIZE)
+    ingestion_worker_pool = providers.Singleton(IngestionWorkerPool,
+                                                ingestion_jobs_repository=ingestion_jobs_repository,
+                                                files_repository=files_repository,
+                                                pipeline_service_factory=pipeline_service.provider,
+                                                staged_pipeline=staged_pipeline,
+                                                staged=settings.PIPELINE_STAGED,
+                                                workers=settings.INGESTION_WORKERS,
+                                                mode=settings.INGESTION_WORKER_MODE,
+                                                lease_seconds=settings.INGESTION_LEASE_SECONDS,
+                                                retry_backoff_seconds=settings.INGESTION_RETRY_BACKOFF_SECONDS,
+                                                poll_interval_seconds=settings.INGESTION_POLL_INTERVAL_SECONDS)
+    vector_purger = providers.Singleton(VectorPurger,
+                                        files_service_factory=files_service.provider,
+                                        interval_seconds=settings.VECTOR_PURGE_INTERVAL_SECONDS)
+    upload_sweeper = providers.Singleton(UploadSweeper,
+                                         file_uploads_service_factory=file_uploads_service.provider,
+                                         ttl_seconds=settings.UPLOAD_TTL_SECONDS,
+                                         interval_seconds=settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
+    collection_reindexer = providers.Singleton(CollectionReindexer,
+                                               collections_repository=collections_repository,
+                                               files_repository=files_repository,
+                                               pipeline_service_factory=pipeline_service.provider,
+                                               chromadb_client=chromadb_client,
+                                               gc_delay_seconds=settings.REINDEX_GC_DELAY_SECONDS,
+                                               embedding_factory=embedding_factory,
+                                               embedding_processes=settings.REINDEX_EMBEDDING_PROCESSES,
+                                               embedding_threads=settings.REINDEX_EMBEDDING_THREADS)
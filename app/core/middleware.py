@@ -2,6 +2,7 @@ import asyncio
 from functools import wraps
 
 from dependency_injector.wiring import inject as di_inject
+from fastapi.concurrency import run_in_threadpool
 from loguru import logger
 
 from app.services.base_service import BaseService
@@ -18,9 +19,9 @@ def inject(func):
             if asyncio.iscoroutinefunction(func):
                 result = await func(*args, **kwargs)
                 return result
-            # Handle regular functions
+            # Handle regular functions in the threadpool, as FastAPI does, so they do not block the event loop
             else:
-                result = func(*args, **kwargs)
+                result = await run_in_threadpool(func, *args, **kwargs)
                 return result
         finally:
             if injected_services:
@@ -83,9 +83,24 @@ class App:
         self.db = self.container.db()
         self.chroma = self.container.chromadb_client()
         self.model = self.container.embedding_model()
+        self.container.embedding_factory().warmup(settings.EMBEDDING_WARMUP_MODELS)
+        self.ingestion_workers = self.container.ingestion_worker_pool()
+        if settings.INGESTION_WORKERS > 0:
+            self.ingestion_workers.start()
+        self.vector_purger = self.container.vector_purger()
+        if settings.VECTOR_PURGE_INTERVAL_SECONDS > 0:
+            self.vector_purger.start()
+        self.upload_sweeper = self.container.upload_sweeper()
+        if settings.UPLOAD_SWEEP_INTERVAL_SECONDS > 0:
+            self.upload_sweeper.start()
         yield
         # Shutdown
         logger.info("Shutting down the application...")
+        self.ingestion_workers.stop()
+        self.vector_purger.stop()
+        self.upload_sweeper.stop()
+        self.container.collection_reindexer().stop()
+        self.container.embedding_factory().close()
         self.db.close()
 
 
@@ -1,4 +1,6 @@
-from sqlmodel import String, Text, Field, Relationship
+from typing import Optional
+
+from sqlmodel import Integer, String, Text, Field, Relationship
 
 from app.models import BaseModel
 
@@ -7,6 +9,12 @@ class Collections(BaseModel, table=True):
     __tablename__ = 'collections'
     collection_name: str = Field(sa_type=String, nullable=True, unique=True)
     description: str = Field(sa_type=Text, nullable=True)
+    # Chroma collection the name is an alias of, the name itself when never re-indexed
+    chroma_name: Optional[str] = Field(default=None, sa_type=String, nullable=True)
+    # Chroma collection being built by a re-index, swapped in once complete
+    shadow_name: Optional[str] = Field(default=None, sa_type=String, nullable=True)
+    # Compact vectors, see VectorCodec: leading dimensions kept, None for the full vectors
+    vector_dimensions: Optional[int] = Field(default=None, sa_type=Integer, nullable=True)
     files: list["Files"] = Relationship(
         back_populates="collection",
     )
@@ -14,5 +22,12 @@ class Collections(BaseModel, table=True):
         back_populates="collection",
     )
 
+    @property
+    def active_name(self) -> str:
+        """
+        Name of the Chroma collection currently serving the collection.
+        """
+        return self.chroma_name or self.collection_name
+
     def normalize(self):
         self.collection_name = self.collection_name.lower()
@@ -0,0 +1,23 @@
+import uuid
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlmodel import Field, Column
+
+from app.models import BaseModel
+
+
+class FileUploads(BaseModel, table=True):
+    __tablename__ = 'file_uploads'
+    collection_id: uuid.UUID = Field(foreign_key="collections.id", nullable=False)
+    file_name: str = Field(max_length=255, nullable=False)
+    file_type: str = Field(max_length=50, nullable=False)
+    # Total size announced by the client, and the number of contiguous bytes written so far
+    file_size: int = Field(sa_type=sa.BigInteger, nullable=False)
+    received_bytes: int = Field(default=0, sa_type=sa.BigInteger, nullable=False)
+    part_path: str = Field(max_length=255, nullable=False)
+    status: str = Field(default="uploading",
+                        sa_column=Column(sa.Enum("uploading", "completed", "aborted",
+                                                 name="file_upload_status_enum"),
+                                         nullable=False))
+    file_id: Optional[uuid.UUID] = Field(default=None, foreign_key="files.id", nullable=True)
@@ -13,6 +13,7 @@ class Files(BaseModel, table=True):
     file_path: str = Field(max_length=255, nullable=False)
     file_type: str = Field(max_length=50, nullable=False)
     file_size: int = Field(nullable=False)
+    content_hash: Optional[str] = Field(default=None, max_length=64, nullable=True, index=True)
     metadatas: dict = Field(sa_column=Column(JSON), default={})
     status: str = Field(default="pending",
                         sa_column=Column(sa.Enum("pending", "processing", "completed", "failed", "deleted", "archived"),
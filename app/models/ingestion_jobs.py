@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlmodel import Field, Column
+
+from app.models import BaseModel
+
+
+class IngestionJobs(BaseModel, table=True):
+    __tablename__ = 'ingestion_jobs'
+    file_id: uuid.UUID = Field(foreign_key="files.id", nullable=False, index=True)
+    status: str = Field(default="queued",
+                        sa_column=Column(sa.Enum("queued", "running", "completed", "failed",
+                                                 name="ingestion_job_status_enum"),
+                                         nullable=False))
+    # Lower runs first, jobs are ordered shortest-first by file size
+    priority: int = Field(default=0, sa_type=sa.BigInteger, nullable=False)
+    attempts: int = Field(default=0, nullable=False)
+    max_attempts: int = Field(default=3, nullable=False)
+    available_at: datetime = Field(default_factory=datetime.now, sa_type=sa.DateTime, nullable=False)
+    lease_expires_at: Optional[datetime] = Field(default=None, sa_type=sa.DateTime, nullable=True)
+    locked_by: Optional[str] = Field(default=None, max_length=255, nullable=True)
+    last_error: Optional[str] = Field(default=None, sa_type=sa.Text, nullable=True)
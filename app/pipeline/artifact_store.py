@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from loguru import logger
+
+
+class ArtifactStore:
+    """
+    Store pipeline artifacts on disk, keyed by the SHA-256 of the source file content.
+    Identical uploads share their artifacts, whichever collection they belong to.
+    The extracted pages are stored once per content, the chunks once per content and set of cleaning
+    and chunking parameters, so changing the chunk settings re-chunks from the stored pages.
+    """
+    PAGES = "pages.jsonl.gz"
+    CHUNKS = "chunks"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, content_hash: str, name: str) -> str:
+        return os.path.join(self.root, content_hash[:2], content_hash, name)
+
+    def has(self, content_hash: str, name: str) -> bool:
+        return os.path.exists(self.path(content_hash, name))
+
+    def iter_pages(self, content_hash: str) -> Iterator[str]:
+        """
+        Yield the extracted text of each page of a stored file, in order.
+        """
+        with gzip.open(self.path(content_hash, self.PAGES), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    @contextmanager
+    def page_writer(self, content_hash: str):
+        """
+        Write pages one by one. The artifact only becomes visible once every page is written.
+        """
+        with self._writer(content_hash, self.PAGES) as f:
+            yield _PageWriter(f)
+        logger.info("Stored extracted pages for content {}", content_hash)
+
+    @staticmethod
+    def chunks_name(params: dict) -> str:
+        """
+        Name of the chunk artifact produced with the given cleaning and chunking parameters.
+        """
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return f"{ArtifactStore.CHUNKS}-{digest}.jsonl.gz"
+
+    def iter_chunks(self, content_hash: str, name: str, summary: Optional[dict] = None) -> Iterator[str]:
+        """
+        Yield the chunks of a stored file, in document order.
+        :param summary: Optional dict updated with the parameters, page count and chunk count of the artifact.
+        """
+        with gzip.open(self.path(content_hash, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    # Header with the parameters and trailer with the counts
+                    if summary is not None:
+                        summary.update(record)
+                    continue
+                yield record
+
+    @contextmanager
+    def chunk_writer(self, content_hash: str, name: str, params: dict):
+        """
+        Write chunks one by one, after a header with the parameters that produced them.
+        The artifact only becomes visible once every chunk is written.
+        """
+        with self._writer(content_hash, name) as f:
+            writer = _ChunkWriter(f)
+            f.write(json.dumps({"params": params}) + "\n")
+            yield writer
+            f.write(json.dumps({"page_count": writer.page_count, "chunk_count": writer.chunk_count}) + "\n")
+        logger.info("Stored {} chunks for content {}", writer.chunk_count, content_hash)
+
+    @contextmanager
+    def _writer(self, content_hash: str, name: str):
+        path = self.path(content_hash, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        f = gzip.open(tmp_path, "wt", encoding="utf-8")
+        try:
+            yield f
+            f.close()
+            os.replace(tmp_path, path)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+
+
+class _PageWriter:
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, page: str):
+        self._f.write(json.dumps(page, ensure_ascii=False))
+        self._f.write("\n")
+
+
+class _ChunkWriter(_PageWriter):
+    def __init__(self, f):
+        super().__init__(f)
+        self.page_count = 0
+        self.chunk_count = 0
+
+    def write(self, chunk: str):
+        super().write(chunk)
+        self.chunk_count += 1
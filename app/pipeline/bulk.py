@@ -0,0 +1,436 @@
+"""
+Bulk offline indexing of a directory or zip archive of PDF documents into a collection.
+
+Files are registered in bulk, then extracted, cleaned, chunked and embedded across a process pool,
+and the vectors are written to ChromaDB in large batches. Progress is appended to a checkpoint file
+so an interrupted load can be resumed with --resume.
+With --embedding-processes, the workers only extract, clean and chunk, and each write batch is
+embedded by an EmbeddingPool sharing one copy of the model weights, instead of one model per worker.
+
+Usage:
+    python -m app.pipeline.bulk path/to/documents.zip --collection name [--workers 4]
+        [--batch-size 1024] [--chroma-path ./chroma] [--checkpoint load.jsonl] [--resume]
+        [--embedding-processes 4] [--embedding-threads 2]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+from loguru import logger
+from pypdf import PdfReader
+
+from app.core.config import settings
+from app.models.files import Files
+from app.pipeline.pipeline_service import chunk_id
+from rag.embedding.vector_codec import VectorCodec
+
+_worker = {}
+
+
+def iter_sources(source: str) -> Iterator[tuple[str, Callable]]:
+    """
+    Yield the name and an opener of every PDF in a directory (recursively) or a zip archive, sorted by name.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = sorted(name for name in archive.namelist() if name.lower().endswith(".pdf"))
+        for name in names:
+            yield name, lambda name=name: _open_zip_member(source, name)
+        return
+
+    paths = []
+    for root, _, file_names in os.walk(source):
+        paths.extend(os.path.join(root, name) for name in file_names if name.lower().endswith(".pdf"))
+    for path in sorted(paths):
+        yield os.path.relpath(path, source), lambda path=path: open(path, "rb")
+
+
+class _ZipMember:
+    def __init__(self, archive: zipfile.ZipFile, name: str):
+        self._archive = archive
+        self._member = archive.open(name)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._member.read(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._member.close()
+        self._archive.close()
+
+
+def _open_zip_member(source: str, name: str) -> _ZipMember:
+    return _ZipMember(zipfile.ZipFile(source), name)
+
+
+def _embedding_factory(threads: int):
+    """
+    Embedding factory of a bulk load, sharing the on-disk cache tier with the other processes and the API.
+    """
+    from rag.embedding.embedding_cache import EmbeddingCache
+    from rag.embedding.embedding_factory import EmbeddingFactory
+
+    cache = None
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cache = EmbeddingCache(capacity=settings.EMBEDDING_CACHE_SIZE, path=settings.EMBEDDING_CACHE_PATH or None,
+                               max_disk_entries=settings.EMBEDDING_CACHE_MAX_DISK_ENTRIES)
+    return EmbeddingFactory(cache=cache, backend=settings.EMBEDDING_BACKEND, onnx_dir=settings.EMBEDDING_ONNX_DIR,
+                            onnx_quantized=settings.EMBEDDING_ONNX_QUANTIZED, threads=threads)
+
+
+def _init_worker(model_name: Optional[str], clean_level: str, torch_threads: int):
+    """
+    Load the cleaner, the chunker and, unless embedding happens outside the workers, the embedding
+    model once per worker process.
+    """
+    from rag.embedding.batch_encoder import BatchEncoder
+    from rag.nlp.doc_chunking import TokenAwareChunker
+    from rag.nlp.doc_cleaner import CompiledDocumentCleaner
+
+    try:
+        import torch
+
+        # Every worker embeds on its own, share the cores instead of oversubscribing them
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    _worker["cleaner"] = CompiledDocumentCleaner(tokenizer=settings.CLEANER_TOKENIZER)
+    _worker["chunker"] = TokenAwareChunker(anchor_pages=settings.PIPELINE_ANCHOR_PAGES)
+    if model_name is not None:
+        _worker["encoder"] = BatchEncoder(_embedding_factory(torch_threads).get(model_name),
+                                          batch_size=settings.EMBEDDING_BATCH_SIZE)
+    _worker["clean_level"] = clean_level
+
+
+def _prepare(file_id: uuid.UUID, file_path: str) -> dict:
+    """
+    Extract, clean, chunk and, unless embedding happens outside the workers, embed one file inside a
+    worker process.
+    """
+    started_at = time.perf_counter()
+    reader = PdfReader(file_path)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    if _worker["clean_level"] != "none":
+        pages = [_worker["cleaner"].clean_document(page, _worker["clean_level"]) for page in pages]
+
+    chunks = list(_worker["chunker"].chunk_pages(pages))
+    seen = {}
+    ids = [chunk_id(file_id, chunk, seen) for chunk in chunks]
+    embeddings = None
+    if chunks and "encoder" in _worker:
+        embeddings = _worker["encoder"].encode(chunks).astype(np.float32)
+    return {
+        "file_id": file_id,
+        "page_count": len(pages),
+        "ids": ids,
+        "chunks": chunks,
+        "embeddings": embeddings,
+        "seconds": time.perf_counter() - started_at,
+    }
+
+
+class Checkpoint:
+    """
+    Append-only record of the registered and completed sources of a bulk load.
+    """
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.registered = {}
+        self.completed = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["status"] == "registered":
+                        self.registered[entry["source"]] = uuid.UUID(entry["file_id"])
+                    elif entry["status"] == "completed":
+                        self.completed.add(entry["source"])
+        self._f = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def record(self, source: str, file_id: uuid.UUID, status: str, **extra):
+        self._f.write(json.dumps({"source": source, "file_id": str(file_id), "status": status, **extra}) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class BulkIndexer:
+    """
+    Load the PDF documents of a directory or zip archive into a collection.
+    """
+
+    def __init__(self, files_repository, files_service, chromadb_client, collection, checkpoint: Checkpoint,
+                 workers: int, batch_size: int, model_name: str = "Default", embedding_processes: int = 0,
+                 embedding_threads: int = 0):
+        self.files_repository = files_repository
+        self.files_service = files_service
+        self.chromadb_client = chromadb_client
+        self.collection = collection
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_size = batch_size
+        self.model_name = model_name
+        # Embed the write batches in a pool of this many processes instead of in the workers
+        self.embedding_processes = embedding_processes
+        self.embedding_threads = embedding_threads
+        self.encoder = None
+        self.codec = VectorCodec(collection.vector_dimensions)
+
+        self.sources = {}
+        self._buffer = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        self._buffered_files = []
+        self.report = {"files": 0, "duplicates": 0, "resumed": 0, "completed": 0, "failed": 0, "pages": 0,
+                       "chunks": 0, "prepare_seconds": 0.0, "embed_seconds": 0.0, "write_seconds": 0.0}
+
+    def register(self, source: str) -> list[Files]:
+        """
+        Store every source file and create the Files rows in a single transaction.
+        Sources already completed in the checkpoint are skipped, registered ones reuse their row.
+        :return: The files to process.
+        """
+        pending, new_files = [], []
+        for name, opener in iter_sources(source):
+            self.report["files"] += 1
+            if name in self.checkpoint.completed:
+                self.report["resumed"] += 1
+                continue
+            if name in self.checkpoint.registered:
+                files = self.files_repository.read_by_id(self.checkpoint.registered[name])
+                if files.status != "completed":
+                    self.sources[files.id] = name
+                    pending.append(files)
+                continue
+
+            with opener() as stream:
+                file_path, content_hash, file_size = self.files_service.store_stream(stream, "pdf")
+            new_files.append((name, Files(
+                file_name=os.path.basename(name),
+                file_path=file_path,
+                file_type="application/pdf",
+                file_size=file_size,
+                content_hash=content_hash,
+                collection_id=self.collection.id,
+            )))
+
+        # Content already indexed in the collection is registered as a completed duplicate
+        originals = self.files_repository.get_completed_hashes(
+            list({files.content_hash for _, files in new_files}), self.collection.id
+        )
+        first_seen = {}
+        now = datetime.now()
+        for name, files in new_files:
+            original = originals.get(files.content_hash)
+            if original is not None:
+                files.status = "completed"
+                files.metadatas = {**(original.metadatas or {}), "duplicate_of": str(original.id)}
+                files.processing_started_at = files.processing_ended_at = now
+                self.report["duplicates"] += 1
+            elif files.content_hash in first_seen:
+                # Same content twice in the source, only the first copy is indexed
+                files.status = "completed"
+                files.metadatas = {"duplicate_of": str(first_seen[files.content_hash])}
+                files.processing_started_at = files.processing_ended_at = now
+                self.report["duplicates"] += 1
+            else:
+                first_seen[files.content_hash] = files.id
+                self.sources[files.id] = name
+                pending.append(files)
+
+        self.files_repository.create_many([files for _, files in new_files])
+        for name, files in new_files:
+            self.checkpoint.record(name, files.id, "registered")
+            if files.status == "completed":
+                self.checkpoint.record(name, files.id, "completed", chunks=0)
+        logger.info("Registered {} files, {} to process", len(new_files), len(pending))
+        return pending
+
+    def run(self, pending: list[Files]):
+        """
+        Process the files across the pool, keeping a bounded number of files in flight.
+        """
+        files_by_id = {files.id: files for files in pending}
+        pool = None
+        if self.embedding_processes > 0:
+            # Forked before the workers and their threads are started
+            factory = _embedding_factory(self.embedding_threads)
+            pool = factory.pool(self.model_name, self.embedding_processes, self.embedding_threads)
+            self.encoder = factory.cached(self.model_name, pool)
+        try:
+            self._run(pending, files_by_id)
+        finally:
+            if pool is not None:
+                self.report["embedding"] = pool.stats()
+                pool.close()
+
+    def _run(self, pending: list[Files], files_by_id: dict):
+        context = multiprocessing.get_context("spawn")
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        model_name = self.model_name if self.encoder is None else None
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(model_name, settings.PIPELINE_CLEAN_LEVEL, torch_threads)) as executor:
+            queued = iter(pending)
+            in_flight = deque()
+            for files in queued:
+                in_flight.append((files, executor.submit(_prepare, files.id, files.file_path)))
+                if len(in_flight) >= self.workers * 2:
+                    break
+
+            while in_flight:
+                files, future = in_flight.popleft()
+                next_files = next(queued, None)
+                if next_files is not None:
+                    in_flight.append((next_files, executor.submit(_prepare, next_files.id, next_files.file_path)))
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error("Error processing {}: {}", self.sources[files.id], e)
+                    self.files_repository.update_attr(files.id, "status", "failed")
+                    self.checkpoint.record(self.sources[files.id], files.id, "failed", error=str(e))
+                    self.report["failed"] += 1
+                    continue
+                self._add(files_by_id[result["file_id"]], result)
+        self._flush()
+
+    def _add(self, files: Files, result: dict):
+        self.report["pages"] += result["page_count"]
+        self.report["chunks"] += len(result["chunks"])
+        self.report["prepare_seconds"] += result["seconds"]
+        if result["chunks"]:
+            self._buffer["ids"].extend(result["ids"])
+            self._buffer["documents"].extend(result["chunks"])
+            self._buffer["metadatas"].extend(
+                {"text": chunk, "file_name": files.file_name, "file_id": str(files.id)} for chunk in result["chunks"]
+            )
+            if result["embeddings"] is not None:
+                self._buffer["embeddings"].append(result["embeddings"])
+        self._buffered_files.append((files, result["page_count"], len(result["chunks"])))
+        if len(self._buffer["ids"]) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        """
+        Write the buffered vectors in one batch, then mark their files completed.
+        """
+        if self._buffer["ids"]:
+            if self.encoder is not None:
+                started_at = time.perf_counter()
+                embeddings = self.encoder.encode_queries(self._buffer["documents"])
+                self.report["embed_seconds"] += time.perf_counter() - started_at
+            else:
+                embeddings = np.concatenate(self._buffer["embeddings"])
+            started_at = time.perf_counter()
+            self.chromadb_client.upsert_documents(
+                collection_name=self.collection.active_name,
+                ids=self._buffer["ids"],
+                documents=self._buffer["documents"],
+                metadatas=self._buffer["metadatas"],
+                embeddings=self.codec.compact(embeddings).tolist(),
+            )
+            self.report["write_seconds"] += time.perf_counter() - started_at
+            logger.info("Wrote {} vectors to '{}'", len(self._buffer["ids"]), self.collection.active_name)
+
+        now = datetime.now()
+        for files, page_count, chunk_count in self._buffered_files:
+            self.files_repository.update(
+                id=files.id,
+                schema=Files(
+                    status="completed",
+                    metadatas={
+                        "collection_name": self.collection.active_name,
+                        "page_count": page_count,
+                        "chunk_count": chunk_count,
+                        "chunks_added": chunk_count,
+                        "clean_level": settings.PIPELINE_CLEAN_LEVEL,
+                        "bulk": True,
+                    },
+                    processing_ended_at=now,
+                )
+            )
+            self.checkpoint.record(self.sources[files.id], files.id, "completed", chunks=chunk_count)
+            self.report["completed"] += 1
+        self._buffer = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        self._buffered_files = []
+
+
+def print_report(report: dict, seconds: float):
+    print(f"Files:      {report['files']} found, {report['completed']} indexed, {report['duplicates']} duplicates, "
+          f"{report['resumed']} already done, {report['failed']} failed")
+    print(f"Pages:      {report['pages']}")
+    print(f"Chunks:     {report['chunks']}")
+    print(f"Time:       {seconds:.1f}s wall, {report['prepare_seconds']:.1f}s in workers, "
+          f"{report['embed_seconds']:.1f}s embedding, {report['write_seconds']:.1f}s writing vectors")
+    if "embedding" in report:
+        embedding = report["embedding"]
+        print(f"Embedding:  {embedding['vectors']} vectors, {embedding['vectors_per_sec']} vectors/sec across "
+              f"{embedding['processes']} processes of {embedding['threads_per_process']} threads")
+    if seconds > 0:
+        print(f"Throughput: {report['completed'] / seconds:.2f} files/sec, {report['pages'] / seconds:.1f} pages/sec, "
+              f"{report['chunks'] / seconds:.1f} chunks/sec")
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory or zip archive of PDF documents")
+    parser.add_argument("--collection", required=True, help="Name of the collection to load into")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Vectors per write")
+    parser.add_argument("--model", default="Default", help="Embedding model of the EmbeddingFactory")
+    parser.add_argument("--chroma-path", help="Write to a local persistent ChromaDB store instead of the server")
+    parser.add_argument("--checkpoint", help="Checkpoint file, defaults to <source>.checkpoint.jsonl")
+    parser.add_argument("--resume", action="store_true", help="Resume from the checkpoint file")
+    parser.add_argument("--embedding-processes", type=int, default=0,
+                        help="Embed in a pool of processes sharing the model, 0 embeds in the workers")
+    parser.add_argument("--embedding-threads", type=int, default=0,
+                        help="Threads of each embedding process, 0 shares the cores between them")
+    args = parser.parse_args(argv)
+
+    from dependency_injector import providers
+
+    from app.core.container import Container
+    from rag.chroma.client import ChromaDBLocalClient
+
+    container = Container()
+    # Vectors are computed by the workers, the embedding model is not needed in this process
+    container.embedding_model.override(providers.Object(None))
+    collection = container.collections_repository().get_by_name(args.collection)
+    if collection is None:
+        parser.error(f"Collection '{args.collection}' does not exist")
+    chromadb_client = ChromaDBLocalClient(args.chroma_path) if args.chroma_path else container.chromadb_client()
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.source.rstrip(os.sep)}.checkpoint.jsonl", args.resume)
+    indexer = BulkIndexer(
+        files_repository=container.files_repository(),
+        files_service=container.files_service(),
+        chromadb_client=chromadb_client,
+        collection=collection,
+        checkpoint=checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        model_name=args.model,
+        embedding_processes=args.embedding_processes,
+        embedding_threads=args.embedding_threads,
+    )
+    started_at = time.perf_counter()
+    try:
+        indexer.run(indexer.register(args.source))
+    finally:
+        checkpoint.close()
+        print_report(indexer.report, time.perf_counter() - started_at)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.pipeline.pipeline_service import PipelineService
+from app.repositories import CollectionsRepository
+from app.repositories.files_repository import FilesRepository
+from rag.chroma.client import ChromaDBHttpClient
+from rag.embedding.embedding_factory import EmbeddingFactory
+from rag.embedding.embedding_pool import EmbeddingPool
+
+
+class CollectionReindexer:
+    """
+    Re-index collections without downtime.
+
+    The files of the collection are ingested into a shadow Chroma collection, from their stored
+    chunks or pages when the parameters allow it, while queries keep using the current one. Once
+    every file is in, the collection name is swapped to the shadow in a single transaction. Files
+    completed meanwhile in the old collection are caught up after the swap, and the old collection is
+    dropped after a grace period for in-flight queries and ingestions.
+    A re-index interrupted by a restart resumes on the same shadow when started again, chunks already
+    in the shadow are not embedded again.
+    With embedding_processes, the files are embedded by an EmbeddingPool of spawned processes until
+    the swap.
+    """
+
+    def __init__(self,
+                 collections_repository: CollectionsRepository,
+                 files_repository: FilesRepository,
+                 pipeline_service_factory: Callable[[], PipelineService],
+                 chromadb_client: ChromaDBHttpClient,
+                 gc_delay_seconds: float = 300,
+                 embedding_factory: Optional[EmbeddingFactory] = None,
+                 embedding_processes: int = 0,
+                 embedding_threads: int = 0,
+                 model_name: str = "Default"):
+        self.collections_repository = collections_repository
+        self.files_repository = files_repository
+        self.pipeline_service_factory = pipeline_service_factory
+        self.chromadb_client = chromadb_client
+        self.gc_delay_seconds = gc_delay_seconds
+        self.embedding_factory = embedding_factory
+        self.embedding_processes = embedding_processes
+        self.embedding_threads = embedding_threads
+        self.model_name = model_name
+
+        self._jobs: dict[uuid.UUID, dict] = {}
+        self._threads: dict[uuid.UUID, threading.Thread] = {}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, collection_id: uuid.UUID) -> dict:
+        """
+        Start re-indexing a collection in the background, unless it is already being re-indexed here.
+        :return: The state of the re-index.
+        """
+        with self._lock:
+            thread = self._threads.get(collection_id)
+            if thread is None or not thread.is_alive():
+                self._stop_event.clear()
+                self._jobs[collection_id] = {"state": "starting", "started_at": datetime.now().isoformat(),
+                                             "files_total": 0, "files_done": 0}
+                thread = threading.Thread(target=self._run, args=(collection_id,),
+                                          name=f"reindex-{collection_id}", daemon=True)
+                self._threads[collection_id] = thread
+                thread.start()
+            return dict(self._jobs[collection_id])
+
+    def status(self, collection_id: uuid.UUID) -> Optional[dict]:
+        """
+        The state of the last re-index of a collection started in this process.
+        """
+        with self._lock:
+            job = self._jobs.get(collection_id)
+            return dict(job) if job else None
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the running re-indexes, their shadows are resumed by the next start.
+        """
+        self._stop_event.set()
+        for thread in list(self._threads.values()):
+            thread.join(timeout)
+
+    def _update(self, collection_id: uuid.UUID, **values):
+        with self._lock:
+            self._jobs[collection_id].update(values)
+
+    def _run(self, collection_id: uuid.UUID):
+        try:
+            self._reindex(collection_id)
+        except Exception as e:
+            logger.error("Re-index of collection {} failed: {}", collection_id, e)
+            self._update(collection_id, state="failed", error=str(e))
+
+    def _reindex(self, collection_id: uuid.UUID):
+        collection = self.collections_repository.read_by_id(collection_id)
+        shadow_name = collection.shadow_name
+        if shadow_name is None:
+            shadow_name = f"{collection.collection_name}_{datetime.now():%Y%m%d%H%M%S}"
+            self.collections_repository.update_attr(collection_id, "shadow_name", shadow_name)
+        self.chromadb_client.get_or_create_collection(shadow_name, metadata={"alias": collection.collection_name})
+        logger.info("Re-indexing collection {} into {}", collection.collection_name, shadow_name)
+        self._update(collection_id, state="building", shadow_name=shadow_name)
+
+        done = {}
+        pool = None
+        if self.embedding_factory is not None and self.embedding_processes > 0:
+            # The server already runs threads, forked processes could inherit locks held by them
+            pool = self.embedding_factory.pool(self.model_name, self.embedding_processes, self.embedding_threads,
+                                               fork=False)
+        try:
+            if not self._catch_up(collection_id, shadow_name, done, pool):
+                return
+
+            previous_name = self.collections_repository.swap_alias(collection_id, shadow_name)
+            if previous_name is None:
+                self._update(collection_id, state="failed", error=f"Shadow {shadow_name} was replaced")
+                return
+            logger.info("Collection {} now served by {}", collection.collection_name, shadow_name)
+            self._update(collection_id, state="swapped", swapped_at=datetime.now().isoformat(),
+                         previous_name=previous_name)
+
+            # Files that completed in the old collection while the last files were built
+            if not self._catch_up(collection_id, shadow_name, done, pool):
+                return
+        finally:
+            if pool is not None:
+                pool.close()
+                self._update(collection_id, embedding=pool.stats())
+        if self._stop_event.wait(self.gc_delay_seconds):
+            return
+        # Ingestions started before the swap have finished by now
+        if not self._catch_up(collection_id, shadow_name, done):
+            return
+        if previous_name != shadow_name:
+            self.chromadb_client.delete_collection(previous_name)
+        self._update(collection_id, state="completed", completed_at=datetime.now().isoformat())
+
+    def _catch_up(self, collection_id: uuid.UUID, shadow_name: str, done: dict,
+                  pool: Optional[EmbeddingPool] = None) -> bool:
+        """
+        Ingest into the shadow the completed files not ingested yet, or ingested again in the old
+        collection since, until none is left.
+        :param done: The end of the last ingestion of each file already in the shadow, by file ID.
+        :param pool: Embedding pool to embed with instead of the model of the pipeline.
+        :return: False when stopped.
+        """
+        while True:
+            pending = [files for files in self.files_repository.get_indexed_originals(collection_id)
+                       if files.id not in done or done[files.id] != files.processing_ended_at]
+            if not pending:
+                return True
+            self._update(collection_id, files_total=len(done) + len(pending))
+            for files in pending:
+                if self._stop_event.is_set():
+                    return False
+                if pool is None:
+                    pipeline_service = self.pipeline_service_factory()
+                else:
+                    pipeline_service = self.pipeline_service_factory(
+                        embedding_model=self.embedding_factory.cached(self.model_name, pool),
+                        embedding_batch_size=settings.PIPELINE_UPSERT_BATCH_SIZE,
+                    )
+                pipeline_service.process(files, collection_name=shadow_name)
+                done[files.id] = files.processing_ended_at
+                self._update(collection_id, files_done=len(done))
+                if pool is not None:
+                    self._update(collection_id, embedding=pool.stats())
@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import socket
+import threading
+import uuid
+from typing import Callable, Literal, Optional
+
+from loguru import logger
+
+from app.models.ingestion_jobs import IngestionJobs
+from app.pipeline.pipeline_service import PipelineService
+from app.pipeline.staged_pipeline import StagedPipeline
+from app.repositories.files_repository import FilesRepository
+from app.repositories.ingestion_jobs_repository import IngestionJobsRepository
+
+
+class IngestionWorkerPool:
+    """
+    Pool of workers consuming the durable ingestion queue.
+
+    Each worker claims one job at a time, so the number of in-flight jobs is bounded by the pool size.
+    Leases are extended while a job runs; jobs whose lease expires (crashed worker or restart) are
+    recovered and retried with exponential backoff until they run out of attempts.
+    In staged mode the workers hand their files to the staged pipeline, so the stages of the files
+    claimed by different workers overlap.
+    """
+
+    def __init__(self,
+                 ingestion_jobs_repository: IngestionJobsRepository,
+                 files_repository: FilesRepository,
+                 pipeline_service_factory: Callable[[], PipelineService],
+                 staged_pipeline: Optional[StagedPipeline] = None,
+                 staged: bool = False,
+                 workers: int = 2,
+                 mode: Literal["thread", "process"] = "thread",
+                 lease_seconds: int = 300,
+                 retry_backoff_seconds: float = 30,
+                 poll_interval_seconds: float = 2):
+        self.ingestion_jobs_repository = ingestion_jobs_repository
+        self.files_repository = files_repository
+        self.pipeline_service_factory = pipeline_service_factory
+        self.staged_pipeline = staged_pipeline if staged else None
+        self.workers = workers
+        self.mode = mode
+        self.lease_seconds = lease_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+
+        self._stop_event = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._processes: list[multiprocessing.Process] = []
+        self._process_stop_event = None
+
+    def start(self):
+        """
+        Start the workers in the background.
+        """
+        if self._threads or self._processes:
+            return
+        logger.info("Starting {} ingestion workers in {} mode", self.workers, self.mode)
+        self._stop_event.clear()
+
+        if self.mode == "process":
+            context = multiprocessing.get_context("spawn")
+            self._process_stop_event = context.Event()
+            for index in range(self.workers):
+                process = context.Process(
+                    target=_process_worker_main,
+                    args=(self._process_stop_event, index),
+                    name=f"ingestion-worker-{index}",
+                    daemon=True,
+                )
+                process.start()
+                self._processes.append(process)
+            # Lease recovery still runs in the parent process
+            self._start_thread(self._recovery_loop, "ingestion-recovery")
+        else:
+            for index in range(self.workers):
+                self._start_thread(self.run_worker, f"ingestion-worker-{index}")
+            self._start_thread(self._recovery_loop, "ingestion-recovery")
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the workers, letting running jobs finish.
+        """
+        logger.info("Stopping ingestion workers")
+        self._stop_event.set()
+        if self._process_stop_event is not None:
+            self._process_stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        for process in self._processes:
+            process.join(timeout)
+        self._threads, self._processes = [], []
+        if self.staged_pipeline is not None:
+            self.staged_pipeline.stop(timeout)
+
+    def _start_thread(self, target: Callable, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def run_worker(self, stop_event=None):
+        """
+        Claim and run jobs until the stop event is set.
+        """
+        stop_event = stop_event or self._stop_event
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        while not stop_event.is_set():
+            try:
+                job = self.ingestion_jobs_repository.claim(worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error("Error claiming ingestion job: {}", e)
+                job = None
+
+            if job is None:
+                stop_event.wait(self.poll_interval_seconds)
+                continue
+            self._run_job(job, worker_id)
+
+    def _run_job(self, job: IngestionJobs, worker_id: str):
+        logger.info("Worker {} running job {} (attempt {}/{})", worker_id, job.id, job.attempts, job.max_attempts)
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job.id, worker_id, heartbeat_stop), daemon=True)
+        heartbeat.start()
+        try:
+            files = self.files_repository.read_by_id(job.file_id)
+            if files.status == "deleted":
+                logger.info("File {} was deleted, skipping job {}", files.id, job.id)
+            elif self.staged_pipeline is not None:
+                self.staged_pipeline.run(files)
+            else:
+                self.pipeline_service_factory().process(files)
+            if not self.ingestion_jobs_repository.complete(job.id, worker_id):
+                logger.warning("Worker {} lost the lease on job {}, leaving it to its new owner", worker_id, job.id)
+        except Exception as e:
+            logger.error("Ingestion job {} failed: {}", job.id, e)
+            self._handle_failure(job, worker_id, str(e))
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+
+    def _handle_failure(self, job: IngestionJobs, worker_id: str, error: str):
+        if job.attempts < job.max_attempts:
+            delay = self.retry_backoff_seconds * 2 ** (job.attempts - 1)
+            if self.ingestion_jobs_repository.retry(job.id, worker_id, error, delay):
+                logger.info("Retrying job {} in {:.0f}s", job.id, delay)
+                self._set_file_status(job.file_id, "pending")
+                return
+        elif self.ingestion_jobs_repository.fail(job.id, worker_id, error):
+            self._set_file_status(job.file_id, "failed")
+            return
+        # The lease expired meanwhile, the job and its file now belong to the recovery or another worker
+        logger.warning("Worker {} lost the lease on job {}, dropping its failure", worker_id, job.id)
+
+    def _heartbeat(self, job_id: uuid.UUID, worker_id: str, stop_event: threading.Event):
+        while not stop_event.wait(self.lease_seconds / 3):
+            try:
+                if not self.ingestion_jobs_repository.heartbeat(job_id, worker_id, self.lease_seconds):
+                    logger.warning("Worker {} lost the lease on job {}", worker_id, job_id)
+                    return
+            except Exception as e:
+                logger.error("Error extending lease on job {}: {}", job_id, e)
+
+    def _recovery_loop(self):
+        while True:
+            try:
+                requeued, failed = self.ingestion_jobs_repository.recover_expired()
+                for file_id in requeued:
+                    self._set_file_status(file_id, "pending")
+                for file_id in failed:
+                    self._set_file_status(file_id, "failed")
+                if requeued or failed:
+                    logger.warning("Recovered expired ingestion jobs: {} re-queued, {} failed",
+                                   len(requeued), len(failed))
+            except Exception as e:
+                logger.error("Error recovering expired ingestion jobs: {}", e)
+            if self._stop_event.wait(self.lease_seconds / 3):
+                return
+
+    def _set_file_status(self, file_id: uuid.UUID, status: str):
+        try:
+            # A file deleted while its job ran stays deleted
+            if self.files_repository.read_by_id(file_id).status != "deleted":
+                self.files_repository.update_attr(file_id, "status", status)
+        except Exception as e:
+            logger.error("Error updating status of file {}: {}", file_id, e)
+
+
+def _process_worker_main(stop_event, index: int):
+    """
+    Entry point of a worker process. Builds its own container so it gets its own database connections.
+    """
+    from app.core.container import Container
+
+    container = Container()
+    pool = container.ingestion_worker_pool()
+    logger.info("Ingestion worker process {} started (pid {})", index, os.getpid())
+    pool.run_worker(stop_event)
+    container.db().close()
@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from loguru import logger
+from pypdf import PdfReader
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> tuple[list[str], float]:
+    """
+    Extract the text of pages [start, stop) of a PDF file. Runs inside a worker process.
+    :return: The text of the pages and the seconds spent extracting them.
+    """
+    started_at = time.perf_counter()
+    reader = PdfReader(file_path)
+    pages = [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+    return pages, time.perf_counter() - started_at
+
+
+class PdfExtractor:
+    """
+    Extract PDF text across a process pool, yielding the pages in document order.
+    Small files are extracted serially since the pool overhead would outweigh the gain.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, min_pages: int = 32, pages_per_task: int = 16):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_pages = min_pages
+        self.pages_per_task = pages_per_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        logger.info(f"PdfExtractor initialized with max_workers: {self.max_workers}, min_pages: {self.min_pages}")
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # The pool is created lazily and shared by every extraction
+        with self._lock:
+            if self._executor is None:
+                # Spawned, a fork of the threaded server could inherit locks held by its other threads
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def iter_pages(self, file_path: str, stats: Optional[dict] = None) -> Iterator[str]:
+        """
+        Yield the text of each page of a PDF file.
+        :param file_path: Path of the PDF file.
+        :param stats: Optional dict filled once the file is read with pages, workers and:
+            - extract_seconds: seconds spent extracting, summed over the workers.
+            - pages_per_worker_sec: pages extracted per second by one worker, the rate to size the pool with.
+            - wall_seconds: seconds from the start of the extraction to its last page, including the time
+              the caller spends on the yielded pages.
+            - pages_per_sec: pages per wall second.
+        """
+        started_at = time.perf_counter()
+        page_count = len(PdfReader(file_path).pages)
+        parallel = self.max_workers > 1 and page_count >= self.min_pages
+        timing = {"seconds": time.perf_counter() - started_at}
+
+        if parallel:
+            pages = self._iter_parallel(file_path, page_count, timing)
+        else:
+            pages = self._iter_serial(file_path, timing)
+        yield from pages
+
+        extract_seconds = timing["seconds"]
+        wall_seconds = time.perf_counter() - started_at
+        result = {
+            "pages": page_count,
+            "workers": self.max_workers if parallel else 1,
+            "extract_seconds": round(extract_seconds, 4),
+            "pages_per_worker_sec": round(page_count / extract_seconds, 2) if extract_seconds > 0 else None,
+            "wall_seconds": round(wall_seconds, 4),
+            "pages_per_sec": round(page_count / wall_seconds, 2) if wall_seconds > 0 else None,
+        }
+        logger.info("Extracted {} pages from {} in {:.2f}s ({} pages/sec, {} pages/sec per worker, {} workers)",
+                    page_count, file_path, wall_seconds, result["pages_per_sec"], result["pages_per_worker_sec"],
+                    result["workers"])
+        if stats is not None:
+            stats.update(result)
+
+    def extract(self, file_path: str, stats: Optional[dict] = None) -> list[str]:
+        """
+        Extract every page of a PDF file into a list.
+        """
+        return list(self.iter_pages(file_path, stats=stats))
+
+    @staticmethod
+    def _iter_serial(file_path: str, timing: dict) -> Iterator[str]:
+        started_at = time.perf_counter()
+        reader = PdfReader(file_path)
+        timing["seconds"] += time.perf_counter() - started_at
+        for page in reader.pages:
+            started_at = time.perf_counter()
+            text = page.extract_text() or ""
+            timing["seconds"] += time.perf_counter() - started_at
+            yield text
+
+    def _iter_parallel(self, file_path: str, page_count: int, timing: dict) -> Iterator[str]:
+        # Keep a bounded window of page ranges in flight so finished pages do not pile up in memory
+        ranges = iter(
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        )
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(self.executor.submit(_extract_page_range, file_path, start, stop))
+            if len(pending) >= self.max_workers * 2:
+                break
+
+        while pending:
+            # The workers time their own extraction, waits on the pool or on the caller do not count
+            pages, seconds = pending.popleft().result()
+            timing["seconds"] += seconds
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(self.executor.submit(_extract_page_range, file_path, *next_range))
+            yield from pages
+
+    def close(self):
+        """
+        Shut down the worker pool.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
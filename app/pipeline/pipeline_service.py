@@ -1,51 +1,143 @@
+import hashlib
+import os
+import threading
+import uuid
 from datetime import datetime
+from typing import Iterator, Optional
 
-import chromadb.utils.embedding_functions as embedding_functions
 from loguru import logger
-from pypdf import PdfReader
 
 from app.core.config import settings
 from app.models.files import Files
+from app.pipeline.artifact_store import ArtifactStore
+from app.pipeline.pdf_extractor import PdfExtractor
+from app.pipeline.stage_metrics import StageMetrics
 from app.repositories.files_repository import FilesRepository
 from rag.chroma.client import ChromaDBHttpClient
-from rag.nlp.doc_chunking import DocumentChunker
-from rag.nlp.doc_cleaner import DocumentCleaner
+from rag.embedding import BaseEmbeddingModel
+from rag.embedding.batch_encoder import BatchEncoder
+from rag.embedding.vector_codec import VectorCodec
+from rag.nlp.doc_chunking import TokenAwareChunker
+from rag.nlp.doc_cleaner import CompiledDocumentCleaner
 
 
-def read_pdf(file_path: str):
+def chunk_id(file_id: uuid.UUID, text: str, seen: dict) -> str:
     """
-    Read a PDF file and return its content.
+    Build a stable chunk id from the file ID and the SHA-256 of the chunk text.
+    Repeated texts within a file get an occurrence suffix so the ids stay unique.
     """
-    try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
-    except Exception as e:
-        logger.error("Error reading PDF file: {}", e)
-        raise
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    occurrence = seen.get(digest, 0)
+    seen[digest] = occurrence + 1
+    if occurrence:
+        return f"{file_id}_{digest}_{occurrence}"
+    return f"{file_id}_{digest}"
+
+
+class IngestionRun:
+    """
+    State of the ingestion of one file: the chunk ids seen so far, the progress record and the stage metrics.
+    """
+
+    def __init__(self, files: Files, collection_name: str, existing_ids: set, shadow: bool = False):
+        self.files = files
+        self.collection_name = collection_name
+        # Building a shadow collection for a re-index, the file itself is left untouched
+        self.shadow = shadow
+        self.existing_ids = existing_ids
+        self.current_ids = set()
+        self.seen = {}
+        self.progress = {
+            "collection_name": collection_name,
+            "page_count": 0,
+            "chunk_count": 0,
+            "chunks_added": 0,
+            "chunks_unchanged": 0,
+            "chunks_deleted": 0,
+            "batch_count": 0,
+        }
+        self.metrics = StageMetrics()
+        # Batches of a file can be written from several threads
+        self.lock = threading.Lock()
+        # Name of the chunk artifact for the current parameters, and whether it is already stored
+        self.chunks_name = None
+        self.cached_chunks = False
+        # Embed every chunk again, even those already indexed
+        self.reembed = False
+        # Compact form of the vectors stored in the collection
+        self.codec = VectorCodec()
 
 
 class PipelineService:
-    doc_cleaner = DocumentCleaner()
-    doc_chunker = DocumentChunker()
-    huggingface_ef = embedding_functions.HuggingFaceEmbeddingFunction(
-        api_key=settings.HUGGINGFACE_API_KEY,
-        model_name="sentence-transformers/all-mpnet-base-v2"
+    doc_cleaner = CompiledDocumentCleaner(tokenizer=settings.CLEANER_TOKENIZER)
+    doc_chunker = TokenAwareChunker(anchor_pages=settings.PIPELINE_ANCHOR_PAGES)
+    pdf_extractor = PdfExtractor(
+        max_workers=settings.PDF_EXTRACT_WORKERS,
+        min_pages=settings.PDF_EXTRACT_MIN_PAGES,
+        pages_per_task=settings.PDF_EXTRACT_PAGES_PER_TASK,
     )
+    artifact_store = ArtifactStore(root=os.path.join(settings.FILE_PATH, "artifacts"))
 
-    def __init__(self, files_repository: FilesRepository, chromadb_client: ChromaDBHttpClient):
+    def __init__(self, files_repository: FilesRepository, chromadb_client: ChromaDBHttpClient,
+                 embedding_model: BaseEmbeddingModel, embedding_batch_size: Optional[int] = None):
+        """
+        :param embedding_batch_size: Texts per call to the embedding model, EMBEDDING_BATCH_SIZE by default.
+            An EmbeddingPool takes whole upsert batches to shard them across its processes.
+        """
         self.file_repository = files_repository
         self.chromadb_client = chromadb_client
+        self.batch_encoder = BatchEncoder(embedding_model,
+                                          batch_size=embedding_batch_size or settings.EMBEDDING_BATCH_SIZE)
 
     def run_pipeline(self, files: Files):
         """
         Run the pipeline with the given ID.
         """
-        # Update the file status to processing
-        logger.info("Starting pipeline for file: {}", files.id)
         try:
+            self.process(files)
+        except Exception as e:
+            logger.error("Error processing file: {}", e)
+            self.mark_failed(files)
+
+    def process(self, files: Files, collection_name: Optional[str] = None):
+        """
+        Run the ingestion pipeline for a file, raising on failure so the caller can retry.
+
+        Chunks are identified by a hash of their content and diffed against the chunks already
+        indexed for the file: only new chunks are upserted and chunks that vanished are deleted,
+        so re-ingesting a revised document only pays for what changed.
+        :param collection_name: Chroma collection to index into instead of the one serving the file's
+            collection, for building the shadow of a re-index. The file record is not updated then.
+        """
+        run = self.begin(files, collection_name)
+
+        # Stream pages through the chunker and upsert the new chunks in bounded batches
+        pages = run.metrics.iterate("clean", self._clean_pages(self.extract_pages(run), run.metrics))
+        batch = []
+        for chunk in self.chunk_pages(run, pages):
+            new_chunk = self.track_chunk(run, chunk)
+            if new_chunk is None:
+                continue
+
+            batch.append(new_chunk)
+            if len(batch) >= settings.PIPELINE_UPSERT_BATCH_SIZE:
+                self.write_batch(run, batch, self.embed_batch(run, batch))
+                batch = []
+        if batch:
+            self.write_batch(run, batch, self.embed_batch(run, batch))
+
+        self.finish(run)
+
+    def begin(self, files: Files, collection_name: Optional[str] = None) -> IngestionRun:
+        """
+        Mark a file as processing and gather what is needed to ingest it.
+        :param collection_name: Chroma collection of a shadow build, see process.
+        """
+        logger.info("Starting pipeline for file: {}", files.id)
+        previous_metadatas = dict(files.metadatas or {})
+        shadow = collection_name is not None
+        if not shadow:
+            # Update the file status to processing
             self.file_repository.update(
                 id=files.id,
                 schema=Files(
@@ -55,59 +147,271 @@ class PipelineService:
             )
             logger.info("Updated file status to processing for file: {}", files.id)
 
-            # Simulate pipeline processing
-            # clean_text = self.doc_cleaner.clean_document(read_pdf(files.file_path))
-            clean_text = read_pdf(files.file_path)
-            logger.info("Cleaned text for file: {}", files.id)
-            chunks = self.doc_chunker.chunk_text(clean_text)
-            logger.info("Chunked text for file: {}", files.id)
-
             # Query the collection name from the database
             collection_name = self.file_repository.get_collection_name(files.collection_id)
 
-            logger.info("Collection name for file {}: {}", files.id, collection_name)
-            if not collection_name:
-                raise ValueError(f"Collection with ID {files.collection_id} not found.")
-            # Add chunks to ChromaDB
-            ids = [str(files.id) + "_" + str(i) for i in range(len(chunks))]
-            metadata = [
-                {
-                    "text": text,
-                    "file_name": files.file_name,
-                } for text in chunks
-            ]
-            logger.info("Preparing to add chunks to ChromaDB for file: {}", files.id)
-            self.chromadb_client.add_documents(
+        logger.info("Collection name for file {}: {}", files.id, collection_name)
+        if not collection_name:
+            raise ValueError(f"Collection with ID {files.collection_id} not found.")
+
+        run = IngestionRun(files, collection_name, self._existing_chunk_ids(files, collection_name, previous_metadatas),
+                           shadow=shadow)
+        run.progress.update({
+            "chunk_size": self.doc_chunker.chunk_size,
+            "chunk_overlap": self.doc_chunker.chunk_overlap,
+            "clean_level": settings.PIPELINE_CLEAN_LEVEL,
+        })
+        collection = self.file_repository.get_collection(files.collection_id)
+        if collection is not None:
+            run.codec = VectorCodec(collection.vector_dimensions)
+        if files.content_hash:
+            run.chunks_name = ArtifactStore.chunks_name(self.chunk_params())
+            run.cached_chunks = self.artifact_store.has(files.content_hash, run.chunks_name)
+        if "rebuild" in previous_metadatas:
+            # Kept until the file completes, so a retried rebuild still re-embeds
+            run.progress["rebuild"] = previous_metadatas["rebuild"]
+            run.reembed = previous_metadatas["rebuild"].get("reembed", False)
+        run.metrics.add("extract", bytes=files.file_size or 0)
+        return run
+
+    def chunk_params(self) -> dict:
+        """
+        The cleaning and chunking parameters that determine the chunks of a file.
+        """
+        return {
+            "clean_level": settings.PIPELINE_CLEAN_LEVEL,
+            "tokenizer": settings.CLEANER_TOKENIZER,
+            "chunker": type(self.doc_chunker).__name__,
+            "chunk_size": self.doc_chunker.chunk_size,
+            "chunk_overlap": self.doc_chunker.chunk_overlap,
+            "anchor_pages": self.doc_chunker.anchor_pages,
+            "model_name": getattr(self.doc_chunker, "model_name", None),
+            "tokens_per_chunk": getattr(self.doc_chunker, "tokens_per_chunk", None),
+        }
+
+    def extract_pages(self, run: IngestionRun) -> Iterator[str]:
+        """
+        Extract the pages of a file, timed as the extract stage.
+        Nothing is extracted when the chunks of the file are already stored.
+        """
+        if run.cached_chunks:
+            return iter(())
+        return run.metrics.iterate("extract", self._count_pages(run.files, run.progress))
+
+    def clean_window(self, run: IngestionRun, window: list) -> list:
+        """
+        Clean a window of pages, timed as the clean stage.
+        """
+        with run.metrics.measure("clean"):
+            cleaned = self._clean_window(window)
+        run.metrics.add("clean", pages=len(cleaned), bytes=sum(len(page.encode("utf-8")) for page in cleaned))
+        return cleaned
+
+    def chunk_pages(self, run: IngestionRun, pages: Iterator[str]) -> Iterator[str]:
+        """
+        Chunk the cleaned pages of a file, timed as the chunk stage.
+        The chunks are stored as an artifact of the content, a later run with the same parameters
+        (a retry, a rebuild or another upload of the same content) reads them back instead.
+        """
+        if run.cached_chunks:
+            yield from self._cached_chunks(run)
+            return
+
+        chunk_stats = {}
+        chunks = run.metrics.iterate("chunk", self.doc_chunker.chunk_pages(pages, stats=chunk_stats))
+        if run.chunks_name is None:
+            yield from self._count_chunks(run, chunks)
+        else:
+            with self.artifact_store.chunk_writer(run.files.content_hash, run.chunks_name,
+                                                  self.chunk_params()) as writer:
+                for chunk in self._count_chunks(run, chunks):
+                    writer.write(chunk)
+                    yield chunk
+                writer.page_count = run.progress["page_count"]
+        run.metrics.add("extract", pages=run.progress["page_count"])
+        run.metrics.add("chunk", tokens=chunk_stats.get("tokens", 0))
+
+    def _count_chunks(self, run: IngestionRun, chunks: Iterator[str]) -> Iterator[str]:
+        for chunk in chunks:
+            run.metrics.add("chunk", chunks=1, bytes=len(chunk.encode("utf-8")))
+            yield chunk
+
+    def _cached_chunks(self, run: IngestionRun) -> Iterator[str]:
+        logger.info("Reusing stored chunks for file: {}", run.files.id)
+        summary = {}
+        yield from self._count_chunks(
+            run, run.metrics.iterate("chunk", self.artifact_store.iter_chunks(run.files.content_hash,
+                                                                               run.chunks_name, summary))
+        )
+        run.progress["page_count"] = summary.get("page_count", 0)
+        run.progress["chunking"] = {"cached": True}
+
+    def track_chunk(self, run: IngestionRun, chunk: str) -> Optional[tuple[str, str]]:
+        """
+        Register a chunk of the file. Returns its (id, chunk) pair if it is not indexed yet, None otherwise.
+        """
+        id = chunk_id(run.files.id, chunk, run.seen)
+        run.current_ids.add(id)
+        run.progress["chunk_count"] += 1
+        if id in run.existing_ids and not run.reembed:
+            run.progress["chunks_unchanged"] += 1
+            return None
+        return id, chunk
+
+    def embed_batch(self, run: IngestionRun, batch: list):
+        """
+        Embed one batch of (id, chunk) pairs with the local model, in the compact form of the collection.
+        """
+        chunks = [chunk for _, chunk in batch]
+        with run.metrics.measure("embed"):
+            embeddings = self.batch_encoder.encode(chunks)
+            if not run.codec.is_identity:
+                embeddings = run.codec.compact(embeddings)
+        run.metrics.add("embed", chunks=len(chunks), bytes=sum(len(chunk.encode("utf-8")) for chunk in chunks))
+        return embeddings
+
+    def write_batch(self, run: IngestionRun, batch: list, embeddings):
+        """
+        Upsert one embedded batch of (id, chunk) pairs to ChromaDB and record the progress and
+        stage metrics on the file.
+        """
+        files = run.files
+        ids = [id for id, _ in batch]
+        chunks = [chunk for _, chunk in batch]
+        metadata = [
+            {
+                "text": text,
+                "file_name": files.file_name,
+                "file_id": str(files.id),
+            } for text in chunks
+        ]
+        with run.metrics.measure("upsert"):
+            self.chromadb_client.upsert_documents(
                 ids=ids,
                 documents=chunks,
                 metadatas=metadata,
-                collection_name=collection_name,
-                # embedding_function=self.huggingface_ef
+                embeddings=embeddings.tolist(),
+                collection_name=run.collection_name,
             )
+        run.metrics.add("upsert", chunks=len(chunks), bytes=sum(len(chunk.encode("utf-8")) for chunk in chunks))
 
-            logger.info("Added chunks to ChromaDB for file: {}", files.id)
-            # Update the file status to completed
-            self.file_repository.update(
-                id=files.id,
-                schema=Files(
-                    status="completed",
-                    metadatas={
-                        "collection_name": collection_name,
-                        "chunk_count": len(chunks),
-                        "chunk_size": self.doc_chunker.chunk_size,
-                        "chunk_overlap": self.doc_chunker.chunk_overlap,
-                    },
-                    processing_ended_at=datetime.now()
-                )
+        with run.lock:
+            run.progress["chunks_added"] += len(chunks)
+            run.progress["batch_count"] += 1
+            run.progress["stages"] = run.metrics.as_dict()
+            progress = dict(run.progress)
+        if not run.shadow:
+            self.file_repository.update_attr(files.id, "metadatas", progress)
+        logger.info("Upserted batch {} ({} chunks, {} pages read) for file: {}",
+                    progress["batch_count"], progress["chunks_added"], progress["page_count"], files.id)
+
+    def finish(self, run: IngestionRun):
+        """
+        Remove the chunks that are no longer part of the document and mark the file as completed,
+        unless building a shadow collection.
+        """
+        files, progress = run.files, run.progress
+        if self.file_repository.read_by_id(files.id).status == "deleted":
+            # Deleted while it was ingested, drop what this run wrote instead of completing it
+            logger.info("File {} was deleted during ingestion, removing its chunks", files.id)
+            self.chromadb_client.delete_documents(collection_name=run.collection_name,
+                                                  ids=list(run.existing_ids | run.current_ids))
+            return
+
+        vanished_ids = list(run.existing_ids - run.current_ids)
+        if vanished_ids:
+            with run.metrics.measure("upsert"):
+                self.chromadb_client.delete_documents(collection_name=run.collection_name, ids=vanished_ids)
+            progress["chunks_deleted"] = len(vanished_ids)
+        progress["stages"] = run.metrics.as_dict()
+        progress.pop("rebuild", None)
+
+        logger.info("Indexed {} chunks for file {}: {} added, {} unchanged, {} deleted", progress["chunk_count"],
+                    files.id, progress["chunks_added"], progress["chunks_unchanged"], progress["chunks_deleted"])
+        if run.shadow:
+            return
+        # Update the file status to completed
+        self.file_repository.update(
+            id=files.id,
+            schema=Files(
+                status="completed",
+                metadatas=progress,
+                processing_ended_at=datetime.now()
             )
+        )
 
-        except Exception as e:
-            logger.error("Error processing file: {}", e)
-            # Update the file status to error
-            self.file_repository.update(
-                id=files.id,
-                schema=Files(
-                    status="failed",
-                    processing_ended_at=datetime.now()
-                )
+    def mark_failed(self, files: Files):
+        """
+        Update the file status to failed.
+        """
+        self.file_repository.update(
+            id=files.id,
+            schema=Files(
+                status="failed",
+                processing_ended_at=datetime.now()
             )
+        )
+
+    def _count_pages(self, files: Files, progress: dict) -> Iterator[str]:
+        """
+        Yield the pages of a file while counting them into the progress record.
+        Pages already extracted from identical content are read back from the artifact store,
+        otherwise they are extracted and stored for later uploads of the same content.
+        """
+        for page in self._iter_pages(files, progress):
+            progress["page_count"] += 1
+            yield page
+
+    def _clean_pages(self, pages: Iterator[str], metrics: StageMetrics) -> Iterator[str]:
+        """
+        Clean pages at the configured level, a window of pages at a time across the cleaner's process pool.
+        """
+        for page in self._clean_windows(pages):
+            metrics.add("clean", pages=1, bytes=len(page.encode("utf-8")))
+            yield page
+
+    def _clean_windows(self, pages: Iterator[str]) -> Iterator[str]:
+        window = []
+        for page in pages:
+            window.append(page)
+            if len(window) >= settings.CLEANER_BATCH_PAGES:
+                yield from self._clean_window(window)
+                window = []
+        if window:
+            yield from self._clean_window(window)
+
+    def _clean_window(self, window: list) -> list:
+        if settings.PIPELINE_CLEAN_LEVEL == "none":
+            return window
+        return self.doc_cleaner.clean_batch(window, settings.PIPELINE_CLEAN_LEVEL, workers=settings.CLEANER_WORKERS)
+
+    def _iter_pages(self, files: Files, progress: dict) -> Iterator[str]:
+        if not files.content_hash:
+            yield from self._extract_pages(files.file_path, progress)
+            return
+
+        if self.artifact_store.has(files.content_hash, ArtifactStore.PAGES):
+            logger.info("Reusing extracted pages for file: {}", files.id)
+            progress["extraction"] = {"cached": True}
+            yield from self.artifact_store.iter_pages(files.content_hash)
+            return
+
+        with self.artifact_store.page_writer(files.content_hash) as writer:
+            for page in self._extract_pages(files.file_path, progress):
+                writer.write(page)
+                yield page
+
+    def _extract_pages(self, file_path: str, progress: dict) -> Iterator[str]:
+        """
+        Extract the pages of a PDF file. The extraction throughput is stored under "extraction".
+        """
+        stats = {}
+        yield from self.pdf_extractor.iter_pages(file_path, stats=stats)
+        progress["extraction"] = stats
+
+    def _existing_chunk_ids(self, files: Files, collection_name: str, previous_metadatas: dict) -> set:
+        """
+        Get the ids of the chunks already indexed for a file.
+        """
+        return set(self.chromadb_client.get_file_chunk_ids(collection_name, files.id,
+                                                           previous_metadatas.get("chunk_count", 0)))
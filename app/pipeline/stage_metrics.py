@@ -0,0 +1,134 @@
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+COUNTERS = ("pages", "chunks", "tokens", "bytes")
+
+
+class StageMetrics:
+    """
+    Record wall time, CPU time, peak RSS and counters for each stage of an ingestion run.
+
+    Stages are streamed into each other, so the time is exclusive: while a stage pulls from an inner
+    stage, the inner stage is timed and the outer one is paused. CPU time is the CPU of the calling
+    thread, work done in worker processes only shows up as wall time. Peak RSS is the peak of the
+    process observed when the stage last ran. Stages of the same run may execute on different threads,
+    each thread keeps its own stack of nested stages. Time spent waiting on another thread is left out
+    with pause.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _stage(self, name: str) -> dict:
+        if name not in self.stages:
+            self.stages[name] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": 0.0}
+        return self.stages[name]
+
+    def _enter(self, name: str):
+        now, cpu = time.perf_counter(), time.thread_time()
+        if self._stack:
+            self._accumulate(self._stack[-1], now, cpu)
+        self._stack.append([name, now, cpu])
+
+    def _exit(self):
+        now, cpu = time.perf_counter(), time.thread_time()
+        self._accumulate(self._stack.pop(), now, cpu)
+        if self._stack:
+            # Resume the outer stage from now
+            self._stack[-1][1:] = [now, cpu]
+
+    def _accumulate(self, frame: list, now: float, cpu: float):
+        name, started_at, cpu_started_at = frame
+        if name is None:
+            # Paused, the time is not counted in any stage
+            frame[1:] = [now, cpu]
+            return
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT / (1024 * 1024)
+        with self._lock:
+            stage = self._stage(name)
+            stage["wall_seconds"] += now - started_at
+            stage["cpu_seconds"] += cpu - cpu_started_at
+            stage["peak_rss_mb"] = max(stage["peak_rss_mb"], peak_rss_mb)
+        frame[1:] = [now, cpu]
+
+    @contextmanager
+    def measure(self, name: str):
+        """
+        Time a block of work as part of a stage.
+        """
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    @contextmanager
+    def pause(self):
+        """
+        Stop timing the current stage during a block, e.g. while waiting for the output of another thread.
+        """
+        self._enter(None)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Time the production of every item of an iterable as part of a stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            yield item
+
+    def add(self, name: str, **counters: int):
+        """
+        Add to the counters of a stage, e.g. pages, chunks, tokens or bytes.
+        """
+        with self._lock:
+            stage = self._stage(name)
+            for counter, value in counters.items():
+                stage[counter] = stage.get(counter, 0) + value
+
+    def as_dict(self) -> dict:
+        """
+        The metrics of every stage, with the throughput of each counter.
+        """
+        result = {}
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+        for name, stage in stages.items():
+            wall_seconds = stage["wall_seconds"]
+            result[name] = {
+                "wall_seconds": round(wall_seconds, 4),
+                "cpu_seconds": round(stage["cpu_seconds"], 4),
+                "peak_rss_mb": round(stage["peak_rss_mb"], 1),
+            }
+            for counter in COUNTERS:
+                if counter in stage:
+                    result[name][counter] = stage[counter]
+                    if wall_seconds > 0:
+                        result[name][f"{counter}_per_sec"] = round(stage[counter] / wall_seconds, 2)
+        return result
@@ -0,0 +1,324 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Iterator
+
+from loguru import logger
+
+from app.models.files import Files
+from app.pipeline.pipeline_service import IngestionRun, PipelineService
+
+# End of the pages of a file
+_DONE = object()
+
+
+class _FileTask:
+    """
+    A file flowing through the staged pipeline.
+    """
+
+    def __init__(self, files: Files, service: PipelineService, run: IngestionRun, queue_size: int):
+        self.files = files
+        self.service = service
+        self.run = run
+        self.future = Future()
+        self.error = None
+        # Cleaned pages in document order, consumed by the chunk worker of the file
+        self.pages = queue.Queue(maxsize=queue_size)
+        self.pages_done = False
+        # Cleaned windows arriving out of order, waiting for their turn
+        self.pending_windows = {}
+        self.next_window = 0
+        self.reorder_lock = threading.Lock()
+        # Batches handed to the embed stage and not written yet
+        self.outstanding_batches = 0
+        self.chunking_done = False
+        self.lock = threading.Lock()
+
+    def fail(self, error: Exception):
+        if self.error is None:
+            self.error = error
+
+
+class StagedPipeline:
+    """
+    Ingest several files at once through extract -> clean -> chunk -> embed -> upsert stages.
+
+    Every stage has its own worker threads and a bounded queue in front of it, so the CPU-bound
+    extraction of one file overlaps with the network-bound upsert of another and a slow stage applies
+    backpressure instead of buffering. Windows of pages are cleaned by any clean worker and put back in
+    order; a file is chunked by a single chunk worker since chunks overlap across pages. Files are only
+    admitted when a chunk worker is free for them, so a stage never waits on a file nobody consumes.
+    """
+    STAGES = ("extract", "clean", "chunk", "embed", "upsert")
+
+    def __init__(self,
+                 pipeline_service_factory: Callable[[], PipelineService],
+                 extract_workers: int = 2,
+                 clean_workers: int = 2,
+                 chunk_workers: int = 2,
+                 embed_workers: int = 1,
+                 upsert_workers: int = 2,
+                 queue_size: int = 8,
+                 window_pages: int = 64,
+                 batch_size: int = 128,
+                 poll_interval_seconds: float = 0.5):
+        self.pipeline_service_factory = pipeline_service_factory
+        self.workers = {
+            "extract": extract_workers,
+            "clean": clean_workers,
+            "chunk": chunk_workers,
+            "embed": embed_workers,
+            "upsert": upsert_workers,
+        }
+        self.queue_size = queue_size
+        self.window_pages = window_pages
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+
+        self._queues = {stage: queue.Queue(maxsize=queue_size) for stage in self.STAGES}
+        self._handlers = {
+            "extract": self._extract,
+            "clean": self._clean,
+            "chunk": self._chunk,
+            "embed": self._embed,
+            "upsert": self._upsert,
+        }
+        self._busy = {stage: 0 for stage in self.STAGES}
+        self._processed = {stage: 0 for stage in self.STAGES}
+        self._counters_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(chunk_workers)
+        self._active: set[_FileTask] = set()
+        self._stop_event = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the stage workers in the background.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            logger.info("Starting staged ingestion pipeline with workers {}", self.workers)
+            self._stop_event.clear()
+            for stage in self.STAGES:
+                for index in range(self.workers[stage]):
+                    thread = threading.Thread(target=self._work, args=(stage,), name=f"pipeline-{stage}-{index}",
+                                              daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """
+        Stop the stage workers.
+        """
+        logger.info("Stopping staged ingestion pipeline")
+        self._stop_event.set()
+        with self._lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def submit(self, files: Files) -> Future:
+        """
+        Queue a file, blocking while every chunk worker is taken.
+        :return: A future resolved once the file is completed, or failed with the error of the first failing stage.
+        """
+        self.start()
+        self._slots.acquire()
+        try:
+            service = self.pipeline_service_factory()
+            task = _FileTask(files, service, service.begin(files), self.queue_size)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._counters_lock:
+            self._active.add(task)
+        self._queues["chunk"].put(task)
+        self._queues["extract"].put(task)
+        return task.future
+
+    def run(self, files: Files):
+        """
+        Ingest a file and wait for it, raising on failure like PipelineService.process.
+        """
+        self.submit(files).result()
+
+    def stats(self) -> dict:
+        """
+        Queue depth, busy workers and processed items of every stage.
+        """
+        with self._counters_lock:
+            active = list(self._active)
+            stages = {
+                stage: {
+                    "workers": self.workers[stage],
+                    "busy": self._busy[stage],
+                    "queue_depth": self._queues[stage].qsize(),
+                    "queue_capacity": self.queue_size,
+                    "processed": self._processed[stage],
+                } for stage in self.STAGES
+            }
+        # Cleaned pages waiting for their chunk worker
+        stages["chunk"]["buffered_pages"] = sum(task.pages.qsize() for task in active)
+        return {
+            "running": bool(self._threads),
+            "active_files": len(active),
+            "stages": stages,
+        }
+
+    def _work(self, stage: str):
+        stage_queue, handler = self._queues[stage], self._handlers[stage]
+        while not self._stop_event.is_set():
+            try:
+                item = stage_queue.get(timeout=self.poll_interval_seconds)
+            except queue.Empty:
+                continue
+            with self._counters_lock:
+                self._busy[stage] += 1
+            try:
+                handler(item)
+            except Exception as e:
+                logger.error("Unexpected error in {} stage: {}", stage, e)
+            finally:
+                with self._counters_lock:
+                    self._busy[stage] -= 1
+                    self._processed[stage] += 1
+
+    def _extract(self, task: _FileTask):
+        window, windows = [], 0
+        try:
+            for page in task.service.extract_pages(task.run):
+                if task.error is not None:
+                    break
+                window.append(page)
+                if len(window) >= self.window_pages:
+                    self._queues["clean"].put((task, windows, window))
+                    window, windows = [], windows + 1
+            if window and task.error is None:
+                self._queues["clean"].put((task, windows, window))
+                windows += 1
+        except Exception as e:
+            logger.error("Error extracting file {}: {}", task.files.id, e)
+            task.fail(e)
+        finally:
+            # The end marker always goes through, the chunk worker of the file waits for it
+            self._queues["clean"].put((task, windows, None))
+
+    def _clean(self, item: tuple):
+        task, index, window = item
+        cleaned = window
+        if window is not None and task.error is None:
+            try:
+                cleaned = task.service.clean_window(task.run, window)
+            except Exception as e:
+                logger.error("Error cleaning file {}: {}", task.files.id, e)
+                task.fail(e)
+                cleaned = []
+        elif window is not None:
+            cleaned = []
+
+        # Hand the windows to the chunk worker in document order
+        with task.reorder_lock:
+            task.pending_windows[index] = cleaned
+            while task.next_window in task.pending_windows:
+                pages = task.pending_windows.pop(task.next_window)
+                task.next_window += 1
+                if pages is None:
+                    task.pages.put(_DONE)
+                    continue
+                for page in pages:
+                    task.pages.put(page)
+
+    def _iter_cleaned_pages(self, task: _FileTask) -> Iterator[str]:
+        while True:
+            # The chunker pulls the pages, waiting for the clean workers is not chunking time
+            with task.run.metrics.pause():
+                page = task.pages.get()
+            if page is _DONE:
+                task.pages_done = True
+                return
+            yield page
+
+    def _chunk(self, task: _FileTask):
+        try:
+            batch = []
+            for chunk in task.service.chunk_pages(task.run, self._iter_cleaned_pages(task)):
+                if task.error is not None:
+                    break
+                new_chunk = task.service.track_chunk(task.run, chunk)
+                if new_chunk is None:
+                    continue
+                batch.append(new_chunk)
+                if len(batch) >= self.batch_size:
+                    self._submit_batch(task, batch)
+                    batch = []
+            if batch and task.error is None:
+                self._submit_batch(task, batch)
+        except Exception as e:
+            logger.error("Error chunking file {}: {}", task.files.id, e)
+            task.fail(e)
+        finally:
+            # Drain the pages of a failed file so the clean workers never block on it
+            while not task.pages_done:
+                if task.pages.get() is _DONE:
+                    task.pages_done = True
+            self._slots.release()
+            with task.lock:
+                task.chunking_done = True
+                done = task.outstanding_batches == 0
+            if done:
+                self._complete(task)
+
+    def _submit_batch(self, task: _FileTask, batch: list):
+        with task.lock:
+            task.outstanding_batches += 1
+        self._queues["embed"].put((task, batch))
+
+    def _embed(self, item: tuple):
+        task, batch = item
+        if task.error is not None:
+            self._batch_done(task)
+            return
+        try:
+            embeddings = task.service.embed_batch(task.run, batch)
+        except Exception as e:
+            logger.error("Error embedding file {}: {}", task.files.id, e)
+            task.fail(e)
+            self._batch_done(task)
+            return
+        self._queues["upsert"].put((task, batch, embeddings))
+
+    def _upsert(self, item: tuple):
+        task, batch, embeddings = item
+        try:
+            if task.error is None:
+                task.service.write_batch(task.run, batch, embeddings)
+        except Exception as e:
+            logger.error("Error upserting file {}: {}", task.files.id, e)
+            task.fail(e)
+        finally:
+            self._batch_done(task)
+
+    def _batch_done(self, task: _FileTask):
+        with task.lock:
+            task.outstanding_batches -= 1
+            done = task.chunking_done and task.outstanding_batches == 0
+        if done:
+            self._complete(task)
+
+    def _complete(self, task: _FileTask):
+        with self._counters_lock:
+            self._active.discard(task)
+        if task.error is None:
+            try:
+                task.service.finish(task.run)
+            except Exception as e:
+                task.fail(e)
+        if task.error is None:
+            task.future.set_result(task.run.progress)
+        else:
+            task.future.set_exception(task.error)
+
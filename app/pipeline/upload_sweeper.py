@@ -0,0 +1,57 @@
+import threading
+from typing import Callable, Optional
+
+from loguru import logger
+
+from app.services.file_uploads_service import FileUploadsService
+
+
+class UploadSweeper:
+    """
+    Periodically abort resumable uploads that stopped receiving ranges and remove their part files.
+    """
+
+    def __init__(self, file_uploads_service_factory: Callable[[], FileUploadsService], ttl_seconds: float = 86400,
+                 interval_seconds: float = 3600):
+        self.file_uploads_service_factory = file_uploads_service_factory
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Start sweeping in the background.
+        """
+        if self._thread is not None:
+            return
+        logger.info("Expiring uploads idle for {}s every {}s", self.ttl_seconds, self.interval_seconds)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="upload-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the background sweep.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sweep(self) -> int:
+        """
+        Run a sweep now.
+        :return: The number of expired uploads.
+        """
+        return self.file_uploads_service_factory().expire_abandoned(self.ttl_seconds)
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                expired = self.sweep()
+                if expired:
+                    logger.info("Upload sweep expired {} uploads", expired)
+            except Exception as e:
+                logger.error("Error expiring abandoned uploads: {}", e)
@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+from loguru import logger
+
+
+class VectorArchive:
+    """
+    Cold storage for the indexed chunks of archived files.
+
+    Every file is archived into a single compressed npz holding its embeddings as a float32 matrix
+    and its ids, documents and metadatas as UTF-8 JSON, so restoring needs neither parsing nor
+    embedding and loading never unpickles anything. The archive also records what made the
+    embeddings, so they are not restored into a collection now embedded differently.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, file_id: uuid.UUID) -> str:
+        name = str(file_id)
+        return os.path.join(self.root, name[:2], name + ".npz")
+
+    def write(self, file_id: uuid.UUID, records: dict, embedding: dict) -> str:
+        """
+        Write the records of a file, replacing any previous archive once fully written.
+        :param records: The ids, documents, metadatas and embeddings of the chunks of the file.
+        :param embedding: What made the embeddings, see FilesService.embedding_signature.
+        :return: The path of the archive.
+        """
+        path = self.path(file_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One temporary file per writer, concurrent archives of the same file do not clobber each other
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        text = json.dumps({
+            "ids": records["ids"],
+            "documents": records["documents"],
+            "metadatas": records["metadatas"],
+            "embedding": embedding,
+        }, ensure_ascii=False)
+        try:
+            np.savez_compressed(
+                tmp_path,
+                embeddings=np.asarray(records["embeddings"], dtype=np.float32),
+                records=np.frombuffer(text.encode("utf-8"), dtype=np.uint8),
+            )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info("Archived {} chunks of file {} to {}", len(records["ids"]), file_id, path)
+        return path
+
+    def read(self, file_id: uuid.UUID) -> dict:
+        """
+        Read the records of an archived file. Archives written before the embedding was recorded have
+        an embedding of None.
+        """
+        with np.load(self.path(file_id), allow_pickle=False) as archive:
+            records = json.loads(archive["records"].tobytes().decode("utf-8"))
+            records["embeddings"] = archive["embeddings"]
+        records.setdefault("embedding", None)
+        return records
+
+    def remove(self, file_id: uuid.UUID):
+        path = self.path(file_id)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,56 @@
+import threading
+from typing import Callable, Optional
+
+from loguru import logger
+
+from app.services.files_service import FilesService
+
+
+class VectorPurger:
+    """
+    Periodically delete the chunks of files that no longer exist or were deleted.
+    """
+
+    def __init__(self, files_service_factory: Callable[[], FilesService], interval_seconds: float = 3600):
+        self.files_service_factory = files_service_factory
+        self.interval_seconds = interval_seconds
+        self.last_report: Optional[dict] = None
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Start purging in the background.
+        """
+        if self._thread is not None:
+            return
+        logger.info("Purging orphaned chunks every {}s", self.interval_seconds)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="vector-purger", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the background purge.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def purge(self) -> dict:
+        """
+        Run a purge now.
+        :return: The number of chunks scanned and reclaimed in each collection and in total.
+        """
+        self.last_report = self.files_service_factory().purge_orphan_chunks()
+        return self.last_report
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                report = self.purge()
+                logger.info("Purge scanned {} chunks and reclaimed {}", report["scanned"], report["reclaimed"])
+            except Exception as e:
+                logger.error("Error purging orphaned chunks: {}", e)
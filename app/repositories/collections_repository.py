@@ -1,5 +1,6 @@
+import uuid
 from contextlib import AbstractContextManager
-from typing import Callable
+from typing import Callable, Optional
 
 from sqlalchemy.orm import Session
 
@@ -19,3 +20,19 @@ class CollectionsRepository(BaseRepository, RepositoryProtocol):
         """
         with self.session_factory() as session:
             return session.query(Collections).filter(Collections.collection_name == name).first()
+
+    def swap_alias(self, id: uuid.UUID, shadow_name: str) -> Optional[str]:
+        """
+        Point a collection to its completed shadow in a single transaction.
+        :return: The name of the Chroma collection it pointed to before, or None if the shadow is not the
+            one being built anymore.
+        """
+        with self.session_factory() as session:
+            collection = session.query(Collections).filter(Collections.id == id).with_for_update().first()
+            if not collection or collection.shadow_name != shadow_name:
+                return None
+            previous_name = collection.active_name
+            collection.chroma_name = shadow_name
+            collection.shadow_name = None
+            session.commit()
+            return previous_name
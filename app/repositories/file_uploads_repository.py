@@ -0,0 +1,73 @@
+import uuid
+from contextlib import AbstractContextManager
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.models.file_uploads import FileUploads
+from app.repositories.base_repository import BaseRepository
+from app.services.base_service import RepositoryProtocol
+
+
+class FileUploadsRepository(BaseRepository, RepositoryProtocol):
+    """
+    File uploads repository class for the state of resumable uploads.
+    """
+
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]):
+        self.session_factory = session_factory
+        super().__init__(session_factory, FileUploads)
+
+    def advance(self, id: uuid.UUID, from_offset: int, to_offset: int) -> bool:
+        """
+        Move the received offset of an upload forward, only if it is still at from_offset.
+        Returns False when another request already moved it.
+        """
+        with self.session_factory() as session:
+            updated = session.query(FileUploads).filter(
+                FileUploads.id == id,
+                FileUploads.status == "uploading",
+                FileUploads.received_bytes == from_offset,
+            ).update({
+                "received_bytes": to_offset,
+                "updated_at": datetime.now(),
+            })
+            session.commit()
+            return updated > 0
+
+    def expire(self, updated_before: datetime) -> list[FileUploads]:
+        """
+        Abort the uploads still in progress that received no range since the given time.
+        :return: The expired uploads.
+        """
+        with self.session_factory() as session:
+            uploads = session.query(FileUploads).filter(
+                FileUploads.status == "uploading",
+                FileUploads.updated_at < updated_before,
+            ).with_for_update(skip_locked=True).all()
+
+            now = datetime.now()
+            for upload in uploads:
+                upload.status = "aborted"
+                upload.updated_at = now
+            session.commit()
+            for upload in uploads:
+                session.refresh(upload)
+            return uploads
+
+    def complete(self, id: uuid.UUID) -> bool:
+        """
+        Mark a fully received upload as completed. Returns False if it was already finalized.
+        """
+        with self.session_factory() as session:
+            updated = session.query(FileUploads).filter(
+                FileUploads.id == id,
+                FileUploads.status == "uploading",
+                FileUploads.received_bytes == FileUploads.file_size,
+            ).update({
+                "status": "completed",
+                "updated_at": datetime.now(),
+            })
+            session.commit()
+            return updated > 0
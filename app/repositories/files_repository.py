@@ -1,9 +1,10 @@
 import uuid
 from contextlib import AbstractContextManager
-from typing import Callable
+from typing import Callable, Optional
 
 from sqlalchemy.orm import Session
 
+from app.models.collections import Collections
 from app.models.files import Files
 from app.repositories.base_repository import BaseRepository
 from app.services.base_service import RepositoryProtocol
@@ -16,13 +17,132 @@ class FilesRepository(BaseRepository, RepositoryProtocol):
 
     def get_collection_name(self, collection_id: uuid.UUID) -> str:
         """
-        Get the collection name from the database using the collection ID.
+        Get the name of the Chroma collection currently serving a collection.
         """
         with self.session_factory() as session:
             file_entry = session.query(Files).filter(Files.collection_id == collection_id).join(
                 Files.collection
             ).first()
             if file_entry and file_entry.collection:
-                return file_entry.collection.collection_name
+                return file_entry.collection.active_name
             else:
                 raise ValueError(f"Collection with ID {collection_id} not found.")
+
+    def get_chroma_names(self, collection_id: uuid.UUID) -> list[str]:
+        """
+        Get the Chroma collections holding chunks of a collection: the serving one and the shadow being built.
+        """
+        with self.session_factory() as session:
+            collection = session.query(Collections).filter(Collections.id == collection_id).first()
+            if not collection:
+                raise ValueError(f"Collection with ID {collection_id} not found.")
+            return [collection.active_name] + ([collection.shadow_name] if collection.shadow_name else [])
+
+    def get_completed_by_hash(self, content_hash: str, collection_id: uuid.UUID) -> Optional[Files]:
+        """
+        Get a completed file with the given content hash in a collection.
+        """
+        with self.session_factory() as session:
+            return session.query(Files).filter(
+                Files.content_hash == content_hash,
+                Files.collection_id == collection_id,
+                Files.status == "completed",
+            ).order_by(Files.created_at).first()
+
+    def get_completed_hashes(self, content_hashes: list[str], collection_id: uuid.UUID) -> dict:
+        """
+        Get the completed files of a collection having one of the given content hashes.
+        :return: A dict of content hash to the oldest completed file with that content.
+        """
+        found = {}
+        with self.session_factory() as session:
+            files = session.query(Files).filter(
+                Files.content_hash.in_(content_hashes),
+                Files.collection_id == collection_id,
+                Files.status == "completed",
+            ).order_by(Files.created_at).all()
+            for file in files:
+                found.setdefault(file.content_hash, file)
+        return found
+
+    def create_many(self, schemas: list[Files]) -> list[Files]:
+        """
+        Create several files in a single transaction.
+        IDs and defaults are set on the given schemas, which are returned as the created files.
+        """
+        with self.session_factory() as session:
+            session.add_all([Files(**schema.model_dump(exclude_none=True)) for schema in schemas])
+            session.commit()
+        return schemas
+
+    def get_completed_metadatas(self, collection_id: Optional[uuid.UUID] = None) -> list[dict]:
+        """
+        Get the metadatas of the completed files, optionally in a single collection.
+        """
+        with self.session_factory() as session:
+            query = session.query(Files.metadatas).filter(Files.status == "completed")
+            if collection_id is not None:
+                query = query.filter(Files.collection_id == collection_id)
+            return [metadatas or {} for metadatas, in query.all()]
+
+    def get_indexed_originals(self, collection_id: uuid.UUID) -> list[Files]:
+        """
+        Get the completed files of a collection that indexed their own chunks, i.e. are not duplicates.
+        """
+        with self.session_factory() as session:
+            return session.query(Files).filter(
+                Files.collection_id == collection_id,
+                Files.status == "completed",
+                Files.metadatas["duplicate_of"].as_string().is_(None),
+            ).order_by(Files.created_at).all()
+
+    def get_live_duplicates(self, file_id: uuid.UUID) -> list[Files]:
+        """
+        Get the files that are not deleted and reuse the chunks of the given file.
+        """
+        with self.session_factory() as session:
+            return session.query(Files).filter(
+                Files.metadatas["duplicate_of"].as_string() == str(file_id),
+                Files.status != "deleted",
+            ).all()
+
+    def count_live_by_path(self, file_path: str) -> int:
+        """
+        Count the files that are not deleted and point to a stored object.
+        """
+        with self.session_factory() as session:
+            return session.query(Files).filter(Files.file_path == file_path, Files.status != "deleted").count()
+
+    def get_live_owner_ids(self, file_ids: list[uuid.UUID]) -> set[uuid.UUID]:
+        """
+        Get which of the given files still need their chunks: the files that are not deleted, and the
+        deleted files whose chunks are reused by a duplicate that is not deleted.
+        """
+        with self.session_factory() as session:
+            live = {id for id, in session.query(Files.id).filter(Files.id.in_(file_ids), Files.status != "deleted")}
+            originals = session.query(Files.metadatas["duplicate_of"].as_string()).filter(
+                Files.metadatas["duplicate_of"].as_string().in_([str(id) for id in file_ids]),
+                Files.status != "deleted",
+            ).distinct()
+            live.update(uuid.UUID(original) for original, in originals)
+        return live
+
+    def get_collection(self, collection_id: uuid.UUID) -> Optional[Collections]:
+        """
+        Get the collection of the files.
+        """
+        with self.session_factory() as session:
+            return session.query(Collections).filter(Collections.id == collection_id).first()
+
+    def get_collection_names(self) -> list[str]:
+        """
+        Get the names of the Chroma collections of all the collections, shadows included.
+        """
+        names = []
+        with self.session_factory() as session:
+            for collection in session.query(Collections).all():
+                if collection.active_name:
+                    names.append(collection.active_name)
+                if collection.shadow_name:
+                    names.append(collection.shadow_name)
+        return names
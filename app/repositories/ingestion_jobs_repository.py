@@ -0,0 +1,148 @@
+import uuid
+from contextlib import AbstractContextManager
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.ingestion_jobs import IngestionJobs
+from app.repositories.base_repository import BaseRepository
+from app.services.base_service import RepositoryProtocol
+
+
+class IngestionJobsRepository(BaseRepository, RepositoryProtocol):
+    """
+    Ingestion jobs repository, a durable queue on top of the ingestion_jobs table.
+    Claims use SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never pick the same job.
+    """
+
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]):
+        self.session_factory = session_factory
+        super().__init__(session_factory, IngestionJobs)
+
+    def enqueue(self, file_id: uuid.UUID, priority: int = 0, max_attempts: int = 3) -> IngestionJobs:
+        """
+        Add a new job for the given file to the queue.
+        """
+        return self.create(
+            IngestionJobs(
+                file_id=file_id,
+                priority=priority,
+                max_attempts=max_attempts,
+            )
+        )
+
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[IngestionJobs]:
+        """
+        Claim the next available job, shortest first, and lease it to the worker.
+        """
+        now = datetime.now()
+        with self.session_factory() as session:
+            job = session.query(IngestionJobs).filter(
+                IngestionJobs.status == "queued",
+                IngestionJobs.available_at <= now,
+            ).order_by(
+                IngestionJobs.priority, IngestionJobs.created_at
+            ).with_for_update(skip_locked=True).first()
+
+            if not job:
+                session.commit()
+                return None
+
+            job.status = "running"
+            job.locked_by = worker_id
+            job.attempts += 1
+            job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+            job.updated_at = now
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def heartbeat(self, id: uuid.UUID, worker_id: str, lease_seconds: int) -> bool:
+        """
+        Extend the lease of a running job. Returns False if the worker lost the lease.
+        """
+        with self.session_factory() as session:
+            updated = session.query(IngestionJobs).filter(
+                IngestionJobs.id == id,
+                IngestionJobs.status == "running",
+                IngestionJobs.locked_by == worker_id,
+            ).update({
+                "lease_expires_at": datetime.now() + timedelta(seconds=lease_seconds),
+            })
+            session.commit()
+            return updated > 0
+
+    def complete(self, id: uuid.UUID, worker_id: str) -> bool:
+        """
+        Mark a job as completed. Returns False if the worker lost the lease.
+        """
+        return self._finish(id, worker_id, status="completed")
+
+    def retry(self, id: uuid.UUID, worker_id: str, error: str, delay_seconds: float) -> bool:
+        """
+        Put a job back in the queue, available again after the given delay.
+        Returns False if the worker lost the lease.
+        """
+        return self._finish(id, worker_id, status="queued", last_error=error,
+                            available_at=datetime.now() + timedelta(seconds=delay_seconds))
+
+    def fail(self, id: uuid.UUID, worker_id: str, error: str) -> bool:
+        """
+        Mark a job as permanently failed. Returns False if the worker lost the lease.
+        """
+        return self._finish(id, worker_id, status="failed", last_error=error)
+
+    def _finish(self, id: uuid.UUID, worker_id: str, **values) -> bool:
+        # Only the worker holding the lease may finish the job, it may have been handed to another one since
+        with self.session_factory() as session:
+            updated = session.query(IngestionJobs).filter(
+                IngestionJobs.id == id,
+                IngestionJobs.status == "running",
+                IngestionJobs.locked_by == worker_id,
+            ).update({
+                **values,
+                "locked_by": None,
+                "lease_expires_at": None,
+                "updated_at": datetime.now(),
+            })
+            session.commit()
+            return updated > 0
+
+    def recover_expired(self) -> tuple[list[uuid.UUID], list[uuid.UUID]]:
+        """
+        Recover running jobs whose lease expired, e.g. after a worker crashed.
+        Jobs with attempts left are re-queued, the others are failed.
+        :return: The file IDs of the re-queued jobs and of the failed jobs.
+        """
+        now = datetime.now()
+        requeued, failed = [], []
+        with self.session_factory() as session:
+            jobs = session.query(IngestionJobs).filter(
+                IngestionJobs.status == "running",
+                IngestionJobs.lease_expires_at < now,
+            ).with_for_update(skip_locked=True).all()
+
+            for job in jobs:
+                if job.attempts < job.max_attempts:
+                    job.status = "queued"
+                    job.available_at = now
+                    requeued.append(job.file_id)
+                else:
+                    job.status = "failed"
+                    failed.append(job.file_id)
+                job.last_error = f"Lease held by {job.locked_by} expired"
+                job.locked_by = None
+                job.lease_expires_at = None
+                job.updated_at = now
+            session.commit()
+        return requeued, failed
+
+    def count_active(self) -> int:
+        """
+        Count the jobs that are queued or running.
+        """
+        with self.session_factory() as session:
+            return session.query(IngestionJobs).filter(
+                IngestionJobs.status.in_(["queued", "running"])
+            ).count()
@@ -1,7 +1,7 @@
 import uuid
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.schema.base_schema import FindBase
 from app.utils.schema import as_form
@@ -20,7 +20,10 @@ class FindCollection(FindBase, BaseCollection): ...
 
 class ListCollection(BaseCollection):
     id: uuid.UUID
+    vector_dimensions: Optional[int] = None
 
 
 @as_form
-class CreateCollectionRequest(BaseCollection): ...
+class CreateCollectionRequest(BaseCollection):
+    # Store the leading dimensions of the vectors only, None keeps them all
+    vector_dimensions: Optional[int] = Field(default=None, gt=0)
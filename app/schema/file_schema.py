@@ -31,11 +31,38 @@ class CreateFileRequest:
         self.collection_id = collection_id
 
 
+class UpdateFileRequest:
+    def __init__(
+            self,
+            file: UploadFile = File(...)
+    ):
+        self.file = file
+
+
+class InitiateUploadRequest(BaseModel):
+    collection_id: uuid.UUID
+    file_name: str
+    file_type: str = "application/pdf"
+    file_size: int
+
+
+class ResponseFileUpload(BaseModel):
+    id: uuid.UUID
+    collection_id: uuid.UUID
+    file_name: str
+    file_type: str
+    file_size: int
+    received_bytes: int
+    status: str
+    file_id: Optional[uuid.UUID] = None
+
+
 class ResponseFiles(BaseModel):
     id: uuid.UUID
     file_name: str
     file_path: str
     file_type: str
     file_size: int
+    content_hash: Optional[str] = None
     status: str
     collection_id: uuid.UUID
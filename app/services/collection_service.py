@@ -1,30 +1,29 @@
-import chromadb.utils.embedding_functions as embedding_functions
 from asyncpg import NotNullViolationError
 from chromadb.errors import InvalidArgumentError
 
-from app.core.config import settings
-from app.core.exceptions import ValidationError
+from app.core.exceptions import NotFoundError, ValidationError
+from app.models.collections import Collections
 from app.repositories import CollectionsRepository
 from app.schema.collection_schema import CreateCollectionRequest
 from app.services.base_service import BaseService
 from rag.chroma.client import ChromaDBHttpClient
+from rag.embedding.local_embedding_function import LocalEmbeddingFunction
+from rag.embedding.vector_codec import VectorCodec
 
 
 class CollectionsService(BaseService):
     """
     Collection service class for handling collection-related operations.
     """
-    huggingface_ef = embedding_functions.HuggingFaceEmbeddingFunction(
-        api_key=settings.HUGGINGFACE_API_KEY,
-        model_name="sentence-transformers/all-mpnet-base-v2"
-    )
 
     def __init__(self, collections_repository: CollectionsRepository, chromadb_client: ChromaDBHttpClient,
-                 embedding_model) -> None:
+                 embedding_model, embedding_function: LocalEmbeddingFunction) -> None:
         self.collections_repository = collections_repository
 
         # Initialize the chromadb client service
         self.embedding_model = embedding_model
+        # Registered on the Chroma collections, query texts are embedded with the local model
+        self.embedding_function = embedding_function
         self.chromadb_client = chromadb_client
         super().__init__(collections_repository)
 
@@ -32,20 +31,26 @@ class CollectionsService(BaseService):
         """
         Create a new collection with the given name. Creates ChromaDB collection and saves to repository.
         If ChromaDB creation fails, repository record is deleted.
+        The vector options of the request decide how the vectors of the collection are stored, see VectorCodec.
         """
 
+        # Rejects unsupported vector options before anything is created
+        codec = VectorCodec(payload.vector_dimensions)
         collection = self.collections_repository.create(payload)
         try:
             # Create in repository first
             # Create ChromaDB collection
+            metadata = {
+                "id": collection.id,
+                "description": collection.description,
+                "created_at": collection.created_at,
+            }
+            if codec.dimensions is not None:
+                metadata["vector_dimensions"] = codec.dimensions
             self.chromadb_client.create_collection(
                 collection_name=collection.collection_name,
-                metadata={
-                    "id": collection.id,
-                    "description": collection.description,
-                    "created_at": collection.created_at,
-                },
-                embedding_function=self.huggingface_ef,
+                metadata=metadata,
+                embedding_function=self.embedding_function,
             )
 
             return collection
@@ -58,6 +63,15 @@ class CollectionsService(BaseService):
             self.collections_repository.delete_by_id(collection.id)
             raise e
 
+    def get_by_name(self, collection_name: str) -> Collections:
+        """
+        Get a collection by name.
+        """
+        collection = self.collections_repository.get_by_name(collection_name)
+        if not collection:
+            raise NotFoundError(detail=f"Collection with name {collection_name} not found")
+        return collection
+
     def get_documents(self, collection_name: str) -> list:
         """
         Get documents from a collection in ChromaDB.
@@ -65,7 +79,7 @@ class CollectionsService(BaseService):
         try:
             # Get documents from ChromaDB
             documents = self.chromadb_client.get_documents(
-                collection_name=collection_name,
+                collection_name=self.get_by_name(collection_name).active_name,
             )
             return documents
 
@@ -83,8 +97,10 @@ class CollectionsService(BaseService):
             # Delete from repository
             self.collections_repository.delete_by_id(collection.id)
 
-            # Delete from ChromaDB
-            self.chromadb_client.delete_collection(collection_name=collection_name)
+            # Delete from ChromaDB, with the shadow of a re-index in progress
+            self.chromadb_client.delete_collection(collection_name=collection.active_name)
+            if collection.shadow_name:
+                self.chromadb_client.delete_collection(collection_name=collection.shadow_name)
 
         except InvalidArgumentError as e:
             raise ValidationError(detail=f"Collection name '{collection_name}' is invalid. {str(e)}")
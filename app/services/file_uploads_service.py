@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+import aiofiles
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+
+from app.core.config import settings
+from app.core.exceptions import ConflictError, ValidationError
+from app.models.file_uploads import FileUploads
+from app.models.files import Files
+from app.repositories.file_uploads_repository import FileUploadsRepository
+from app.schema.file_schema import InitiateUploadRequest
+from app.services.base_service import BaseService
+from app.services.files_service import BLOCK_SIZE, FilesService
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class FileUploadsService(BaseService):
+    """
+    File uploads service class for resumable uploads.
+
+    A client initiates an upload, PUTs byte ranges in order and finalizes it. Ranges are written to a
+    part file in fixed-size blocks with async file I/O, so memory use does not depend on the file size.
+    The SHA-256 is computed while the data arrives; when the running hash is not available (another
+    process served an earlier range, or a restart) it is recomputed from the part file on finalize.
+    Uploads that stop receiving ranges are aborted by expire_abandoned.
+    """
+    # Running hashes of in-progress uploads: upload ID -> (offset covered, hash, monotonic time of the last range)
+    _hashers: dict = {}
+    _hashers_lock = threading.Lock()
+
+    def __init__(self, file_uploads_repository: FileUploadsRepository, files_service: FilesService) -> None:
+        self.file_uploads_repository = file_uploads_repository
+        self.files_service = files_service
+        super().__init__(file_uploads_repository)
+
+    def initiate(self, payload: InitiateUploadRequest) -> FileUploads:
+        """
+        Start a resumable upload and reserve its part file.
+        """
+        if payload.file_size <= 0 or payload.file_size > settings.UPLOAD_MAX_SIZE:
+            raise ValidationError(detail=f"File size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes")
+
+        upload_id = uuid.uuid4()
+        part_dir = os.path.join(settings.FILE_PATH, "uploads")
+        os.makedirs(part_dir, exist_ok=True)
+        part_path = os.path.join(part_dir, f"{upload_id}.part")
+        open(part_path, "wb").close()
+
+        logger.info("Initiated upload {} of {} ({} bytes)", upload_id, payload.file_name, payload.file_size)
+        return self.file_uploads_repository.create(
+            FileUploads(
+                id=upload_id,
+                collection_id=payload.collection_id,
+                file_name=payload.file_name,
+                file_type=payload.file_type,
+                file_size=payload.file_size,
+                part_path=part_path,
+            )
+        )
+
+    async def write_range(self, upload_id: uuid.UUID, content_range: str,
+                          stream: AsyncIterator[bytes]) -> FileUploads:
+        """
+        Write a byte range of an upload from the request body stream.
+
+        The range must start at or before the received offset, bytes already received are skipped.
+        Whatever arrives before a disconnect is kept, the client resumes from the received offset.
+        :param content_range: Content-Range header, "bytes <start>-<end>/<total>".
+        """
+        start, end, total = self._parse_content_range(content_range)
+        upload = await run_in_threadpool(self.file_uploads_repository.read_by_id, upload_id)
+        if upload.status != "uploading":
+            raise ConflictError(detail=f"Upload {upload_id} is {upload.status}")
+        if (total is not None and total != upload.file_size) or end >= upload.file_size:
+            raise ValidationError(detail=f"Range {content_range} does not fit a {upload.file_size} bytes upload")
+
+        offset = upload.received_bytes
+        if start > offset:
+            raise ConflictError(detail=f"Range must start at or before byte {offset}",
+                                headers=self._range_header(offset))
+
+        skip = offset - start
+        remaining = max(0, end + 1 - offset)
+        hasher = self._take_hasher(upload_id, offset)
+        written = 0
+        overflow = False
+        buffer = bytearray()
+        try:
+            async with aiofiles.open(upload.part_path, "r+b") as f:
+                await f.seek(offset)
+                try:
+                    async for data in stream:
+                        if skip:
+                            cut = min(skip, len(data))
+                            data, skip = data[cut:], skip - cut
+                        take = remaining - written - len(buffer)
+                        if len(data) > take:
+                            data, overflow = data[:take], True
+                        buffer += data
+                        if len(buffer) >= BLOCK_SIZE:
+                            written += await self._write_block(f, buffer, hasher)
+                        if overflow:
+                            break
+                finally:
+                    if buffer:
+                        written += await self._write_block(f, buffer, hasher)
+        finally:
+            await run_in_threadpool(self._commit_range, upload_id, offset, written, hasher)
+
+        if overflow:
+            raise ValidationError(detail=f"Request body is longer than the range {content_range}")
+        return await run_in_threadpool(self.file_uploads_repository.read_by_id, upload_id)
+
+    async def finalize(self, upload_id: uuid.UUID) -> Files:
+        """
+        Finish a fully received upload and create its file.
+        """
+        upload = await run_in_threadpool(self.file_uploads_repository.read_by_id, upload_id)
+        if upload.status != "uploading":
+            raise ConflictError(detail=f"Upload {upload_id} is {upload.status}")
+        if upload.received_bytes != upload.file_size:
+            raise ConflictError(detail=f"Upload is incomplete, {upload.received_bytes} of {upload.file_size} bytes",
+                                headers=self._range_header(upload.received_bytes))
+
+        content_hash = self._finished_hash(upload_id, upload.file_size)
+        if content_hash is None:
+            content_hash = await self._hash_file(upload.part_path)
+        if not await run_in_threadpool(self.file_uploads_repository.complete, upload_id):
+            raise ConflictError(detail=f"Upload {upload_id} is already finalized")
+
+        files = await run_in_threadpool(self.files_service.create_from_upload, upload, content_hash)
+        await run_in_threadpool(self.file_uploads_repository.update_attr, upload_id, "file_id", files.id)
+        logger.info("Finalized upload {} as file {}", upload_id, files.id)
+        return files
+
+    def abort(self, upload_id: uuid.UUID) -> FileUploads:
+        """
+        Abort an upload and remove its part file.
+        """
+        upload = self.file_uploads_repository.read_by_id(upload_id)
+        if upload.status != "uploading":
+            raise ConflictError(detail=f"Upload {upload_id} is {upload.status}")
+        with self._hashers_lock:
+            self._hashers.pop(upload_id, None)
+        if os.path.exists(upload.part_path):
+            os.remove(upload.part_path)
+        return self.file_uploads_repository.update_attr(upload_id, "status", "aborted")
+
+    def expire_abandoned(self, ttl_seconds: float) -> int:
+        """
+        Abort the uploads that received no range for ttl_seconds, remove their part files and drop the
+        running hashes of this process that were not used for as long.
+        :return: The number of expired uploads.
+        """
+        uploads = self.file_uploads_repository.expire(datetime.now() - timedelta(seconds=ttl_seconds))
+        expired_ids = {upload.id for upload in uploads}
+        stale_before = time.monotonic() - ttl_seconds
+        with self._hashers_lock:
+            for upload_id, (_, _, touched_at) in list(self._hashers.items()):
+                if upload_id in expired_ids or touched_at < stale_before:
+                    del self._hashers[upload_id]
+
+        for upload in uploads:
+            if os.path.exists(upload.part_path):
+                os.remove(upload.part_path)
+            logger.info("Expired upload {} of {} at {} of {} bytes", upload.id, upload.file_name,
+                        upload.received_bytes, upload.file_size)
+        return len(uploads)
+
+    @staticmethod
+    def _parse_content_range(content_range: str) -> tuple[int, int, Optional[int]]:
+        match = CONTENT_RANGE.match(content_range.strip())
+        if not match:
+            raise ValidationError(detail=f"Invalid Content-Range '{content_range}', expected 'bytes start-end/total'")
+        start, end = int(match.group(1)), int(match.group(2))
+        if end < start:
+            raise ValidationError(detail=f"Invalid Content-Range '{content_range}'")
+        total = None if match.group(3) == "*" else int(match.group(3))
+        return start, end, total
+
+    @staticmethod
+    def _range_header(received_bytes: int) -> Optional[dict]:
+        # Tells the client which bytes are already stored
+        return {"Range": f"bytes=0-{received_bytes - 1}"} if received_bytes else None
+
+    @staticmethod
+    async def _write_block(f, buffer: bytearray, hasher) -> int:
+        block = bytes(buffer)
+        buffer.clear()
+        await f.write(block)
+        if hasher is not None:
+            hasher.update(block)
+        return len(block)
+
+    def _commit_range(self, upload_id: uuid.UUID, offset: int, written: int, hasher):
+        if written and not self.file_uploads_repository.advance(upload_id, offset, offset + written):
+            logger.warning("Upload {} moved past byte {} concurrently, dropping the range", upload_id, offset)
+            return
+        if hasher is not None:
+            with self._hashers_lock:
+                self._hashers[upload_id] = (offset + written, hasher, time.monotonic())
+
+    def _take_hasher(self, upload_id: uuid.UUID, offset: int):
+        # The request owns the running hash until it commits its range, concurrent requests start without one
+        with self._hashers_lock:
+            covered, hasher, _ = self._hashers.pop(upload_id, (None, None, None))
+        if covered == offset:
+            return hasher
+        return hashlib.sha256() if offset == 0 else None
+
+    def _finished_hash(self, upload_id: uuid.UUID, file_size: int) -> Optional[str]:
+        with self._hashers_lock:
+            covered, hasher, _ = self._hashers.pop(upload_id, (None, None, None))
+        return hasher.hexdigest() if covered == file_size else None
+
+    @staticmethod
+    async def _hash_file(path: str) -> str:
+        sha256 = hashlib.sha256()
+        async with aiofiles.open(path, "rb") as f:
+            while block := await f.read(BLOCK_SIZE):
+                sha256.update(block)
+        return sha256.hexdigest()
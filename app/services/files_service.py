@@ -1,56 +1,402 @@
+import hashlib
+import os
 import uuid
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
 
 from app.core.config import settings
+from app.core.exceptions import ConflictError, NotFoundError
+from app.models.file_uploads import FileUploads
 from app.models.files import Files
+from app.pipeline.stage_metrics import COUNTERS
+from app.pipeline.vector_archive import VectorArchive
 from app.repositories.files_repository import FilesRepository
-from app.schema.file_schema import CreateFileRequest
+from app.schema.file_schema import CreateFileRequest, UpdateFileRequest
 from app.services.base_service import BaseService
 from app.utils.random_name_generator import random_name_generator
+from rag.chroma.client import ChromaDBHttpClient
+
+# Size of the blocks read from an upload while it is hashed and written to disk
+BLOCK_SIZE = 1024 * 1024
 
 
 class FilesService(BaseService):
     """
     Files service class for handling file-related operations.
     """
+    vector_archive = VectorArchive(root=os.path.join(settings.FILE_PATH, "archives"))
 
-    def __init__(self, files_repository: FilesRepository) -> None:
+    def __init__(self, files_repository: FilesRepository, chromadb_client: ChromaDBHttpClient = None,
+                 embedding_model_name: Optional[str] = None) -> None:
+        """
+        :param embedding_model_name: Name of the model embedding the chunks, on its backend, recorded with
+            archived vectors.
+        """
         self.files_repository = files_repository
+        self.chromadb_client = chromadb_client
+        self.embedding_model_name = embedding_model_name
         super().__init__(files_repository)
 
-    def _save_to_local(self, file, full_path):
+    def _save_to_local(self, file, file_extension: str) -> tuple[str, str, int]:
+        """
+        Save the file to the local filesystem, hashing it while it streams to disk.
+        The file is stored content-addressed, identical uploads end up in the same place.
+        :return: The stored path, the SHA-256 of the content and its size in bytes.
+        """
+        return self.store_stream(file.file, file_extension)
+
+    def store_stream(self, stream, file_extension: str) -> tuple[str, str, int]:
+        """
+        Write a binary stream into the content-addressed store, in blocks.
+        :return: The stored path, the SHA-256 of the content and its size in bytes.
+        """
+        tmp_dir = os.path.join(settings.FILE_PATH, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, random_name_generator(file_extension))
+
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while block := stream.read(BLOCK_SIZE):
+                    sha256.update(block)
+                    f.write(block)
+                    size += len(block)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        content_hash = sha256.hexdigest()
+        return self._store_content(tmp_path, content_hash, file_extension), content_hash, size
+
+    @staticmethod
+    def _store_content(tmp_path: str, content_hash: str, file_extension: str) -> str:
         """
-        Save the file to the local filesystem.
+        Move a fully written file into the content-addressed store.
         """
-        with open(full_path, "wb") as f:
-            f.write(file.file.read())
+        if not file_extension.startswith("."):
+            file_extension = "." + file_extension
+        full_path = os.path.join(settings.FILE_PATH, "objects", content_hash[:2], content_hash + file_extension)
+        if os.path.exists(full_path):
+            # Same content already stored, keep a single copy
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp_path, full_path)
         return full_path
 
     def create(self, file: CreateFileRequest):
         """
         Create a new file.
+        If the same content was already ingested in the collection, the existing chunks are reused
+        and the new file is created as completed.
         """
-        # Generate random file name
         file.file_name = file.file.filename
-        file.file_path = str(settings.FILE_PATH) + "/" + random_name_generator(file.file.filename.split(".")[-1])
         file.file_type = file.file.content_type
-        file.file_size = file.file.size
 
         # Save file to local storage
         try:
-            self._save_to_local(file.file, file.file_path)
+            file.file_path, file.content_hash, file.file_size = self._save_to_local(
+                file.file, file.file.filename.split(".")[-1]
+            )
         except Exception as e:
             raise ValueError(f"Failed to save file: {e}")
 
-        files = self.files_repository.create(
+        return self.create_from_content(file)
+
+    def create_from_upload(self, upload: FileUploads, content_hash: str) -> Files:
+        """
+        Create the file record of a finished resumable upload, moving its data into the store.
+        """
+        file_path = self._store_content(upload.part_path, content_hash, upload.file_name.split(".")[-1])
+        return self.create_from_content(
+            Files(
+                file_name=upload.file_name,
+                file_path=file_path,
+                file_type=upload.file_type,
+                file_size=upload.file_size,
+                content_hash=content_hash,
+                collection_id=upload.collection_id,
+            )
+        )
+
+    def create_from_content(self, file) -> Files:
+        """
+        Create the file record for content already in the store, short-circuiting duplicates.
+        """
+        original = self.files_repository.get_completed_by_hash(file.content_hash, file.collection_id)
+        if original:
+            logger.info("File {} has the same content as {}, reusing its chunks", file.file_name, original.id)
+            metadatas = dict(original.metadatas or {})
+            metadatas["duplicate_of"] = metadatas.get("duplicate_of", str(original.id))
+            now = datetime.now()
+            return self.files_repository.create(
+                Files(
+                    file_name=file.file_name,
+                    file_path=file.file_path,
+                    file_type=file.file_type,
+                    file_size=file.file_size,
+                    content_hash=file.content_hash,
+                    collection_id=file.collection_id,
+                    status="completed",
+                    metadatas=metadatas,
+                    processing_started_at=now,
+                    processing_ended_at=now,
+                )
+            )
+
+        return self.files_repository.create(
             Files(
                 file_name=file.file_name,
                 file_path=file.file_path,
                 file_type=file.file_type,
                 file_size=file.file_size,
+                content_hash=file.content_hash,
                 collection_id=file.collection_id,
             )
         )
 
+    def replace_content(self, file_id: uuid.UUID, file: UpdateFileRequest) -> Files:
+        """
+        Replace the content of a file with a revised upload.
+        The file goes back to pending, re-ingesting it only embeds the chunks that changed.
+        A file being ingested cannot be replaced, nor one whose chunks its duplicates still use.
+        """
+        files = self.files_repository.read_by_id(file_id)
+        if files.status not in ("completed", "failed", "archived"):
+            raise ConflictError(detail=f"File {file_id} is {files.status}, it cannot be replaced")
+        duplicates = self.files_repository.get_live_duplicates(file_id)
+        if duplicates:
+            raise ConflictError(detail=f"File {file_id} has {len(duplicates)} duplicates using its chunks, "
+                                       f"delete them first")
+        try:
+            file_path, content_hash, file_size = self._save_to_local(file.file, file.file.filename.split(".")[-1])
+        except Exception as e:
+            raise ValueError(f"Failed to save file: {e}")
+        # An archive of the previous content is stale once the file is re-ingested
+        self.vector_archive.remove(files.id)
+        # A duplicate gets chunks of its own from the revised content
+        metadatas = dict(files.metadatas or {})
+        metadatas.pop("duplicate_of", None)
+
+        return self.files_repository.update(
+            id=files.id,
+            schema=Files(
+                file_name=file.file.filename,
+                file_path=file_path,
+                file_type=file.file.content_type,
+                file_size=file_size,
+                content_hash=content_hash,
+                status="pending",
+                metadatas=metadatas,
+            )
+        )
+
+    def delete(self, file_id: uuid.UUID) -> Files:
+        """
+        Delete a file and the chunks it indexed.
+
+        The file is marked as deleted first, so a running ingestion of it drops what it wrote.
+        Duplicates index nothing of their own, the chunks belong to the original file and are only
+        removed once the original and all its duplicates are deleted. The stored object is removed
+        once no other file points to it.
+        """
+        files = self.files_repository.read_by_id(file_id)
+        if files.status == "deleted":
+            return files
+        files = self.files_repository.update_attr(file_id, "status", "deleted")
+
+        owner_id = uuid.UUID((files.metadatas or {}).get("duplicate_of", str(files.id)))
+        deleted = self._delete_unused_chunks(owner_id, self.files_repository.get_chroma_names(files.collection_id))
+        if files.file_path and not self.files_repository.count_live_by_path(files.file_path):
+            if os.path.exists(files.file_path):
+                os.remove(files.file_path)
+
+        logger.info("Deleted file {} and {} of its chunks", files.id, deleted)
+        return files
+
+    def _delete_unused_chunks(self, owner_id: uuid.UUID, collection_names: list[str]) -> int:
+        """
+        Delete the chunks of a file from the Chroma collections of its collection, unless it or one of
+        its duplicates still needs them.
+        :return: The number of deleted chunks.
+        """
+        if owner_id in self.files_repository.get_live_owner_ids([owner_id]):
+            return 0
+        try:
+            chunk_count = (self.files_repository.read_by_id(owner_id).metadatas or {}).get("chunk_count", 0)
+        except NotFoundError:
+            chunk_count = 0
+        deleted = 0
+        for collection_name in collection_names:
+            ids = self.chromadb_client.get_file_chunk_ids(collection_name, owner_id, chunk_count)
+            self.chromadb_client.delete_documents(collection_name=collection_name, ids=ids,
+                                                  batch_size=settings.VECTOR_DELETE_BATCH_SIZE)
+            deleted += len(ids)
+        self.vector_archive.remove(owner_id)
+        return deleted
+
+    def archive(self, file_id: uuid.UUID) -> Files:
+        """
+        Move the chunks of a completed file out of the collection into cold storage.
+
+        The embeddings, documents and metadatas are archived as they are, restoring the file needs
+        no parsing or embedding. A duplicate has no chunks of its own and is only marked as archived;
+        an original can only be archived once none of its duplicates is in use.
+        Archiving an archived file again removes chunks a previous attempt left in the collection.
+        """
+        files = self.files_repository.read_by_id(file_id)
+        if files.status not in ("completed", "archived"):
+            raise ConflictError(detail=f"Only completed files can be archived, file {file_id} is {files.status}")
+        metadatas = dict(files.metadatas or {})
+        if "duplicate_of" in metadatas:
+            return self.files_repository.update_attr(file_id, "status", "archived")
+
+        collection_name, *shadow_names = self.files_repository.get_chroma_names(files.collection_id)
+        ids = self.chromadb_client.get_file_chunk_ids(collection_name, files.id, metadatas.get("chunk_count", 0))
+        if files.status == "completed":
+            duplicates = [duplicate for duplicate in self.files_repository.get_live_duplicates(file_id)
+                          if duplicate.status != "archived"]
+            if duplicates:
+                raise ConflictError(detail=f"File {file_id} has {len(duplicates)} duplicates using its chunks, "
+                                           f"archive or delete them first")
+
+            records = self.chromadb_client.get_records(collection_name, ids,
+                                                       batch_size=settings.VECTOR_DELETE_BATCH_SIZE)
+            path = self.vector_archive.write(files.id, records, self.embedding_signature(files.collection_id))
+            metadatas["archive"] = {
+                "chunks": len(records["ids"]),
+                "size": os.path.getsize(path),
+                "archived_at": datetime.now().isoformat(),
+            }
+            files = self.files_repository.update(id=file_id, schema=Files(status="archived", metadatas=metadatas))
+
+        # Only leave the collection once the archive is written and recorded
+        self.chromadb_client.delete_documents(collection_name=collection_name, ids=ids,
+                                              batch_size=settings.VECTOR_DELETE_BATCH_SIZE)
+        for shadow_name in shadow_names:
+            self.chromadb_client.delete_documents(collection_name=shadow_name,
+                                                  ids=self.chromadb_client.get_file_chunk_ids(shadow_name, files.id),
+                                                  batch_size=settings.VECTOR_DELETE_BATCH_SIZE)
+        logger.info("Archived file {}, removed {} chunks from collection {}", file_id, len(ids), collection_name)
+        return files
+
+    def embedding_signature(self, collection_id: uuid.UUID) -> dict:
+        """
+        What the vectors of a collection are made with: the model, the kept dimensions and the Chroma
+        collection serving it, which changes with every re-index.
+        """
+        collection = self.files_repository.get_collection(collection_id)
+        return {
+            "model": self.embedding_model_name,
+            "dimensions": collection.vector_dimensions,
+            "chroma_name": collection.active_name,
+        }
+
+    def restore(self, file_id: uuid.UUID) -> Files:
+        """
+        Bring the chunks of an archived file back into its collection and mark it as completed.
+
+        Archived vectors made otherwise than the vectors the collection now holds, e.g. archived before a
+        re-index with another model, are not restored: the file is put back to pending to be rebuilt
+        from its stored chunks and embedded again, and is to be queued for ingestion.
+        """
+        files = self.files_repository.read_by_id(file_id)
+        if files.status != "archived":
+            raise ConflictError(detail=f"Only archived files can be restored, file {file_id} is {files.status}")
+        metadatas = dict(files.metadatas or {})
+        if "duplicate_of" in metadatas:
+            original = self.files_repository.read_by_id(uuid.UUID(metadatas["duplicate_of"]))
+            if original.status != "completed":
+                raise ConflictError(detail=f"File {file_id} uses the chunks of file {original.id}, "
+                                           f"which is {original.status}, restore it first")
+            return self.files_repository.update_attr(file_id, "status", "completed")
+
+        records = self.vector_archive.read(files.id)
+        if records["embedding"] != self.embedding_signature(files.collection_id):
+            metadatas.pop("archive", None)
+            metadatas["rebuild"] = {"reembed": True, "requested_at": datetime.now().isoformat()}
+            files = self.files_repository.update(id=file_id, schema=Files(status="pending", metadatas=metadatas))
+            self.vector_archive.remove(files.id)
+            logger.info("Archived vectors of file {} do not match its collection, rebuilding it", file_id)
+            return files
+
+        # A re-index in progress picks the restored file up before it swaps
+        collection_name = self.files_repository.get_chroma_names(files.collection_id)[0]
+        self.chromadb_client.upsert_documents(
+            collection_name=collection_name,
+            ids=records["ids"],
+            documents=records["documents"],
+            metadatas=records["metadatas"],
+            embeddings=records["embeddings"].tolist(),
+        )
+        metadatas.pop("archive", None)
+        files = self.files_repository.update(id=file_id, schema=Files(status="completed", metadatas=metadatas))
+        self.vector_archive.remove(files.id)
+        logger.info("Restored {} chunks of file {} into collection {}", len(records["ids"]), file_id,
+                    collection_name)
+        return files
+
+    def purge_orphan_chunks(self) -> dict:
+        """
+        Reconcile the vector store with the database and delete the orphaned chunks.
+
+        Chunk ids start with the id of the file that indexed them. Chunks of files that are gone from
+        the database, or deleted without a live duplicate, are orphans: left behind by deletions made
+        before chunks were cleaned up, or by a deletion that failed halfway.
+        :return: The number of chunks scanned and reclaimed in each collection and in total.
+        """
+        report = {"scanned": 0, "reclaimed": 0, "collections": {}}
+        batch_size = settings.VECTOR_DELETE_BATCH_SIZE
+        for collection_name in self.files_repository.get_collection_names():
+            try:
+                ids = self.chromadb_client.get_ids(collection_name=collection_name, batch_size=batch_size)
+            except Exception as e:
+                logger.warning("Skipping collection {} while purging chunks: {}", collection_name, e)
+                continue
+
+            by_owner = {}
+            for id in ids:
+                try:
+                    owner_id = uuid.UUID(id.split("_", 1)[0])
+                except ValueError:
+                    # Not indexed by this service
+                    continue
+                by_owner.setdefault(owner_id, []).append(id)
+
+            owners = list(by_owner)
+            live = set()
+            for start in range(0, len(owners), batch_size):
+                live.update(self.files_repository.get_live_owner_ids(owners[start:start + batch_size]))
+            orphans = [id for owner_id in owners if owner_id not in live for id in by_owner[owner_id]]
+            if orphans:
+                self.chromadb_client.delete_documents(collection_name=collection_name, ids=orphans,
+                                                      batch_size=batch_size)
+                logger.info("Reclaimed {} orphaned chunks in collection {}", len(orphans), collection_name)
+
+            report["collections"][collection_name] = {"scanned": len(ids), "reclaimed": len(orphans)}
+            report["scanned"] += len(ids)
+            report["reclaimed"] += len(orphans)
+        return report
+
+    def prepare_rebuild(self, collection_id: uuid.UUID, reembed: bool = False) -> list[Files]:
+        """
+        Put the files of a collection back to pending so they are ingested again from their artifacts.
+
+        Without re-embedding, only the chunks that changed under the current chunk settings are
+        embedded. With re-embedding, e.g. after switching to an embedding model of the same dimension,
+        every chunk is embedded again. Stored pages and chunks are reused, no file is parsed again.
+        :return: The files to queue for ingestion.
+        """
+        files = self.files_repository.get_indexed_originals(collection_id)
+        requested_at = datetime.now().isoformat()
+        for file in files:
+            metadatas = dict(file.metadatas or {})
+            metadatas["rebuild"] = {"reembed": reembed, "requested_at": requested_at}
+            self.files_repository.update(id=file.id, schema=Files(status="pending", metadatas=metadatas))
+        logger.info("Rebuilding {} files of collection {} (reembed: {})", len(files), collection_id, reembed)
         return files
 
     def update_status(self, file_id: uuid.UUID, status: str):
@@ -58,3 +404,42 @@ class FilesService(BaseService):
         Update the status of a file.
         """
         self.files_repository.update_attr(file_id, "status", status)
+
+    def get_stats(self, collection_id: Optional[uuid.UUID] = None) -> dict:
+        """
+        Aggregate the per-stage ingestion metrics of the completed files, for capacity planning.
+        Files created as duplicates carry the metrics of their original and are not counted twice.
+        """
+        stages = {}
+        file_count = 0
+        for metadatas in self.files_repository.get_completed_metadatas(collection_id):
+            if "duplicate_of" in metadatas or not metadatas.get("stages"):
+                continue
+            file_count += 1
+            for name, metrics in metadatas["stages"].items():
+                stage = stages.setdefault(name, {"files": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                                 "max_peak_rss_mb": 0.0})
+                stage["files"] += 1
+                stage["wall_seconds"] += metrics.get("wall_seconds", 0)
+                stage["cpu_seconds"] += metrics.get("cpu_seconds", 0)
+                stage["max_peak_rss_mb"] = max(stage["max_peak_rss_mb"], metrics.get("peak_rss_mb", 0))
+                for counter in COUNTERS:
+                    if counter in metrics:
+                        stage[counter] = stage.get(counter, 0) + metrics[counter]
+
+        total_seconds = sum(stage["wall_seconds"] for stage in stages.values())
+        for stage in stages.values():
+            wall_seconds = stage["wall_seconds"]
+            stage["share"] = round(wall_seconds / total_seconds, 4) if total_seconds else 0
+            for counter in COUNTERS:
+                if counter in stage and wall_seconds > 0:
+                    stage[f"{counter}_per_sec"] = round(stage[counter] / wall_seconds, 2)
+            stage["wall_seconds"] = round(wall_seconds, 4)
+            stage["cpu_seconds"] = round(stage["cpu_seconds"], 4)
+
+        return {
+            "files": file_count,
+            "wall_seconds": round(total_seconds, 4),
+            "bottleneck": max(stages, key=lambda name: stages[name]["wall_seconds"]) if stages else None,
+            "stages": stages,
+        }
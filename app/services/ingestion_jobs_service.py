@@ -0,0 +1,41 @@
+from loguru import logger
+
+from app.core.config import settings
+from app.core.exceptions import TooManyRequestsError
+from app.models.files import Files
+from app.models.ingestion_jobs import IngestionJobs
+from app.repositories.ingestion_jobs_repository import IngestionJobsRepository
+from app.services.base_service import BaseService
+
+
+class IngestionJobsService(BaseService):
+    """
+    Ingestion jobs service class for queueing files for the ingestion workers.
+    """
+
+    def __init__(self, ingestion_jobs_repository: IngestionJobsRepository) -> None:
+        self.ingestion_jobs_repository = ingestion_jobs_repository
+        super().__init__(ingestion_jobs_repository)
+
+    def ensure_capacity(self):
+        """
+        Reject new uploads while the queue is full, so the workers can catch up.
+        """
+        active = self.ingestion_jobs_repository.count_active()
+        if active >= settings.INGESTION_MAX_QUEUED_JOBS:
+            raise TooManyRequestsError(
+                detail=f"Ingestion queue is full ({active} jobs pending), please retry later.",
+                headers={"Retry-After": str(settings.INGESTION_RETRY_AFTER_SECONDS)},
+            )
+
+    def enqueue(self, files: Files) -> IngestionJobs:
+        """
+        Queue a file for ingestion. Smaller files get a lower priority value and run first.
+        """
+        job = self.ingestion_jobs_repository.enqueue(
+            file_id=files.id,
+            priority=files.file_size or 0,
+            max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+        )
+        logger.info("Queued ingestion job {} for file: {}", job.id, files.id)
+        return job
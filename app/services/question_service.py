@@ -1,3 +1,4 @@
+from fastapi.concurrency import run_in_threadpool
 from loguru import logger
 
 from agents.augment_query_generated import AugmentQueryGenerated
@@ -8,6 +9,8 @@ from app.repositories.questions_repository import QuestionsRepository
 from app.schema.question_schema import CreateQuestion
 from app.services.base_service import BaseService
 from rag.chroma.client import ChromaDBHttpClient
+from rag.embedding.local_embedding_function import LocalEmbeddingFunction
+from rag.embedding.vector_codec import VectorCodec
 from rag.llm.chat_model import OpenAIChat
 from rag.llm.re_rank import ReRanking
 
@@ -20,10 +23,12 @@ class QuestionsService(BaseService):
     openai_chat = OpenAIChat(key=str(settings.OPENAI_API_KEY), model_name=str(settings.OPENAI_MODEL))
 
     def __init__(self, questions_repository: QuestionsRepository, collections_repository: CollectionsRepository,
-                 chromadb_client: ChromaDBHttpClient, augment_query_generator: AugmentQueryGenerated) -> None:
+                 chromadb_client: ChromaDBHttpClient, embedding_function: LocalEmbeddingFunction,
+                 augment_query_generator: AugmentQueryGenerated) -> None:
         self.question_repository = questions_repository
         self.collections_repository = collections_repository
         self.chromadb_client = chromadb_client
+        self.embedding_function = embedding_function
         self.augment_query_generator = augment_query_generator
 
         super().__init__(questions_repository)
@@ -42,8 +47,11 @@ class QuestionsService(BaseService):
         else:
             quries = [payload.question_text]
 
-        results = self.chromadb_client.query(collection_name=collection.collection_name,
-                                             query_texts=quries, include=["documents", "embeddings"])
+        # The question and its augmentations are embedded locally in a single batch
+        query_embeddings = self.embedding_function.embed(quries)
+        results = self.chromadb_client.query(collection_name=collection.active_name,
+                                             query_embeddings=query_embeddings, include=["documents"],
+                                             codec=VectorCodec(collection.vector_dimensions))
         retrieved_documents = results["documents"]
 
         # Check is retrieved_documents is empty
@@ -91,7 +99,9 @@ class QuestionsService(BaseService):
         Stream the question and answer pairs.
         """
         try:
-            re_ranked_pairs = self._before_question(payload, using_augment_query=payload.using_augment_query)
+            # Blocking retrieval, off the event loop so concurrent questions are embedded together
+            re_ranked_pairs = await run_in_threadpool(self._before_question, payload,
+                                                      using_augment_query=payload.using_augment_query)
 
             async for chunk in self.openai_chat.chat_with_stream(
                     question=payload.question_text,
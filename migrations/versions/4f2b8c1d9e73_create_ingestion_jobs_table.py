@@ -0,0 +1,52 @@
+"""create ingestion jobs table
+
+Revision ID: 4f2b8c1d9e73
+Revises: 9cb41eb836ac
+Create Date: 2026-10-18 09:12:40.518203
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2b8c1d9e73'
+down_revision: Union[str, None] = '9cb41eb836ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ingestion_jobs',
+        sa.Column('id', sa.UUID, primary_key=True),
+        sa.Column('file_id', sa.UUID, nullable=False),
+        # Status of the job ['queued', 'running', 'completed', 'failed']
+        sa.Column('status', sa.Enum('queued', 'running', 'completed', 'failed', name='ingestion_job_status_enum'),
+                  nullable=False,
+                  server_default='queued',
+                  ),
+        sa.Column('priority', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('locked_by', sa.String(255), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+    )
+    op.create_index(op.f('ix_ingestion_jobs_file_id'), 'ingestion_jobs', ['file_id'], unique=False)
+    # Serves the claim query: queued jobs ordered shortest-first
+    op.create_index('ix_ingestion_jobs_claim', 'ingestion_jobs', ['status', 'priority', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ingestion_jobs_claim', table_name='ingestion_jobs')
+    op.drop_index(op.f('ix_ingestion_jobs_file_id'), table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
+    sa.Enum(name='ingestion_job_status_enum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,32 @@
+"""add content hash to files
+
+Revision ID: a3c9e5f0b217
+Revises: 4f2b8c1d9e73
+Create Date: 2026-10-18 10:02:17.734561
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e5f0b217'
+down_revision: Union[str, None] = '4f2b8c1d9e73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("files") as batch_op:
+        # SHA-256 of the file content, used for content-addressed storage and deduplication
+        batch_op.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+    op.create_index(op.f('ix_files_content_hash'), 'files', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_files_content_hash'), table_name='files')
+    with op.batch_alter_table("files") as batch_op:
+        batch_op.drop_column("content_hash")
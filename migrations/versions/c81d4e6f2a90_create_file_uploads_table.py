@@ -0,0 +1,47 @@
+"""create file uploads table
+
+Revision ID: c81d4e6f2a90
+Revises: a3c9e5f0b217
+Create Date: 2026-10-18 11:26:05.194372
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d4e6f2a90'
+down_revision: Union[str, None] = 'a3c9e5f0b217'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'file_uploads',
+        sa.Column('id', sa.UUID, primary_key=True),
+        sa.Column('collection_id', sa.UUID, nullable=False),
+        sa.Column('file_name', sa.String(255), nullable=False),
+        sa.Column('file_type', sa.String(50), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('received_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('part_path', sa.String(255), nullable=False),
+        # Status of the upload ['uploading', 'completed', 'aborted']
+        sa.Column('status', sa.Enum('uploading', 'completed', 'aborted', name='file_upload_status_enum'),
+                  nullable=False,
+                  server_default='uploading',
+                  ),
+        sa.Column('file_id', sa.UUID, nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['collection_id'], ['collections.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='SET NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('file_uploads')
+    sa.Enum(name='file_upload_status_enum').drop(op.get_bind(), checkfirst=True)
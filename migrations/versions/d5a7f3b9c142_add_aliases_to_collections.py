@@ -0,0 +1,32 @@
+"""add aliases to collections
+
+Revision ID: d5a7f3b9c142
+Revises: c81d4e6f2a90
+Create Date: 2026-10-18 14:21:46.305918
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a7f3b9c142'
+down_revision: Union[str, None] = 'c81d4e6f2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("collections") as batch_op:
+        # Chroma collection the collection name points to, and the one a re-index is building
+        batch_op.add_column(sa.Column("chroma_name", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("shadow_name", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("collections") as batch_op:
+        batch_op.drop_column("shadow_name")
+        batch_op.drop_column("chroma_name")
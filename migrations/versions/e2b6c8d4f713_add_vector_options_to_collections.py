@@ -0,0 +1,32 @@
+"""add vector options to collections
+
+Revision ID: e2b6c8d4f713
+Revises: d5a7f3b9c142
+Create Date: 2026-10-18 16:02:11.582740
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6c8d4f713'
+down_revision: Union[str, None] = 'd5a7f3b9c142'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("collections") as batch_op:
+        # Truncation and component type of the stored vectors, null for full float32 vectors
+        batch_op.add_column(sa.Column("vector_dimensions", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("vector_dtype", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("collections") as batch_op:
+        batch_op.drop_column("vector_dtype")
+        batch_op.drop_column("vector_dimensions")
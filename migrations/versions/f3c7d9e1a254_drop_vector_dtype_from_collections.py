@@ -0,0 +1,30 @@
+"""drop vector dtype from collections
+
+Revision ID: f3c7d9e1a254
+Revises: e2b6c8d4f713
+Create Date: 2026-10-18 18:41:37.209615
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7d9e1a254'
+down_revision: Union[str, None] = 'e2b6c8d4f713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("collections") as batch_op:
+        # Chroma stores float32 components whatever the dtype, only truncation is kept
+        batch_op.drop_column("vector_dtype")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("collections") as batch_op:
+        batch_op.add_column(sa.Column("vector_dtype", sa.String(), nullable=True))
@@ -1,29 +1,57 @@
 # chromadb_client.py
 
 import chromadb
+import numpy as np
 from loguru import logger
 
 
 class ChromaDBHttpClient:
-    def __init__(self, host: str = "localhost", port: int = 9000):
+    def __init__(self, host: str = "localhost", port: int = 9000, embedding_function=None):
         """
         Initialize ChromaDB HTTP client.
+        The embedding function is used for every collection so query texts are embedded
+        with the same model as the stored documents.
         """
         logger.info(f"Initializing ChromaDB client with host: {host}, port: {port}")
         self.host = host
         self.port = port
+        self.embedding_function = embedding_function
         self.client = chromadb.HttpClient(host=self.host, port=self.port)
+        self._max_batch_size = None
+
+    @property
+    def max_batch_size(self) -> int:
+        """
+        Maximum number of records the server accepts in a single write.
+        """
+        if self._max_batch_size is None:
+            self._max_batch_size = self.client.get_max_batch_size()
+        return self._max_batch_size
+
+    def _get_collection(self, collection_name: str):
+        if self.embedding_function is not None:
+            return self.client.get_collection(collection_name, embedding_function=self.embedding_function)
+        return self.client.get_collection(collection_name)
 
     def create_collection(self, collection_name: str, embedding_function=None, metadata=None):
         return self.client.create_collection(name=collection_name, embedding_function=embedding_function,
                                              metadata=metadata)
 
+    def get_or_create_collection(self, collection_name: str, metadata=None):
+        """
+        Create a collection unless it already exists.
+        """
+        if self.embedding_function is not None:
+            return self.client.get_or_create_collection(collection_name, embedding_function=self.embedding_function,
+                                                        metadata=metadata)
+        return self.client.get_or_create_collection(collection_name, metadata=metadata)
+
     def add_documents(self, collection_name: str, ids: list, documents: list, metadatas: list = None,
                       embedding_function=None):
         """
         Add documents to a collection in ChromaDB.
         """
-        collection = self.client.get_collection(collection_name)
+        collection = self._get_collection(collection_name)
         if not collection:
             logger.error(f"Collection '{collection_name}' does not exist.")
             return
@@ -35,9 +63,100 @@ class ChromaDBHttpClient:
         )
         print(f"Added {len(documents)} documents to '{collection_name}'.")
 
-    def query(self, collection_name: str, query_texts: list, n_results: int = 3, include: list = None):
+    def upsert_documents(self, collection_name: str, ids: list, documents: list, metadatas: list = None,
+                         embeddings: list = None):
+        """
+        Insert or update documents in a collection in ChromaDB.
+        Re-running the same ids overwrites the previous entries instead of failing.
+        Writes are split to respect the server's maximum batch size.
+        """
+        collection = self._get_collection(collection_name)
+        step = self.max_batch_size
+        for start in range(0, len(ids), step):
+            end = start + step
+            collection.upsert(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end] if metadatas is not None else None,
+                embeddings=embeddings[start:end] if embeddings is not None else None,
+            )
+        logger.debug(f"Upserted {len(ids)} documents to '{collection_name}'.")
+
+    def get_ids(self, collection_name: str, where: dict = None, ids: list = None, batch_size: int = 1000) -> list:
+        """
+        Get the ids of the documents matching a metadata filter or a list of candidate ids.
+        Results are paged so large collections are not fetched in one response.
+        """
         collection = self.client.get_collection(collection_name)
-        return collection.query(query_texts=query_texts, n_results=n_results, include=include)
+        found = []
+        if ids is not None:
+            for start in range(0, len(ids), batch_size):
+                found.extend(collection.get(ids=ids[start:start + batch_size], include=[])["ids"])
+            return found
+
+        offset = 0
+        while True:
+            page = collection.get(where=where, limit=batch_size, offset=offset, include=[])["ids"]
+            found.extend(page)
+            if len(page) < batch_size:
+                return found
+            offset += batch_size
+
+    def get_file_chunk_ids(self, collection_name: str, file_id, legacy_count: int = 0) -> list:
+        """
+        Get the ids of the chunks indexed for a file.
+        Chunks indexed before content-hash ids carry no file_id metadata, they are looked up by their
+        positional ids "{file_id}_{i}" using the previous chunk count.
+        """
+        ids = self.get_ids(collection_name=collection_name, where={"file_id": str(file_id)})
+        if legacy_count and not ids:
+            legacy_ids = [str(file_id) + "_" + str(i) for i in range(legacy_count)]
+            ids = self.get_ids(collection_name=collection_name, ids=legacy_ids)
+        return ids
+
+    def get_records(self, collection_name: str, ids: list, batch_size: int = 1000) -> dict:
+        """
+        Get the documents, metadatas and embeddings of the given ids, in batches.
+        """
+        collection = self.client.get_collection(collection_name)
+        records = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        for start in range(0, len(ids), batch_size):
+            page = collection.get(ids=ids[start:start + batch_size],
+                                  include=["documents", "metadatas", "embeddings"])
+            records["ids"].extend(page["ids"])
+            records["documents"].extend(page["documents"])
+            records["metadatas"].extend(page["metadatas"])
+            records["embeddings"].extend(page["embeddings"])
+        return records
+
+    def delete_documents(self, collection_name: str, ids: list, batch_size: int = 1000):
+        """
+        Delete documents by id, in batches.
+        """
+        collection = self.client.get_collection(collection_name)
+        for start in range(0, len(ids), batch_size):
+            collection.delete(ids=ids[start:start + batch_size])
+        logger.debug(f"Deleted {len(ids)} documents from '{collection_name}'.")
+
+    def query(self, collection_name: str, query_texts: list = None, n_results: int = 3, include: list = None,
+              codec=None, query_embeddings=None):
+        """
+        Query a collection with texts, or with their vectors already computed.
+        :param query_embeddings: Full vectors of the queries, one row per query, used instead of
+            embedding query_texts.
+        :param codec: VectorCodec of the collection, the query vectors are searched in the same compact form.
+        """
+        collection = self._get_collection(collection_name)
+        compact = codec is not None and not codec.is_identity
+        if query_embeddings is None and not compact:
+            return collection.query(query_texts=query_texts, n_results=n_results, include=include)
+
+        include = list(include) if include is not None else ["metadatas", "documents", "distances"]
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        return collection.query(query_embeddings=(codec.compact(queries) if compact else queries).tolist(),
+                                n_results=n_results, include=include)
 
     def delete_collection(self, collection_name: str):
         collection = self.client.get_collection(collection_name)
@@ -62,3 +181,22 @@ class ChromaDBHttpClient:
         except Exception as e:
             print(f"ChromaDB heartbeat failed: {e}")
             return False
+
+
+class ChromaDBLocalClient(ChromaDBHttpClient):
+    """
+    ChromaDB client on a local persistent store, with the same interface as the HTTP client.
+    Collections are created on first write, used for offline bulk loads.
+    """
+
+    def __init__(self, path: str, embedding_function=None):
+        logger.info(f"Initializing local ChromaDB client with path: {path}")
+        self.path = path
+        self.embedding_function = embedding_function
+        self.client = chromadb.PersistentClient(path=self.path)
+        self._max_batch_size = None
+
+    def _get_collection(self, collection_name: str):
+        if self.embedding_function is not None:
+            return self.client.get_or_create_collection(collection_name, embedding_function=self.embedding_function)
+        return self.client.get_or_create_collection(collection_name)
@@ -0,0 +1,34 @@
+from typing import List
+
+import numpy as np
+
+from rag.embedding import BaseEmbeddingModel
+
+
+class BatchEncoder:
+    """
+    Encode texts in fixed-size batches with an in-process embedding model.
+    Texts are sorted by length before batching so each batch pads to a similar length,
+    the vectors are returned in the original order.
+    """
+
+    def __init__(self, model: BaseEmbeddingModel, batch_size: int = 32):
+        self.model = model
+        self.batch_size = batch_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts into a 2D array of vectors, one row per text.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors = None
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            batch_vectors = np.asarray(self.model.encode_queries([texts[i] for i in indices]))
+            if vectors is None:
+                vectors = np.empty((len(texts), batch_vectors.shape[1]), dtype=batch_vectors.dtype)
+            vectors[indices] = batch_vectors
+        return vectors
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+from loguru import logger
+
+from rag.embedding import BaseEmbeddingModel
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by model name and normalized text.
+
+    The first tier is a bounded in-process LRU. The second is an optional SQLite database in WAL mode,
+    shared by every process of the node: a vector embedded by an ingestion worker is a hit for the API
+    process and the other way around. The database is trimmed to its oldest entries once it grows past
+    its bound. Vectors are stored as float32.
+    """
+    # Number of writes to the database between two checks of its size
+    TRIM_INTERVAL = 1000
+
+    def __init__(self, capacity: int = 50000, path: Optional[str] = None, max_disk_entries: int = 0):
+        """
+        :param capacity: Maximum number of vectors kept in memory, 0 disables the memory tier.
+        :param path: Path of the SQLite database, None disables the disk tier.
+        :param max_disk_entries: Maximum number of vectors kept on disk, 0 for no bound.
+        """
+        self.capacity = capacity
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_trim = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._connection() as connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS embeddings "
+                                   "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            logger.info("Embedding cache with {} entries in memory, persisted in {}", self.capacity, self.path)
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        """
+        Cache key of a text embedded by a model. Unicode forms and whitespace runs are normalized,
+        case is kept since it matters to cased models.
+        """
+        normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, and a new one in a forked process
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look keys up in memory, then on disk. Vectors found on disk are promoted to memory.
+        :return: The vector of each key, None for misses.
+        """
+        vectors = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(index)
+                    continue
+                self._memory.move_to_end(key)
+                vectors[index] = vector
+            self._counters["memory_hits"] += len(keys) - len(missing)
+
+        found = {}
+        if missing and self.path:
+            wanted = list({keys[index] for index in missing})
+            connection = self._connection()
+            # Stay below the SQLite limit of variables per statement
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+
+        disk_hits = 0
+        for index in missing:
+            vector = found.get(keys[index])
+            if vector is not None:
+                vectors[index] = vector
+                disk_hits += 1
+        with self._lock:
+            self._counters["disk_hits"] += disk_hits
+            self._counters["misses"] += len(missing) - disk_hits
+            for key, vector in found.items():
+                self._remember(key, vector)
+        return vectors
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[np.ndarray]):
+        """
+        Store vectors in both tiers.
+        """
+        vectors = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+        if not self.path or not keys:
+            return
+
+        connection = self._connection()
+        # A single transaction for the whole batch
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany("INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                                   [(key, vector.tobytes()) for key, vector in zip(keys, vectors)])
+        with self._lock:
+            self._writes_since_trim += len(keys)
+            trim = self.max_disk_entries and self._writes_since_trim >= self.TRIM_INTERVAL
+            if trim:
+                self._writes_since_trim = 0
+        if trim:
+            self._trim(connection)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.capacity <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _trim(self, connection: sqlite3.Connection):
+        count = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            connection.execute("DELETE FROM embeddings WHERE rowid IN "
+                               "(SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)", (excess,))
+            with self._lock:
+                self._counters["disk_evictions"] += excess
+
+    def clear(self):
+        """
+        Drop every cached vector, in memory and on disk.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            self._connection().execute("DELETE FROM embeddings")
+
+    def stats(self) -> dict:
+        """
+        Hit, miss and eviction counters of this process and the size of both tiers.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0
+        stats["capacity"] = self.capacity
+        if self.path:
+            stats["disk_entries"] = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stats
+
+
+class CachedEmbedding(EmbeddingFunction):
+    """
+    Embedding model answering from an EmbeddingCache, only the texts missing from it reach the model.
+    Identical texts within a call are embedded once.
+    """
+
+    def __init__(self, model: BaseEmbeddingModel, model_name: str, cache: EmbeddingCache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def __call__(self, input: Documents) -> np.ndarray:
+        return self.encode_queries(list(input))
+
+    def encode(self, text) -> np.ndarray:
+        # A single text gives a vector, a list of texts a 2D array like the wrapped models
+        if isinstance(text, str):
+            return self.encode_queries([text])[0]
+        return self.encode_queries(list(text))
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        keys = [self.cache.key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        pending = {}
+        for index, vector in enumerate(vectors):
+            if vector is None:
+                pending.setdefault(keys[index], []).append(index)
+        if pending:
+            first = [indices[0] for indices in pending.values()]
+            computed = np.asarray(self.model.encode_queries([texts[index] for index in first]), dtype=np.float32)
+            self.cache.put_many(list(pending), list(computed))
+            for vector, indices in zip(computed, pending.values()):
+                for index in indices:
+                    vectors[index] = vector
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
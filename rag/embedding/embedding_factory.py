@@ -1,31 +1,414 @@
+import gc
+import os
 import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Iterable, List, Optional
 
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
 from loguru import logger
 
 from rag.embedding import BaseEmbeddingModel
 from rag.embedding.default_embedding import DefaultEmbedding
+from rag.embedding.embedding_cache import CachedEmbedding, EmbeddingCache
+from rag.embedding.embedding_pool import EmbeddingPool
+from rag.embedding.embedding_scheduler import EmbeddingScheduler
 from rag.embedding.linqai_embedding import LinqAIEmbedding
+from rag.embedding.onnx_embedding import OnnxEmbedding
+
+
+class ModelSpec:
+    """
+    How to build an embedding model and roughly how much memory it takes once loaded.
+    """
+
+    def __init__(self, builder: Callable[..., BaseEmbeddingModel], memory_mb: int, source: str):
+        """
+        :param builder: Builds the PyTorch model.
+        :param memory_mb: Estimate of the float32 weights, int8 weights take a quarter of it.
+        :param source: Sentence-transformers model the ONNX export is made from.
+        """
+        self.builder = builder
+        self.memory_mb = memory_mb
+        self.source = source
+
+
+# Estimates replaced by the measured size once a model is loaded
+MODELS = {
+    "Default": ModelSpec(DefaultEmbedding, memory_mb=450,  # 110M parameters
+                         source="sentence-transformers/all-mpnet-base-v2"),
+    "LinqAI": ModelSpec(LinqAIEmbedding, memory_mb=28000,  # 7B parameters
+                        source="Linq-AI-Research/Linq-Embed-Mistral"),
+}
+BACKENDS = ("torch", "onnx")
+
+
+class _ResidentModel:
+    def __init__(self, model, runner, memory_mb: float, load_seconds: float):
+        self.model = model
+        # What calls go through: the model itself or its scheduler
+        self.runner = runner
+        self.memory_mb = memory_mb
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class LazyEmbedding(EmbeddingFunction):
+    """
+    Handle on a model of an EmbeddingFactory. The model is loaded on first use, and again after
+    being evicted; holding the handle does not keep the model in memory.
+    """
+
+    def __init__(self, factory: "EmbeddingFactory", model_name: str):
+        self.factory = factory
+        self.model_name = model_name
+
+    def __call__(self, input: Documents) -> np.ndarray:
+        return self.encode_queries(list(input))
+
+    def encode(self, text) -> np.ndarray:
+        with self.factory.use(self.model_name) as model:
+            return model.encode(text)
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        with self.factory.use(self.model_name) as model:
+            return model.encode_queries(texts)
 
 
 class EmbeddingFactory:
-    def __init__(self, device: str = 'cpu'):
-        logger.info('Initializing embedding factory')
+    """
+    Registry of the embedding models, loaded lazily within a memory budget.
+
+    Models are loaded on first use, each under its own lock so loading a large model does not hold
+    up the others. Before a model is loaded, idle models are evicted least recently used first until
+    its estimated size fits the budget; models serving a call are never evicted. Models unused for
+    longer than the idle timeout are unloaded as well. Evicted models are taken out of the registry
+    under its lock and torn down after releasing it.
+
+    The models run on PyTorch, or on ONNX Runtime from the exports in onnx_dir, one subdirectory per
+    model name, optionally quantized to int8. Vectors of different backends are cached apart.
+    """
+
+    def __init__(self, device: str = 'cpu', cache: Optional[EmbeddingCache] = None, max_batch_size: int = 0,
+                 max_wait_ms: float = 5, memory_budget_mb: int = 0, idle_seconds: float = 0,
+                 backend: str = "torch", onnx_dir: Optional[str] = None, onnx_quantized: bool = True,
+                 threads: int = 0):
+        """
+        :param cache: Cache the models answer from, every model of the factory shares it.
+        :param max_batch_size: Batch concurrent calls to a model up to this many texts in a scheduler,
+            0 calls the models directly.
+        :param max_wait_ms: Time the scheduler waits for more calls to join a batch.
+        :param memory_budget_mb: Total memory the resident models may take, 0 for no budget.
+        :param idle_seconds: Unload models unused for this long, 0 keeps them until the budget needs room.
+        :param backend: "torch" or "onnx".
+        :param onnx_dir: Directory of the ONNX exports, required by the onnx backend.
+        :param onnx_quantized: Run the int8 ONNX models instead of the float32 ones.
+        :param threads: Threads of an ONNX inference, 0 lets ONNX Runtime decide.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Embedding backend {backend} is not supported.")
+        if backend == "onnx" and not onnx_dir:
+            raise ValueError("The onnx embedding backend needs the directory of the exported models.")
+        logger.info('Initializing embedding factory with the {} backend', backend)
         self.device = device
-        self._instances = {}  # Cache model instances
-        self._lock = threading.Lock()  # Protects cache for thread safety
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_seconds = idle_seconds
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.onnx_quantized = onnx_quantized
+        self.threads = threads
+        self._handles = {}
+        self._resident: dict[str, _ResidentModel] = {}
+        self._load_locks = {}
+        self._loading = set()
+        self._pools: dict[EmbeddingPool, str] = {}
+        # Memory promised to models being loaded
+        self._reserved_mb = 0.0
+        self._lock = threading.Lock()  # Protects the registry state, never held while loading
 
     def get(self, model_name: str) -> BaseEmbeddingModel:
-        # Return cached model if available
-        with self._lock:
-            if model_name in self._instances:
-                return self._instances[model_name]
-            # Otherwise create a new embedding instance
-            if model_name == "LinqAI":
-                model = LinqAIEmbedding(device=self.device)
-            elif model_name == "Default":
-                model = DefaultEmbedding(device=self.device)
-            else:
-                raise ValueError(f"Model {model_name} is not supported.")
-            # Cache and return
-            self._instances[model_name] = model
+        """
+        Get a handle on a model, without loading it.
+        """
+        if model_name not in MODELS:
+            raise ValueError(f"Model {model_name} is not supported.")
+        with self._lock:
+            if model_name not in self._handles:
+                # Cache hits are answered without loading the model
+                self._handles[model_name] = self.cached(model_name, LazyEmbedding(self, model_name))
+            return self._handles[model_name]
+
+    def cached(self, model_name: str, model: BaseEmbeddingModel) -> BaseEmbeddingModel:
+        """
+        Answer a model from the cache of the factory, if it has one.
+        """
+        if self.cache is None:
             return model
+        return CachedEmbedding(model, self.cache_name(model_name), self.cache)
+
+    def pool(self, model_name: str, processes: int, threads_per_process: int = 0,
+             fork: bool = True) -> EmbeddingPool:
+        """
+        Start a pool of processes embedding with a model, see EmbeddingPool. With fork, PyTorch models
+        are loaded here and held until the pool is closed, the processes share their weights. ONNX
+        Runtime sessions cannot be forked, every process loads its own.
+        :param fork: Fork the processes from this one. Only safe before this process starts threads,
+            a process already serving requests spawns processes loading their own model instead.
+        """
+        if model_name not in MODELS:
+            raise ValueError(f"Model {model_name} is not supported.")
+        builder = self._builder(model_name, threads_per_process)
+        if self.backend == "onnx" or not fork:
+            pool = EmbeddingPool(builder=builder, processes=processes, threads_per_process=threads_per_process)
+        else:
+            resident = self._load(model_name)
+            try:
+                pool = EmbeddingPool(resident.model, builder, processes=processes,
+                                     threads_per_process=threads_per_process,
+                                     on_close=lambda: self._release(resident))
+            except Exception:
+                self._release(resident)
+                raise
+        with self._lock:
+            self._pools[pool] = model_name
+        return pool
+
+    def pool_stats(self) -> dict:
+        """
+        Throughput of the open embedding pools, by model name.
+        """
+        with self._lock:
+            pools = [(pool, model_name) for pool, model_name in self._pools.items() if not pool.closed]
+            self._pools = dict(pools)
+        stats = {}
+        for pool, model_name in pools:
+            stats.setdefault(model_name, []).append(pool.stats())
+        return stats
+
+    def cache_name(self, model_name: str) -> str:
+        """
+        Name the vectors of a model are cached under, the backends do not give identical vectors.
+        """
+        if self.backend == "onnx":
+            return f"{model_name}@onnx-{'int8' if self.onnx_quantized else 'fp32'}"
+        return model_name
+
+    def estimate_mb(self, model_name: str) -> float:
+        """
+        Estimated memory of a model on the backend of the factory.
+        """
+        memory_mb = MODELS[model_name].memory_mb
+        return memory_mb / 4 if self.backend == "onnx" and self.onnx_quantized else memory_mb
+
+    def _builder(self, model_name: str, threads: int) -> Callable[[], BaseEmbeddingModel]:
+        # A picklable builder, for the processes of a pool
+        if self.backend == "onnx":
+            return partial(OnnxEmbedding, os.path.join(self.onnx_dir, model_name), device=self.device,
+                           quantized=self.onnx_quantized, threads=threads)
+        return partial(MODELS[model_name].builder, device=self.device)
+
+    @contextmanager
+    def use(self, model_name: str):
+        """
+        Hold a model for a call, loading it if needed. A held model is not evicted.
+        """
+        resident = self._load(model_name)
+        try:
+            yield resident.runner
+        finally:
+            self._release(resident)
+
+    def _release(self, resident: _ResidentModel):
+        with self._lock:
+            resident.in_use -= 1
+            resident.last_used = time.monotonic()
+        if self.idle_seconds > 0:
+            self.evict_idle(self.idle_seconds)
+
+    def warmup(self, model_names: Iterable[str], background: bool = True):
+        """
+        Load models ahead of their first call, in a background thread by default.
+        """
+        def load():
+            for model_name in model_names:
+                try:
+                    with self.use(model_name):
+                        pass
+                except Exception as e:
+                    logger.error("Error warming up embedding model {}: {}", model_name, e)
+
+        if background:
+            threading.Thread(target=load, name="embedding-warmup", daemon=True).start()
+        else:
+            load()
+
+    def _load(self, model_name: str) -> _ResidentModel:
+        if model_name not in MODELS:
+            raise ValueError(f"Model {model_name} is not supported.")
+        estimate_mb = self.estimate_mb(model_name)
+        with self._lock:
+            resident = self._resident.get(model_name)
+            if resident is not None:
+                resident.in_use += 1
+                return resident
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        with load_lock:
+            evicted = []
+            try:
+                with self._lock:
+                    # Loaded by another caller while this one waited
+                    resident = self._resident.get(model_name)
+                    if resident is not None:
+                        resident.in_use += 1
+                        return resident
+                    self._make_room(estimate_mb, evicted)
+                    self._reserved_mb += estimate_mb
+                    self._loading.add(model_name)
+            finally:
+                self._unload(evicted)
+
+            started_at = time.perf_counter()
+            try:
+                logger.info("Loading embedding model {} (about {:.0f} MB)", model_name, estimate_mb)
+                model = self._builder(model_name, self.threads)()
+                runner = EmbeddingScheduler(model, max_batch_size=self.max_batch_size, max_wait_ms=self.max_wait_ms,
+                                            name=model_name) if self.max_batch_size > 0 else model
+            finally:
+                with self._lock:
+                    self._reserved_mb -= estimate_mb
+                    self._loading.discard(model_name)
+
+            memory_mb = _measure_memory_mb(model) or estimate_mb
+            resident = _ResidentModel(model, runner, memory_mb, time.perf_counter() - started_at)
+            resident.in_use = 1
+            with self._lock:
+                self._resident[model_name] = resident
+            logger.info("Loaded embedding model {} in {:.1f}s ({:.0f} MB)", model_name, resident.load_seconds,
+                        memory_mb)
+            return resident
+
+    def _make_room(self, memory_mb: float, evicted: list):
+        """
+        Evict idle models, least recently used first, until a model of the given size fits the budget.
+        Called with the registry lock held, the evicted models are added to the list for _unload.
+        """
+        if self.memory_budget_mb <= 0:
+            return
+        if memory_mb > self.memory_budget_mb:
+            raise MemoryError(f"Embedding model needs about {memory_mb} MB, "
+                              f"more than the budget of {self.memory_budget_mb} MB")
+        while self._used_mb() + memory_mb > self.memory_budget_mb:
+            idle = [(resident.last_used, model_name) for model_name, resident in self._resident.items()
+                    if resident.in_use == 0]
+            if not idle:
+                raise MemoryError(f"No idle embedding model to evict for {memory_mb} MB, "
+                                  f"{self._used_mb():.0f} of {self.memory_budget_mb} MB in use")
+            model_name = min(idle)[1]
+            evicted.append((model_name, self._resident.pop(model_name)))
+
+    def _used_mb(self) -> float:
+        return sum(resident.memory_mb for resident in self._resident.values()) + self._reserved_mb
+
+    def _unload(self, evicted: list):
+        # Called without the registry lock, stopping a scheduler and freeing the weights takes a while
+        if not evicted:
+            return
+        for model_name, resident in evicted:
+            if isinstance(resident.runner, EmbeddingScheduler):
+                resident.runner.stop()
+            logger.info("Evicted embedding model {} ({:.0f} MB)", model_name, resident.memory_mb)
+        # The last references to the weights, the caller's list included
+        del resident
+        evicted.clear()
+        gc.collect()
+
+    def evict_idle(self, idle_seconds: float) -> List[str]:
+        """
+        Unload the models unused for at least the given time.
+        :return: The names of the evicted models.
+        """
+        now = time.monotonic()
+        with self._lock:
+            evicted = [(model_name, self._resident.pop(model_name)) for model_name, resident
+                       in list(self._resident.items())
+                       if resident.in_use == 0 and now - resident.last_used >= idle_seconds]
+        model_names = [model_name for model_name, _ in evicted]
+        self._unload(evicted)
+        return model_names
+
+    def models(self) -> dict:
+        """
+        The memory budget and, for every registered model, whether it is resident and what it costs.
+        """
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for model_name in MODELS:
+                resident = self._resident.get(model_name)
+                models[model_name] = {
+                    "resident": resident is not None,
+                    "loading": model_name in self._loading,
+                    "estimated_mb": self.estimate_mb(model_name),
+                }
+                if resident is not None:
+                    models[model_name].update({
+                        "memory_mb": round(resident.memory_mb, 1),
+                        "load_seconds": round(resident.load_seconds, 2),
+                        "loaded_at": resident.loaded_at,
+                        "idle_seconds": round(now - resident.last_used, 1),
+                        "in_use": resident.in_use,
+                    })
+            return {
+                "backend": self.backend,
+                "quantized": self.backend == "onnx" and self.onnx_quantized,
+                "memory_budget_mb": self.memory_budget_mb,
+                "used_mb": round(self._used_mb(), 1),
+                "models": models,
+            }
+
+    def scheduler_stats(self) -> dict:
+        """
+        Batching statistics of the scheduler of each loaded model.
+        """
+        with self._lock:
+            schedulers = {model_name: resident.runner for model_name, resident in self._resident.items()
+                          if isinstance(resident.runner, EmbeddingScheduler)}
+        return {model_name: scheduler.stats() for model_name, scheduler in schedulers.items()}
+
+    def close(self):
+        """
+        Stop the embedding pools and the schedulers of the loaded models.
+        """
+        with self._lock:
+            pools, self._pools = list(self._pools), {}
+        for pool in pools:
+            pool.close()
+        with self._lock:
+            residents, self._resident = list(self._resident.values()), {}
+        for resident in residents:
+            if isinstance(resident.runner, EmbeddingScheduler):
+                resident.runner.stop()
+
+
+def _measure_memory_mb(model) -> Optional[float]:
+    """
+    Size of the weights of a model, None when it cannot be measured.
+    """
+    if getattr(model, "memory_mb", None):
+        return model.memory_mb
+    module = getattr(model, "model", None)
+    if module is None or not hasattr(module, "parameters"):
+        return None
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors) / (1024 * 1024)
+    except Exception:
+        return None
@@ -0,0 +1,140 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+from loguru import logger
+
+from rag.embedding import BaseEmbeddingModel
+from rag.embedding.batch_encoder import BatchEncoder
+
+_pool_worker = {}
+
+
+def _init_pool_worker(model: Optional[BaseEmbeddingModel], builder: Optional[Callable[[], BaseEmbeddingModel]],
+                      threads: int, batch_size: int):
+    """
+    Pin the thread count of a pool process and take its model: the one of the parent when forked,
+    else a new one.
+    """
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _pool_worker["encoder"] = BatchEncoder(model if model is not None else builder(), batch_size=batch_size)
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return np.asarray(_pool_worker["encoder"].encode(texts), dtype=np.float32)
+
+
+class EmbeddingPool(EmbeddingFunction):
+    """
+    Embed large lists of texts across several processes, for bulk ingestion and re-indexing.
+
+    Each call is split into one shard per process: texts are sorted by length and dealt round-robin,
+    so the shards take a similar time and each pads to similar lengths. Every process runs a fixed
+    number of threads. Where fork is available the processes are forked from the loaded model, its
+    weights are shared copy-on-write instead of being loaded once per process; the pool should then be
+    created before this process runs threads of its own inference. Otherwise, and for models that
+    cannot be forked, every process builds its own model.
+    """
+
+    def __init__(self, model: Optional[BaseEmbeddingModel] = None,
+                 builder: Optional[Callable[[], BaseEmbeddingModel]] = None, processes: int = 2,
+                 threads_per_process: int = 0, batch_size: int = 32, min_shard_size: int = 16,
+                 on_close: Optional[Callable[[], None]] = None):
+        """
+        :param model: Loaded model shared with the forked processes.
+        :param builder: Builds the model of each process when it is not forked from model.
+        :param threads_per_process: Threads of each process, 0 shares the cores between the processes.
+        :param batch_size: Texts per forward pass within a process.
+        :param min_shard_size: Smallest number of texts worth sending to a process.
+        :param on_close: Called once the processes are stopped.
+        """
+        fork = model is not None and "fork" in multiprocessing.get_all_start_methods()
+        if not fork and builder is None:
+            raise ValueError("An embedding pool needs a builder where the model cannot be forked.")
+        self.processes = processes
+        self.threads_per_process = threads_per_process or max(1, (os.cpu_count() or 1) // processes)
+        self.min_shard_size = min_shard_size
+        self.on_close = on_close
+        context = multiprocessing.get_context("fork" if fork else "spawn")
+        self._pool = context.Pool(processes, initializer=_init_pool_worker,
+                                  initargs=(model if fork else None, builder, self.threads_per_process, batch_size))
+        self._stats = {"calls": 0, "vectors": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+        self._closed = False
+        logger.info("Embedding pool of {} {} processes with {} threads each", processes,
+                    "forked" if fork else "spawned", self.threads_per_process)
+
+    def __call__(self, input: Documents) -> np.ndarray:
+        return self.encode_queries(list(input))
+
+    def encode(self, text) -> np.ndarray:
+        # A single text gives a vector, a list of texts a 2D array like the other models
+        if isinstance(text, str):
+            return self.encode_queries([text])[0]
+        return self.encode_queries(list(text))
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        started_at = time.perf_counter()
+        count = max(1, min(self.processes, math.ceil(len(texts) / self.min_shard_size)))
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]), reverse=True)
+        shards = [order[start::count] for start in range(count)]
+        results = self._pool.map(_encode_shard, [[texts[index] for index in shard] for shard in shards])
+
+        vectors = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for shard, result in zip(shards, results):
+            vectors[shard] = result
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["vectors"] += len(texts)
+            self._stats["seconds"] += time.perf_counter() - started_at
+        return vectors
+
+    def stats(self) -> dict:
+        """
+        Number of calls and vectors, with the embedding throughput.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["vectors_per_sec"] = round(stats["vectors"] / stats["seconds"], 1) if stats["seconds"] else 0
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["processes"] = self.processes
+        stats["threads_per_process"] = self.threads_per_process
+        return stats
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        """
+        Stop the processes.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pool.close()
+        self._pool.join()
+        stats = self.stats()
+        logger.info("Embedding pool embedded {} vectors in {}s ({} vectors/sec)", stats["vectors"],
+                    stats["seconds"], stats["vectors_per_sec"])
+        if self.on_close is not None:
+            self.on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+from loguru import logger
+
+from rag.embedding import BaseEmbeddingModel
+
+
+class _Request:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class EmbeddingScheduler(EmbeddingFunction):
+    """
+    Micro-batch concurrent embedding calls into single forward passes.
+
+    Callers queue their texts and get a future. A dedicated inference thread takes the oldest request
+    and keeps adding queued requests until the batch holds max_batch_size texts or max_wait_ms passed
+    since it started collecting, then runs one forward pass and splits the vectors back to the callers.
+    A request larger than max_batch_size runs on its own. The model is only ever called from the
+    inference thread.
+    """
+
+    def __init__(self, model: BaseEmbeddingModel, max_batch_size: int = 64, max_wait_ms: float = 5,
+                 name: str = "embedding"):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "max_batch_texts": 0, "queue_seconds": 0.0,
+                       "inference_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"{name}-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queue texts for embedding.
+        :return: A future of the 2D array of their vectors, one row per text.
+        """
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return request.future
+        # Under the lock stop takes, a request is either refused or queued before the queue is drained
+        with self._submit_lock:
+            if self._stop_event.is_set():
+                raise RuntimeError("Embedding scheduler is stopped")
+            self._queue.put(request)
+        return request.future
+
+    def __call__(self, input: Documents) -> np.ndarray:
+        return self.encode_queries(list(input))
+
+    def encode(self, text) -> np.ndarray:
+        # A single text gives a vector, a list of texts a 2D array like the wrapped models
+        if isinstance(text, str):
+            return self.encode_queries([text])[0]
+        return self.encode_queries(list(text))
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def stats(self) -> dict:
+        """
+        Number of requests, texts and batches, with the average batch size and time spent queued.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_texts"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0
+        stats["avg_queue_ms"] = round(stats.pop("queue_seconds") * 1000 / stats["requests"], 3) \
+            if stats["requests"] else 0
+        stats["inference_seconds"] = round(stats["inference_seconds"], 4)
+        return stats
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the inference thread, failing the requests still queued.
+        """
+        with self._submit_lock:
+            self._stop_event.set()
+        self._thread.join(timeout)
+        self._fail_queued()
+
+    def _fail_queued(self, carried: Optional[_Request] = None):
+        requests = [carried] if carried is not None else []
+        while True:
+            try:
+                requests.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for request in requests:
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError("Embedding scheduler is stopped"))
+
+    def _run(self):
+        carried = None
+        while not self._stop_event.is_set():
+            if carried is not None:
+                first, carried = carried, None
+            else:
+                try:
+                    first = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+            batch, size = [first], len(first.texts)
+            deadline = time.perf_counter() + self.max_wait_seconds
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if size + len(request.texts) > self.max_batch_size:
+                    # Starts the next batch
+                    carried = request
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._run_batch(batch)
+
+        # Also drained here, in case stop gave up waiting for this thread
+        self._fail_queued(carried)
+
+    def _run_batch(self, batch: List[_Request]):
+        # Callers that gave up are dropped from the batch
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+        started_at = time.perf_counter()
+        try:
+            vectors = np.asarray(self.model.encode_queries(texts))
+        except Exception as e:
+            logger.error("Error embedding a batch of {} texts: {}", len(texts), e)
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        ended_at = time.perf_counter()
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += 1
+            self._stats["max_batch_texts"] = max(self._stats["max_batch_texts"], len(texts))
+            self._stats["queue_seconds"] += sum(started_at - request.queued_at for request in batch)
+            self._stats["inference_seconds"] += ended_at - started_at
@@ -0,0 +1,35 @@
+from typing import List
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+
+from rag.embedding.embedding_factory import EmbeddingFactory
+
+
+class LocalEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function backed by a model of the local EmbeddingFactory, so collections embed
+    query texts in process, through the cache, scheduler and memory budget of the factory, instead of
+    calling a remote inference API.
+
+    It does not register a name with Chroma: collections created with another embedding function
+    keep opening with this one.
+    """
+
+    def __init__(self, factory: EmbeddingFactory, model_name: str = "Default"):
+        self.factory = factory
+        self.model_name = model_name
+        # A handle, the model is only loaded on the first miss of the cache
+        self.model = factory.get(model_name)
+
+    def __call__(self, input: Documents) -> List[np.ndarray]:
+        return list(self.embed(list(input)))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in one batch.
+        :return: A 2D float32 array, one row per text.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.asarray(self.model.encode_queries(texts), dtype=np.float32)
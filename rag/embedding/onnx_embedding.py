@@ -0,0 +1,170 @@
+import json
+import os
+from typing import List
+
+import numpy as np
+from loguru import logger
+
+from rag.embedding import BaseEmbeddingModel
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+CONFIG_FILE = "embedding_config.json"
+POOLING_MODES = ("mean", "cls", "lasttoken", "max")
+
+
+class OnnxEmbedding(BaseEmbeddingModel):
+    """
+    Sentence embedding model running on ONNX Runtime, loaded from a directory written by export_onnx.
+
+    The directory holds the transformer exported to ONNX, optionally a dynamically int8-quantized copy
+    of it, the tokenizer and the pooling of the original sentence-transformers model. Texts are sorted
+    by length before batching so each batch is padded to similar lengths.
+    """
+
+    def __init__(self, model_dir: str, device: str = 'cpu', quantized: bool = True, batch_size: int = 32,
+                 threads: int = 0):
+        """
+        :param model_dir: Directory written by export_onnx.
+        :param quantized: Run the int8 model instead of the float32 one.
+        :param threads: Threads of an inference, 0 lets ONNX Runtime decide.
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No exported ONNX model at {path}")
+        with open(os.path.join(model_dir, CONFIG_FILE), encoding="utf-8") as f:
+            config = json.load(f)
+        logger.info("Initializing ONNX embedding model {} from {}", config.get("model_name"), path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        providers = ["CPUExecutionProvider"]
+        if device.startswith("cuda"):
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = onnxruntime.InferenceSession(path, options, providers=providers)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+        self.max_length = config["max_length"]
+        self.batch_size = batch_size
+        # Size of the weights, models over 2 GB keep them in external data files next to the model file
+        self.memory_mb = sum(os.path.getsize(os.path.join(model_dir, name)) for name in os.listdir(model_dir)
+                             if name.startswith(QUANTIZED_MODEL_FILE) == quantized) / (1024 * 1024)
+
+    def encode(self, text) -> np.ndarray:
+        # A single text gives a vector, a list of texts a 2D array like the other models
+        if isinstance(text, str):
+            return self.encode_queries([text])[0]
+        return self.encode_queries(list(text))
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for index, vector in zip(batch, self._encode_batch([texts[index] for index in batch])):
+                vectors[index] = vector
+        return np.stack(vectors)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                 return_tensors="np")
+        feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+        mask = encoded["attention_mask"].astype(np.float32)
+
+        if self.pooling == "mean":
+            summed = (token_embeddings * mask[:, :, None]).sum(axis=1)
+            vectors = summed / np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+        elif self.pooling == "cls":
+            vectors = token_embeddings[:, 0]
+        elif self.pooling == "lasttoken":
+            # Last attended token, whichever side the tokenizer pads
+            last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+            vectors = token_embeddings[np.arange(len(texts)), last]
+        else:
+            vectors = np.where(mask[:, :, None] > 0, token_embeddings, -1e9).max(axis=1)
+
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 17) -> dict:
+    """
+    Export a sentence-transformers model to a directory OnnxEmbedding loads.
+    :param model_name: Name or path of the sentence-transformers model.
+    :param quantize: Also write a copy with the weights dynamically quantized to int8.
+    :return: The configuration written next to the model.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = {type(module).__name__: module for module in model}
+    unsupported = set(modules) - {"Transformer", "Pooling", "Normalize"}
+    if unsupported:
+        raise ValueError(f"Cannot export {model_name}, unsupported modules: {', '.join(sorted(unsupported))}")
+    pooling = modules["Pooling"].get_pooling_mode_str() if "Pooling" in modules else "mean"
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Cannot export {model_name}, unsupported pooling: {pooling}")
+
+    transformer = modules["Transformer"]
+    tokenizer = transformer.tokenizer
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                   if name in tokenizer.model_input_names]
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    dummy = tokenizer(["An example sentence to trace the model"], return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    logger.info("Exporting {} to {}", model_name, model_path)
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model).eval(),
+            tuple(dummy[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names},
+                          "token_embeddings": {0: "batch", 1: "sequence"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing {} to int8", model_path)
+        # Protobuf cannot hold more than 2 GB, larger models keep their weights in external data
+        large = sum(parameter.numel() * parameter.element_size() for parameter in model.parameters()) > 2 ** 31
+        quantize_dynamic(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8,
+                         use_external_data_format=large)
+
+    config = {
+        "model_name": model_name,
+        "pooling": pooling,
+        "normalize": "Normalize" in modules,
+        "max_length": model.max_seq_length,
+        "dimensions": model.get_sentence_embedding_dimension(),
+        "opset": opset,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
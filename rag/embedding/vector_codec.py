@@ -0,0 +1,50 @@
+from typing import Optional
+
+import numpy as np
+
+# Bytes of one component, the vector store keeps float32 components
+COMPONENT_BYTES = 4
+
+
+class VectorCodec:
+    """
+    Compact representation of the vectors of a collection.
+
+    Vectors are truncated to their first dimensions, which keeps most of the quality of models trained
+    with Matryoshka representation learning, and normalized again. Query vectors are truncated the same
+    way, so the index of the collection only holds the kept dimensions.
+    """
+
+    def __init__(self, dimensions: Optional[int] = None):
+        """
+        :param dimensions: Number of leading dimensions kept, None keeps them all.
+        """
+        if dimensions is not None and dimensions <= 0:
+            raise ValueError("The number of vector dimensions must be positive.")
+        self.dimensions = dimensions
+
+    @property
+    def is_identity(self) -> bool:
+        """
+        Whether vectors are kept as they are.
+        """
+        return self.dimensions is None
+
+    def compact(self, vectors) -> np.ndarray:
+        """
+        Keep the leading dimensions of a 2D array of vectors, normalized again.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dimensions is None or self.dimensions >= vectors.shape[-1]:
+            return vectors
+        vectors = vectors[..., :self.dimensions]
+        return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+    def bytes_per_vector(self, model_dimensions: int) -> int:
+        """
+        Size of a stored vector of a model.
+        """
+        return min(self.dimensions or model_dimensions, model_dimensions) * COMPONENT_BYTES
+
+    def __repr__(self) -> str:
+        return f"VectorCodec(dimensions={self.dimensions})"
@@ -1,36 +1,226 @@
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, Optional
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_text_splitters import SentenceTransformersTokenTextSplitter
 from loguru import logger
 
+DEFAULT_TOKENIZER_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
 
 class DocumentChunker:
     """
     This class is responsible for chunking documents into smaller pieces.
     """
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100, stream_window: int = 8,
+                 anchor_pages: bool = True):
+        """
+        :param anchor_pages: Split every page on its own in chunk_pages, see there.
+        """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.anchor_pages = anchor_pages
+        # Number of characters buffered (in multiples of chunk_size) before a streaming split
+        self.stream_window = chunk_size * stream_window
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             separators=["\n\n", "\n", ".", " "],
         )
-        self.token_splitter = SentenceTransformersTokenTextSplitter(
-            chunk_size=384,
-            chunk_overlap=0,
-        )
+        self._token_splitter = None
+        self._lock = threading.Lock()
         logger.info(
             f"DocumentChunker initialized with chunk_size: {self.chunk_size}, chunk_overlap: {self.chunk_overlap}")
 
+    @property
+    def token_splitter(self) -> SentenceTransformersTokenTextSplitter:
+        # Loading the tokenizer model is slow, only do it on first use
+        with self._lock:
+            if self._token_splitter is None:
+                self._token_splitter = SentenceTransformersTokenTextSplitter(
+                    chunk_size=384,
+                    chunk_overlap=0,
+                )
+            return self._token_splitter
+
     def chunk_text(self, text: str) -> list:
         """
         Chunk the input text into smaller pieces.
         :param text: The input text to be chunked.
         :return: A list of chunked texts.
         """
-        chunks = self.text_splitter.split_text(text)
+        return self._token_split(text, self.text_splitter.split_text(text))
+
+    def chunk_pages(self, pages: Iterable[str], stats: Optional[dict] = None) -> Iterator[str]:
+        """
+        Chunk a stream of pages incrementally.
+
+        With anchor_pages, every page is split on its own, prefixed with the last chunk_overlap characters
+        of the previous page so the overlap survives the page break. Chunk boundaries restart at each page,
+        so an edit only changes the chunks of its page, and of the next one when it reaches the carried tail.
+        A revised file keeps the chunks, and their content-hash ids, of the other pages.
+        Otherwise pages are appended to a bounded buffer which is split once it grows past the stream
+        window. Every chunk except the last is emitted, the last one is carried over so the next split
+        starts from it and keeps the overlap across page boundaries.
+        :param pages: An iterable of page texts, in document order.
+        :param stats: Optional dict whose "tokens" entry is incremented by the tokens of every chunk.
+        :return: An iterator over the chunked texts.
+        """
+        if self.anchor_pages:
+            tail = ""
+            for page in pages:
+                if not page:
+                    continue
+                text = f"{tail}\n{page}" if tail else page
+                chunks = self.text_splitter.split_text(text)
+                yield from self._token_split(text, chunks, stats)
+                tail = self._overlap_tail(chunks[-1]) if chunks else ""
+            return
+
+        buffer = ""
+        for page in pages:
+            if not page:
+                continue
+            buffer = f"{buffer}\n{page}" if buffer else page
+            if len(buffer) < self.stream_window:
+                continue
+
+            chunks = self.text_splitter.split_text(buffer)
+            if len(chunks) < 2:
+                continue
+            yield from self._token_split(buffer, chunks[:-1], stats)
+            buffer = chunks[-1]
+
+        if buffer:
+            yield from self._token_split(buffer, self.text_splitter.split_text(buffer), stats)
+
+    def _overlap_tail(self, chunk: str) -> str:
+        """
+        The end of a chunk carried over to the next page, at most chunk_overlap characters starting on a word.
+        """
+        start = len(chunk) - self.chunk_overlap
+        if start <= 0:
+            return chunk
+        while start < len(chunk) and not chunk[start - 1].isspace():
+            start += 1
+        return chunk[start:].strip()
+
+    def _token_split(self, text: str, chunks: list, stats: Optional[dict] = None) -> list:
+        """
+        Split character chunks of a text so none exceeds the tokenizer's token budget.
+        """
         token_split_chunks = []
         for chunk in chunks:
             token_split_chunks.extend(self.token_splitter.split_text(chunk))
+            if stats is not None:
+                # Without special tokens, as TokenAwareChunker counts them
+                stats["tokens"] = stats.get("tokens", 0) + len(
+                    self.token_splitter.tokenizer.encode(chunk, add_special_tokens=False, verbose=False)
+                )
+        return token_split_chunks
+
+
+class TokenAwareChunker(DocumentChunker):
+    """
+    Single-pass variant of DocumentChunker producing the same chunks.
+
+    Instead of re-tokenizing every character chunk, the text covered by the chunks is tokenized once
+    with offset mapping. Each chunk is then mapped to its token span by binary search on the offsets
+    and cut into windows of the token budget. A chunk is only tokenized on its own when one of its
+    boundaries falls inside a pre-tokenized word, where the shared tokenization could differ.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100, stream_window: int = 8,
+                 anchor_pages: bool = True, model_name: str = DEFAULT_TOKENIZER_MODEL,
+                 tokens_per_chunk: int = 384):
+        """
+        :param tokens_per_chunk: Token budget per chunk, 384 is the max sequence length of the default model
+            which SentenceTransformersTokenTextSplitter uses as its budget.
+        """
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, stream_window=stream_window,
+                         anchor_pages=anchor_pages)
+        self.model_name = model_name
+        self.tokens_per_chunk = tokens_per_chunk
+        self._tokenizer = None
+
+    @property
+    def tokenizer(self):
+        # Loading the tokenizer is slow, only do it on first use
+        with self._lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            return self._tokenizer
+
+    def _token_split(self, text: str, chunks: list, stats: Optional[dict] = None) -> list:
+        spans = self._locate(text, chunks)
+        located = [span for span in spans if span[0] >= 0]
+        if not located:
+            return super()._token_split(text, chunks, stats)
+        span_start = min(start for start, _ in located)
+        span_end = max(end for _, end in located)
+
+        # Tokenize the covered text once
+        encoding = self.tokenizer(text[span_start:span_end], add_special_tokens=False,
+                                  return_offsets_mapping=True, verbose=False)
+        input_ids = encoding["input_ids"]
+        token_starts = [start + span_start for start, _ in encoding["offset_mapping"]]
+        token_ends = [end + span_start for _, end in encoding["offset_mapping"]]
+
+        token_split_chunks = []
+        for chunk, (start, end) in zip(chunks, spans):
+            if start < 0 or not (self._is_boundary(text, start) and self._is_boundary(text, end)):
+                ids = self.tokenizer(chunk, add_special_tokens=False, verbose=False)["input_ids"]
+            else:
+                first = bisect_left(token_starts, start)
+                last = bisect_right(token_ends, end)
+                ids = input_ids[first:last]
+            token_split_chunks.extend(self._decode_windows(ids))
+            if stats is not None:
+                stats["tokens"] = stats.get("tokens", 0) + len(ids)
         return token_split_chunks
+
+    def _decode_windows(self, ids: list) -> list:
+        step = self.tokens_per_chunk
+        return [self.tokenizer.decode(ids[start:start + step]) for start in range(0, len(ids), step)]
+
+    def _locate(self, text: str, chunks: list) -> list:
+        """
+        Find the character span of each chunk in the text, the same way the splitter computes start indexes.
+        Chunks that cannot be found get a start of -1.
+        """
+        spans = []
+        index = 0
+        previous_length = 0
+        for chunk in chunks:
+            offset = index + previous_length - self.chunk_overlap
+            found = text.find(chunk, max(0, offset))
+            if found < 0:
+                spans.append((-1, -1))
+                continue
+            index = found
+            previous_length = len(chunk)
+            spans.append((found, found + len(chunk)))
+        return spans
+
+    @staticmethod
+    def _is_boundary(text: str, position: int) -> bool:
+        """
+        Whether the tokenizer never merges the characters on both sides of a position into one word.
+        """
+        if position <= 0 or position >= len(text):
+            return True
+        before, after = text[position - 1], text[position]
+        return before.isspace() or after.isspace() or _is_punctuation(before) or _is_punctuation(after)
+
+
+def _is_punctuation(char: str) -> bool:
+    # Same definition as the BERT pre-tokenizer: ASCII symbols and Unicode punctuation categories
+    code = ord(char)
+    if 33 <= code <= 47 or 58 <= code <= 64 or 91 <= code <= 96 or 123 <= code <= 126:
+        return True
+    return unicodedata.category(char).startswith("P")
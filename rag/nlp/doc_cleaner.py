@@ -1,25 +1,31 @@
+import math
+import multiprocessing
+import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional, Union
 
-import nltk
 from loguru import logger
-from nltk import sent_tokenize, word_tokenize
 
-# Download required NLTK resources
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+from rag.nlp.tokenizers import Tokenizer, get_tokenizer
 
 
 class DocumentCleaner:
-    def __init__(self, preserve_context=True):
+    def __init__(self, preserve_context=True, tokenizer: Union[str, Tokenizer] = "regex"):
         """
         Initialize document cleaner optimized for Indonesian RAG systems
 
         Args:
             preserve_context: If True, preserves important contextual information
+            tokenizer: Sentence/word tokenizer backend, "regex" (default) or "nltk", or a Tokenizer instance
         """
         self.preserve_context = preserve_context
+        self.tokenizer = get_tokenizer(tokenizer)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_workers = 0
+        self._lock = threading.Lock()
 
         # Indonesian stopwords yang aman untuk dihapus (tidak menghilangkan konteks penting)
         # Mengurangi daftar stopwords untuk preservasi konteks
@@ -134,11 +140,11 @@ class DocumentCleaner:
         if not self.preserve_context:
             return text
 
-        sentences = sent_tokenize(text)
+        sentences = self.tokenizer.sent_tokenize(text)
         cleaned_sentences = []
 
         for sentence in sentences:
-            words = word_tokenize(sentence.lower())
+            words = self.tokenizer.word_tokenize(sentence.lower())
 
             # Only remove safe stopwords, keep contextual ones
             filtered_words = []
@@ -227,3 +233,168 @@ class DocumentCleaner:
             return self.aggressive_clean(text)
         else:
             raise ValueError("Level must be 'minimal', 'standard', or 'aggressive'")
+
+    def clean_batch(self, texts: list, level: str = "standard", workers: Optional[int] = None,
+                    chunksize: Optional[int] = None) -> list:
+        """
+        Clean many texts (pages or documents) across a process pool
+
+        Args:
+            texts: Texts to clean
+            level: "minimal", "standard", or "aggressive"
+            workers: Number of worker processes, defaults to the CPU count. 1 cleans in this process
+            chunksize: Texts sent to a worker per task, defaults to spreading the batch in about 4 tasks
+                per worker so the pickling cost is amortized
+
+        Returns:
+            Cleaned texts, in the same order as the input
+        """
+        if level not in ("minimal", "standard", "aggressive"):
+            raise ValueError("Level must be 'minimal', 'standard', or 'aggressive'")
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(texts) <= 1:
+            return [self.clean_document(text, level) for text in texts]
+
+        chunksize = chunksize or max(1, math.ceil(len(texts) / (workers * 4)))
+        executor = self._get_executor(workers)
+        return list(executor.map(partial(_clean_in_worker, level=level), texts, chunksize=chunksize))
+
+    def _get_executor(self, workers: int) -> ProcessPoolExecutor:
+        # The pool is created lazily and kept for the following batches, each worker builds its own cleaner once
+        with self._lock:
+            if self._executor is None or self._executor_workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                tokenizer = self.tokenizer.name if self.tokenizer.name else self.tokenizer
+                # Spawned, a fork of the threaded server could inherit locks held by its other threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_clean_worker,
+                    initargs=(type(self), self.preserve_context, tokenizer),
+                )
+                self._executor_workers = workers
+            return self._executor
+
+    def close(self):
+        """Shut down the worker pool used by clean_batch"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+                self._executor_workers = 0
+
+
+_worker_cleaner: Optional[DocumentCleaner] = None
+
+
+def _init_clean_worker(cleaner_class, preserve_context, tokenizer):
+    """Build the cleaner of a clean_batch worker process"""
+    global _worker_cleaner
+    _worker_cleaner = cleaner_class(preserve_context=preserve_context, tokenizer=tokenizer)
+
+
+def _clean_in_worker(text: str, level: str) -> str:
+    return _worker_cleaner.clean_document(text, level)
+
+
+class CompiledDocumentCleaner(DocumentCleaner):
+    """
+    Fast path of DocumentCleaner producing byte-identical output.
+
+    Every regex is compiled once at construction, the per-character replace passes become
+    str.translate tables, and the header/footer patterns and the abbreviations are each merged
+    into a single alternation so every line and the text are scanned once.
+    """
+    # Literal replaced by normalize_unicode (its apostrophe replacements), kept for identical output
+    _APOSTROPHE_LITERAL = ', "\'").replace('
+
+    def __init__(self, preserve_context=True, tokenizer: Union[str, Tokenizer] = "regex"):
+        super().__init__(preserve_context=preserve_context, tokenizer=tokenizer)
+
+        self._dash_table = str.maketrans({'–': '-', '—': '-'})
+        self._zero_width_table = str.maketrans({'\u200b': None, '\u200c': None, '\u200d': None, '\ufeff': None})
+        self._special_characters_table = str.maketrans(
+            {char: ' ' for char in ['*', '\\', '|', '#', '$', '%', '^', '&', '~', '`']}
+        )
+
+        self._header_footer_re = re.compile(
+            r'^\s*(?:page\s+\d+|\d+|confidential|draft|copyright.*|all rights reserved.*|-\s*\d+\s*-)\s*$',
+            re.IGNORECASE
+        )
+
+        self._email_re = re.compile(r'(\w+)\s*\.\s*(\w+)\s*@\s*(\w+)\s*\.\s*(\w+)\s*\.\s*(\w+)')
+        self._phone_re = re.compile(r'(\+?\s*\d{2,3})\s*(\d{3,4})\s*-?\s*(\d{4,5})\s*-?\s*(\d{4})')
+        self._academic_code_re = re.compile(r'([A-Z]+)\s*(\d+)')
+
+        self._spaces_tabs_re = re.compile(r'[ \t]+')
+        self._blank_lines_re = re.compile(r'\n\s*\n')
+        self._whitespace_re = re.compile(r'\s+')
+
+        self._abbreviations = {
+            'dr': 'doktor',
+            'prof': 'profesor',
+            'kp': 'kerja praktik',
+            'mhs': 'mahasiswa',
+            'dgn': 'dengan',
+            'utk': 'untuk',
+            'yg': 'yang',
+            'tsb': 'tersebut',
+            'dll': 'dan lain lain'
+        }
+        self._abbreviation_re = re.compile(
+            r'\b(?:' + '|'.join(self._abbreviations) + r')\b', re.IGNORECASE
+        )
+        # Case-insensitive matching also accepts a few non-ASCII letters, resolve those one pattern at a time
+        self._abbreviation_patterns = [
+            (re.compile(abbrev, re.IGNORECASE), full_form) for abbrev, full_form in self._abbreviations.items()
+        ]
+
+    def normalize_unicode(self, text: str) -> str:
+        text = text.translate(self._dash_table)
+        if self._APOSTROPHE_LITERAL in text:
+            # A single pass like the baseline, a second one could match the literal the first one formed
+            text = text.replace(self._APOSTROPHE_LITERAL, "'")
+        return text.translate(self._zero_width_table)
+
+    def remove_headers_footers(self, text: str) -> str:
+        match = self._header_footer_re.match
+        return '\n'.join(
+            line for line in text.split('\n')
+            if (stripped := line.strip()) and not match(stripped)
+        )
+
+    def preserve_important_patterns(self, text: str) -> str:
+        # Every email match contains an '@', scanning for one is much cheaper than running the pattern
+        if '@' in text:
+            text = self._email_re.sub(r'\1.\2@\3.\4.\5', text)
+        text = self._phone_re.sub(r'\1 \2-\3-\4', text)
+        text = self._academic_code_re.sub(r'\1\2', text)
+        return text
+
+    def clean_special_characters(self, text: str) -> str:
+        text = text.translate(self._special_characters_table)
+        text = self._spaces_tabs_re.sub(' ', text)
+        text = self._blank_lines_re.sub('\n\n', text)
+        return text.strip()
+
+    def normalize_indonesian_text(self, text: str) -> str:
+        return self._abbreviation_re.sub(self._expand_abbreviation, text)
+
+    def _expand_abbreviation(self, match: re.Match) -> str:
+        abbrev = match.group(0)
+        full_form = self._abbreviations.get(abbrev.lower())
+        if full_form is not None:
+            return full_form
+        for pattern, full_form in self._abbreviation_patterns:
+            if pattern.fullmatch(abbrev):
+                return full_form
+        return abbrev
+
+    def minimal_clean(self, text: str) -> str:
+        text = self.normalize_unicode(text)
+        text = self.preserve_important_patterns(text)
+        text = self.remove_headers_footers(text)
+        text = self.clean_special_characters(text)
+        text = self.normalize_indonesian_text(text)
+        return self._whitespace_re.sub(' ', text).strip()
@@ -0,0 +1,178 @@
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Union
+
+from loguru import logger
+
+# Abbreviations that end with a period without ending the sentence
+# Ordinary words ('ibu', 'an', 'hal') are left out, they often end a sentence
+INDONESIAN_ABBREVIATIONS = frozenset({
+    'a.n', 'bpk', 'dkk', 'dll', 'dr', 'drs', 'dsb', 'dst', 'ir', 'jl', 'jln', 'kab', 'kec', 'kel', 'kp',
+    'lamp', 'mhs', 'no', 'nom', 'ny', 'pb', 'prof', 'prov', 'sdr', 'sdri', 'st', 'tgl', 'tn', 'tsb', 'u.p',
+    'ybs', 'yth', 'etc', 'e.g', 'i.e', 'vs', 'mr', 'mrs', 'ms', 'jr', 'sr',
+})
+
+
+class Tokenizer(ABC):
+    """
+    Sentence and word tokenizer backend used by DocumentCleaner.
+    """
+    name = ""
+
+    @abstractmethod
+    def sent_tokenize(self, text: str) -> list:
+        """Split a text into sentences."""
+        pass
+
+    @abstractmethod
+    def word_tokenize(self, text: str) -> list:
+        """Split a sentence into words and punctuation."""
+        pass
+
+
+class RegexTokenizer(Tokenizer):
+    """
+    Regex-based tokenizer for Indonesian text, modelled on the NLTK punkt and Treebank tokenizers.
+
+    Sentences end at '.', '?' or '!' followed by whitespace, except after known abbreviations, initials,
+    dotted abbreviations (s.pd.) and enumeration numbers followed by a lowercase word. Words are split
+    with the Treebank punctuation rules, without the English contraction handling.
+    """
+    name = "regex"
+
+    _sentence_end_re = re.compile(r'(\.{2,}|[.?!])(["\')\]]*)\s+(?=\S)')
+    # The rules of NLTKWordTokenizer (NLTK 3.9+) in the same order, without the English clitics
+    _starting_quotes = (
+        (re.compile(r'([«“‘„]|`+)'), r' \1 '),
+        (re.compile(r'^"'), r'``'),
+        (re.compile(r'(``)'), r' \1 '),
+        (re.compile(r'([ (\[{<])("|\'{2})'), r'\1 `` '),
+        (re.compile(r"(?i)(?<!\w)(')(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)"), r'\1 '),
+    )
+    _punctuation = (
+        (re.compile(r'([^.])(\.)([\]){}>"\'»”’ ]*)\s*$'), r'\1 \2 \3 '),
+        (re.compile(r'([:,])([^\d])'), r' \1 \2'),
+        (re.compile(r'([:,])$'), r' \1 '),
+        (re.compile(r'\.{2,}'), r' \g<0> '),
+        (re.compile(r'[;@#$%&]'), r' \g<0> '),
+        (re.compile(r'[\u2012-\u2015]'), r' \g<0> '),
+        (re.compile(r'([^.])(\.)([\]){}>"\']*)\s*$'), r'\1 \2\3 '),
+        (re.compile(r'[?!]'), r' \g<0> '),
+        (re.compile(r"([^'])' "), r"\1 ' "),
+        (re.compile(r'[*]'), r' \g<0> '),
+        (re.compile(r'[\]\[(){}<>]'), r' \g<0> '),
+        (re.compile(r'--'), r' -- '),
+    )
+    _ending_quotes = (
+        (re.compile(r'([»”’])'), r' \1 '),
+        (re.compile(r"''"), r" '' "),
+        (re.compile(r'"'), r" '' "),
+        (re.compile(r"([^' ])(') "), r"\1 \2 "),
+    )
+
+    def sent_tokenize(self, text: str) -> list:
+        sentences = []
+        start = 0
+        for match in self._sentence_end_re.finditer(text):
+            if self._is_sentence_end(text, match):
+                sentence = text[start:match.end(2)].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = match.end()
+        sentence = text[start:].strip()
+        if sentence:
+            sentences.append(sentence)
+        return sentences
+
+    def _is_sentence_end(self, text: str, match: re.Match) -> bool:
+        punctuation = match.group(1)
+        next_char = text[match.end()]
+        if punctuation in ('?', '!'):
+            return True
+        if len(punctuation) > 1:
+            # An ellipsis only ends the sentence when a capitalized word follows
+            return next_char.isupper()
+
+        word_start = text.rfind(' ', 0, match.start()) + 1
+        word = text[word_start:match.start()].lstrip('([{"\'').lower()
+        if not word:
+            return True
+        if word in INDONESIAN_ABBREVIATIONS:
+            return False
+        if len(word) == 1 and word.isalpha():
+            # Initial of a name
+            return False
+        if '.' in word and word.replace('.', '').isalpha():
+            # Dotted abbreviation such as s.pd or a.md
+            return False
+        if word.replace('.', '').isdigit() and not next_char.isupper():
+            # Enumeration such as "1. pendaftaran"
+            return False
+        return True
+
+    def word_tokenize(self, text: str) -> list:
+        for pattern, substitution in self._starting_quotes:
+            text = pattern.sub(substitution, text)
+        for pattern, substitution in self._punctuation:
+            text = pattern.sub(substitution, text)
+        text = f" {text} "
+        for pattern, substitution in self._ending_quotes:
+            text = pattern.sub(substitution, text)
+        return text.split()
+
+
+class NLTKTokenizer(Tokenizer):
+    """
+    Tokenizer backed by NLTK punkt. NLTK and its resources are only loaded when the backend is first used.
+    """
+    name = "nltk"
+
+    def __init__(self, download: bool = True):
+        """
+        :param download: Download the punkt resources when they are missing. Disable it on offline hosts.
+        """
+        self.download = download
+        self._nltk = None
+        self._lock = threading.Lock()
+
+    @property
+    def nltk(self):
+        with self._lock:
+            if self._nltk is None:
+                import nltk
+
+                for resource in ('punkt', 'punkt_tab'):
+                    try:
+                        nltk.data.find(f'tokenizers/{resource}')
+                    except LookupError:
+                        if not self.download:
+                            raise
+                        logger.info(f"Downloading NLTK resource '{resource}'")
+                        nltk.download(resource, quiet=True)
+                self._nltk = nltk
+            return self._nltk
+
+    def sent_tokenize(self, text: str) -> list:
+        return self.nltk.sent_tokenize(text)
+
+    def word_tokenize(self, text: str) -> list:
+        return self.nltk.word_tokenize(text)
+
+
+TOKENIZERS = {
+    RegexTokenizer.name: RegexTokenizer,
+    NLTKTokenizer.name: NLTKTokenizer,
+}
+
+
+def get_tokenizer(tokenizer: Union[str, Tokenizer] = "regex") -> Tokenizer:
+    """
+    Resolve a tokenizer backend by name, instances are returned unchanged.
+    """
+    if isinstance(tokenizer, Tokenizer):
+        return tokenizer
+    try:
+        return TOKENIZERS[tokenizer]()
+    except KeyError:
+        raise ValueError(f"Unknown tokenizer '{tokenizer}', expected one of {sorted(TOKENIZERS)}")
@@ -0,0 +1,130 @@
+import os
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+# The settings require a database server, the tests run on SQLite instead
+os.environ.setdefault("POSTGRES_SERVER", "localhost")
+os.environ.setdefault("POSTGRES_USER", "postgres")
+os.environ.setdefault("POSTGRES_DB", "rag")
+
+from app.models.collections import Collections
+from app.models.file_uploads import FileUploads  # noqa: F401
+from app.models.files import Files
+from app.models.ingestion_jobs import IngestionJobs  # noqa: F401
+from app.models.questions import Questions  # noqa: F401
+from app.pipeline.vector_archive import VectorArchive
+from app.repositories.files_repository import FilesRepository
+from app.services.files_service import FilesService
+
+
+@pytest.fixture
+def session_factory():
+    """
+    Session factory over an in-memory SQLite database, shaped like Database.session.
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    factory = sessionmaker(autoflush=False, bind=engine)
+
+    @contextmanager
+    def session():
+        session = factory()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def make_collection(session_factory):
+    def make(collection_name: str = "documents", **values) -> Collections:
+        with session_factory() as session:
+            collection = Collections(collection_name=collection_name, description="", **values)
+            session.add(collection)
+            session.commit()
+            session.refresh(collection)
+            return collection
+
+    return make
+
+
+@pytest.fixture
+def make_file(session_factory):
+    def make(collection_id: uuid.UUID, status: str = "completed", metadatas: dict = None, **values) -> Files:
+        with session_factory() as session:
+            files = Files(file_name="document.pdf", file_path=values.pop("file_path", "/nonexistent/document.pdf"),
+                          file_type="application/pdf", file_size=values.pop("file_size", 1024),
+                          collection_id=collection_id, status=status, metadatas=metadatas or {}, **values)
+            session.add(files)
+            session.commit()
+            session.refresh(files)
+            return files
+
+    return make
+
+
+class FakeChromaClient:
+    """
+    In-memory stand-in for ChromaDBHttpClient, with the calls FilesService makes.
+    """
+
+    def __init__(self):
+        self.collections: dict[str, dict] = {}
+
+    def add_chunks(self, collection_name: str, file_id: uuid.UUID, count: int, dimensions: int = 4) -> list:
+        ids = [f"{file_id}_{index:016x}" for index in range(count)]
+        self.upsert_documents(collection_name, ids, documents=[f"chunk {index}" for index in range(count)],
+                              metadatas=[{"file_id": str(file_id)} for _ in ids],
+                              embeddings=[[float(index)] * dimensions for index in range(count)])
+        return ids
+
+    def upsert_documents(self, collection_name: str, ids: list, documents: list, metadatas: list = None,
+                         embeddings: list = None):
+        collection = self.collections.setdefault(collection_name, {})
+        for index, id in enumerate(ids):
+            collection[id] = {"document": documents[index], "metadata": metadatas[index],
+                              "embedding": list(embeddings[index])}
+
+    def get_ids(self, collection_name: str, where: dict = None, ids: list = None, batch_size: int = 1000) -> list:
+        return list(self.collections.get(collection_name, {}))
+
+    def get_file_chunk_ids(self, collection_name: str, file_id, legacy_count: int = 0) -> list:
+        return [id for id, record in self.collections.get(collection_name, {}).items()
+                if record["metadata"].get("file_id") == str(file_id)]
+
+    def get_records(self, collection_name: str, ids: list, batch_size: int = 1000) -> dict:
+        records = [self.collections[collection_name][id] for id in ids]
+        return {
+            "ids": list(ids),
+            "documents": [record["document"] for record in records],
+            "metadatas": [record["metadata"] for record in records],
+            "embeddings": [record["embedding"] for record in records],
+        }
+
+    def delete_documents(self, collection_name: str, ids: list, batch_size: int = 1000):
+        for id in ids:
+            self.collections.get(collection_name, {}).pop(id, None)
+
+
+@pytest.fixture
+def chroma():
+    return FakeChromaClient()
+
+
+@pytest.fixture
+def files_service(session_factory, chroma, tmp_path):
+    service = FilesService(FilesRepository(session_factory), chromadb_client=chroma, embedding_model_name="Default")
+    service.vector_archive = VectorArchive(str(tmp_path / "archives"))
+    return service
@@ -0,0 +1,56 @@
+import pytest
+
+from app.repositories import CollectionsRepository
+
+
+@pytest.fixture
+def repository(session_factory):
+    return CollectionsRepository(session_factory)
+
+
+def test_swap_alias_points_the_collection_to_its_shadow(repository, make_collection):
+    collection = make_collection(shadow_name="documents_v2")
+
+    assert repository.swap_alias(collection.id, "documents_v2") == "documents"
+
+    swapped = repository.read_by_id(collection.id)
+    assert swapped.active_name == "documents_v2"
+    assert swapped.shadow_name is None
+    assert repository.swap_alias(collection.id, "documents_v3") is None
+
+
+def test_swap_alias_refuses_a_replaced_shadow(repository, make_collection):
+    collection = make_collection(chroma_name="documents_v2", shadow_name="documents_v4")
+
+    assert repository.swap_alias(collection.id, "documents_v3") is None
+
+    unchanged = repository.read_by_id(collection.id)
+    assert unchanged.active_name == "documents_v2"
+    assert unchanged.shadow_name == "documents_v4"
+
+
+def test_restore_after_a_reindex_rebuilds_instead_of_restoring_old_vectors(files_service, chroma, repository,
+                                                                           make_collection, make_file):
+    collection = make_collection(shadow_name="documents_v2")
+    files = make_file(collection.id)
+    chroma.add_chunks("documents", files.id, 3)
+    files_service.archive(files.id)
+    repository.swap_alias(collection.id, "documents_v2")
+
+    restored = files_service.restore(files.id)
+
+    assert restored.status == "pending"
+    assert restored.metadatas["rebuild"]["reembed"] is True
+    assert "archive" not in restored.metadatas
+    assert chroma.collections.get("documents_v2", {}) == {}
+
+
+def test_restore_rebuilds_vectors_of_another_model(files_service, chroma, make_collection, make_file):
+    collection = make_collection()
+    files = make_file(collection.id)
+    chroma.add_chunks("documents", files.id, 3)
+    files_service.archive(files.id)
+    files_service.embedding_model_name = "Default@onnx-int8"
+
+    assert files_service.restore(files.id).status == "pending"
+    assert chroma.collections["documents"] == {}
@@ -0,0 +1,144 @@
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("tokenizers")
+pytest.importorskip("transformers")
+
+import tokenizers
+import transformers
+
+from langchain_text_splitters import SentenceTransformersTokenTextSplitter, TextSplitter
+
+from rag.nlp.doc_chunking import DocumentChunker, TokenAwareChunker
+
+SENTENCES = [
+    "Peraturan ini mengatur tata cara pemungutan pajak daerah dan retribusi daerah.",
+    "Setiap wajib pajak wajib mendaftarkan diri paling lambat 30 (tiga puluh) hari kerja.",
+    "Ketentuan lebih lanjut mengenai pelaksanaan Pasal 12 diatur dengan Peraturan Menteri.",
+    "Anggaran pendapatan dan belanja daerah disusun setiap tahun oleh pemerintah daerah.",
+    "The regulation applies to every taxpayer registered before the end of the fiscal year.",
+    "Sanksi administratif berupa denda dikenakan atas keterlambatan pembayaran; lihat ayat (2).",
+    "Hak dan kewajiban warga negara dijamin oleh undang-undang yang berlaku.",
+    "Pengawasan dilakukan oleh inspektorat daerah secara berkala, sekurang-kurangnya sekali setahun.",
+]
+
+
+def make_page(index: int) -> str:
+    """
+    A page of a fixed corpus, paragraphs of rotated sentences of varying length.
+    """
+    paragraphs = []
+    for paragraph in range(2 + index % 3):
+        count = 3 + (index + paragraph) % 4
+        start = (index * 3 + paragraph) % len(SENTENCES)
+        paragraphs.append(" ".join(SENTENCES[(start + i) % len(SENTENCES)] for i in range(count)))
+    return "\n\n".join(paragraphs)
+
+
+PAGES = [make_page(index) for index in range(8)]
+
+
+@pytest.fixture(scope="module")
+def tokenizer_path(tmp_path_factory):
+    """
+    A small WordPiece tokenizer trained on the corpus, pre-tokenized and normalized like the BERT family
+    of the default chunking model, which cannot be downloaded in the tests.
+    """
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordPiece(unk_token="[UNK]"))
+    tokenizer.normalizer = tokenizers.normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.BertPreTokenizer()
+    tokenizer.decoder = tokenizers.decoders.WordPiece()
+    tokenizer.train_from_iterator(PAGES, tokenizers.trainers.WordPieceTrainer(
+        vocab_size=200, special_tokens=["[PAD]", "[UNK]", "[CLS]", "[SEP]"]))
+    tokenizer.post_processor = tokenizers.processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        special_tokens=[("[CLS]", tokenizer.token_to_id("[CLS]")), ("[SEP]", tokenizer.token_to_id("[SEP]"))],
+    )
+    path = str(tmp_path_factory.mktemp("tokenizer"))
+    transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]", pad_token="[PAD]",
+                                         cls_token="[CLS]", sep_token="[SEP]").save_pretrained(path)
+    return path
+
+
+class LocalTokenTextSplitter(SentenceTransformersTokenTextSplitter):
+    """
+    The token splitter of DocumentChunker, over a local tokenizer instead of a sentence-transformers model.
+    """
+
+    def __init__(self, tokenizer, tokens_per_chunk: int):
+        TextSplitter.__init__(self, chunk_overlap=0)
+        self.tokenizer = tokenizer
+        self.tokens_per_chunk = tokens_per_chunk
+        self.maximum_tokens_per_chunk = tokens_per_chunk
+
+
+def make_reference_chunker(tokenizer_path: str, **values) -> DocumentChunker:
+    chunker = DocumentChunker(chunk_size=values.pop("chunk_size", 300), chunk_overlap=values.pop("chunk_overlap", 60),
+                              **values)
+    chunker._token_splitter = LocalTokenTextSplitter(transformers.AutoTokenizer.from_pretrained(tokenizer_path),
+                                                     tokens_per_chunk=48)
+    return chunker
+
+
+def make_chunker(tokenizer_path: str, **values) -> TokenAwareChunker:
+    return TokenAwareChunker(chunk_size=values.pop("chunk_size", 300), chunk_overlap=values.pop("chunk_overlap", 60),
+                             model_name=tokenizer_path, tokens_per_chunk=values.pop("tokens_per_chunk", 48),
+                             **values)
+
+
+def test_anchored_pages_carry_the_overlap_across_page_breaks(tokenizer_path):
+    chunker = make_chunker(tokenizer_path)
+    first_page = list(chunker.chunk_pages(PAGES[:1]))
+    chunks = list(chunker.chunk_pages(PAGES[:2]))
+
+    tail = chunker._overlap_tail(chunker.text_splitter.split_text(PAGES[0])[-1])
+    assert tail and PAGES[0].endswith(tail)
+    expected = chunker.tokenizer.decode(chunker.tokenizer(tail, add_special_tokens=False)["input_ids"])
+    assert chunks[:len(first_page)] == first_page
+    assert chunks[len(first_page)].startswith(expected)
+
+
+def test_an_edit_keeps_the_chunks_of_the_other_pages(tokenizer_path):
+    chunker = make_chunker(tokenizer_path)
+    edited = list(PAGES)
+    edited[3] = f"Bab II mengatur ketentuan peralihan.\n\n{edited[3]}"
+
+    original, revised = list(chunker.chunk_pages(PAGES)), list(chunker.chunk_pages(edited))
+    edited_page = list(chunker.chunk_pages(edited[:4]))[len(list(chunker.chunk_pages(edited[:3]))):]
+
+    assert set(revised) - set(original) <= set(edited_page)
+    assert len(set(original) - set(revised)) <= len(edited_page)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(300, 60), (120, 30), (1000, 100)])
+def test_token_aware_chunker_matches_the_reference_on_text(tokenizer_path, chunk_size, chunk_overlap):
+    text = "\n".join(PAGES)
+    reference = make_reference_chunker(tokenizer_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunker = make_chunker(tokenizer_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    assert chunker.chunk_text(text) == reference.chunk_text(text)
+
+
+@pytest.mark.parametrize("anchor_pages", [True, False])
+def test_token_aware_chunker_matches_the_reference_on_pages(tokenizer_path, anchor_pages):
+    # A small stream window makes the streaming split carry chunks over several times
+    reference = make_reference_chunker(tokenizer_path, anchor_pages=anchor_pages, stream_window=2)
+    chunker = make_chunker(tokenizer_path, anchor_pages=anchor_pages, stream_window=2)
+    reference_stats, stats = {}, {}
+
+    chunks = list(chunker.chunk_pages(PAGES, stats=stats))
+
+    assert chunks == list(reference.chunk_pages(PAGES, stats=reference_stats))
+    assert stats == reference_stats
+
+
+def test_both_chunkers_count_tokens_without_special_tokens(tokenizer_path):
+    text = "\n".join(PAGES)
+    reference, chunker = make_reference_chunker(tokenizer_path), make_chunker(tokenizer_path)
+    chunks = chunker.text_splitter.split_text(text)
+    expected = sum(len(chunker.tokenizer(chunk, add_special_tokens=False)["input_ids"]) for chunk in chunks)
+
+    for candidate in (reference, chunker):
+        stats = {}
+        candidate._token_split(text, chunks, stats)
+        assert stats == {"tokens": expected}
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from rag.nlp.doc_cleaner import CompiledDocumentCleaner, DocumentCleaner
+
+LEVELS = ["minimal", "standard", "aggressive"]
+
+EDGE_INPUTS = [
+    "",
+    " \n\t ",
+    "Zero\u200bwidth\u200c joiners\u200d and a\ufeff byte order mark\u200b\u200b.",
+    "\ufeffPage 1\nIsi dokumen\u200b.\n- 2 -\nConfidential",
+    "Mahasiswa 'KP' menulis ‘laporan’ dan “jurnal” – bukan — draft.",
+    "Literal apostrophes: ', \"'\").replace(' and doubled ', \"'\").replace(', \"'\").replace('.",
+    "Lihat https://example.com/path?query=1&lang=id#bagian dan http://kampus.ac.id/~kp/*draft*.",
+    "Email john . doe @ mail . ugm . ac . id, telepon +62 812 3456-7890-1234, kode IF 2240.",
+    "Baris satu\r\nBaris dua\rBaris tiga\n\n\n\nBaris empat\r\n\r\n  \r\nakhir",
+    "Dr. Budi dgn mhs yg ikut KP utk tsb dll, prof. Ani dan DR ANI.",
+    "Ini adalah contoh yang sangat penting, yaitu seperti misalnya begini dan begitu.",
+    "Tanda * \\ | # $ % ^ & ~ ` harus hilang, tetapi . , ! ? : ; - ( ) [ ] / @ tetap.",
+    "Copyright 2024 Universitas\nAll rights reserved.\n12\n  draft  \nIsi halaman.",
+    "Kata İstanbul, ſtraße dan K\u212aelvin dengan dſll yg tidak biasa.",
+]
+
+# Characters the cleaning steps treat specially, mixed with ordinary words to fuzz their interplay
+FUZZ_ALPHABET = list("aAbKkpy .,;:-\n\r\t'\"*#@/\\|%") + [
+    "\u200b", "\ufeff", "–", "—", "‘", "’", "“", "”", "\u212a", "ſ",
+    "dr", "yg", "KP", "dll", "page 3", "- 4 -", "yang", "adalah", "ini", "itu", "http://a.id/x",
+    ', "\'").replace(', "IF 101", "+62 812 3456 7890",
+]
+
+
+def fuzz_inputs(count: int, seed: int = 8) -> list:
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice(FUZZ_ALPHABET) for _ in range(rnd.randint(1, 60))) for _ in range(count)]
+
+
+@pytest.fixture(scope="module", params=[True, False], ids=["preserve_context", "no_context"])
+def cleaners(request):
+    return (DocumentCleaner(preserve_context=request.param),
+            CompiledDocumentCleaner(preserve_context=request.param))
+
+
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("text", EDGE_INPUTS)
+def test_compiled_cleaner_matches_the_reference_on_edge_inputs(cleaners, level, text):
+    reference, compiled = cleaners
+
+    assert compiled.clean_document(text, level) == reference.clean_document(text, level)
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_compiled_cleaner_matches_the_reference_on_random_inputs(cleaners, level):
+    reference, compiled = cleaners
+
+    for text in fuzz_inputs(300):
+        assert compiled.clean_document(text, level) == reference.clean_document(text, level), repr(text)
+
+
+def test_clean_batch_in_worker_processes_matches_cleaning_in_process():
+    cleaner = CompiledDocumentCleaner()
+    texts = EDGE_INPUTS + fuzz_inputs(40)
+    try:
+        cleaned = cleaner.clean_batch(texts, "standard", workers=2)
+    finally:
+        cleaner.close()
+
+    assert cleaned == [cleaner.clean_document(text, "standard") for text in texts]
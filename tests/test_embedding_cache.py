@@ -0,0 +1,96 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from rag.embedding import BaseEmbeddingModel
+from rag.embedding.embedding_cache import CachedEmbedding, EmbeddingCache
+
+
+class CountingModel(BaseEmbeddingModel):
+    """
+    Embeds a text as its length and its sum of code points, recording the texts it is called with.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.encode_queries([text])[0]
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        self.calls.append(list(texts))
+        return np.array([[len(text), sum(map(ord, text))] for text in texts], dtype=np.float32)
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_keys_normalize_unicode_forms_and_whitespace_but_keep_case():
+    key = EmbeddingCache.key("Default", "Café dan  pajak\n daerah")
+
+    assert EmbeddingCache.key("Default", "  Café dan pajak daerah ") == key
+    assert EmbeddingCache.key("Default", "café dan pajak daerah") != key
+    assert EmbeddingCache.key("LinqAI", "Café dan pajak daerah") != key
+
+
+def test_memory_tier_evicts_the_least_recently_used_vector():
+    cache = EmbeddingCache(capacity=2)
+    cache.put_many(["a", "b"], [vector(1), vector(2)])
+    cache.get_many(["a"])
+
+    cache.put_many(["c"], [vector(3)])
+
+    a, b, c = cache.get_many(["a", "b", "c"])
+    assert b is None
+    np.testing.assert_array_equal(a, vector(1))
+    np.testing.assert_array_equal(c, vector(3))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_is_shared_and_promotes_hits_to_memory(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    EmbeddingCache(capacity=10, path=path).put_many(["a", "b"], [vector(1), vector(2)])
+    cache = EmbeddingCache(capacity=10, path=path)
+
+    a, missing = cache.get_many(["a", "z"])
+    cache.get_many(["a"])
+
+    np.testing.assert_array_equal(a, vector(1))
+    assert missing is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["memory_entries"] == 1
+
+
+def test_disk_tier_is_trimmed_to_its_newest_entries(tmp_path):
+    cache = EmbeddingCache(capacity=0, path=str(tmp_path / "embeddings.db"), max_disk_entries=3)
+    cache.TRIM_INTERVAL = 2
+    keys = [f"k{index}" for index in range(6)]
+
+    for key, value in zip(keys, range(6)):
+        cache.put_many([key], [vector(value)])
+
+    assert cache.get_many(keys)[:3] == [None, None, None]
+    assert cache.stats()["disk_entries"] == 3
+    assert cache.stats()["disk_evictions"] == 3
+
+
+def test_cached_embedding_only_embeds_each_missing_text_once():
+    model = CountingModel()
+    embedding = CachedEmbedding(model, "Default", EmbeddingCache(capacity=10))
+    embedding.encode_queries(["pajak"])
+
+    vectors = embedding.encode_queries(["pajak", "daerah", "daerah ", "retribusi"])
+
+    assert model.calls == [["pajak"], ["daerah", "retribusi"]]
+    np.testing.assert_array_equal(vectors, model.encode_queries(["pajak", "daerah", "daerah", "retribusi"]))
+
+
+@pytest.mark.parametrize("texts,shape", [([], (0, 0)), (["pajak"], (1, 2))])
+def test_cached_embedding_shapes_like_the_model(texts, shape):
+    embedding = CachedEmbedding(CountingModel(), "Default", EmbeddingCache(capacity=10))
+
+    assert embedding.encode_queries(texts).shape == shape
+    assert embedding.encode("pajak").shape == (2,)
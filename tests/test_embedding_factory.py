@@ -0,0 +1,130 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from rag.embedding import BaseEmbeddingModel, embedding_factory
+from rag.embedding.embedding_factory import EmbeddingFactory, ModelSpec
+from rag.embedding.embedding_scheduler import EmbeddingScheduler
+
+
+class SizedModel(BaseEmbeddingModel):
+    """
+    A model of a known size embedding every text as a vector of ones.
+    """
+    memory_mb = 0
+
+    def __init__(self, device: str = "cpu"):
+        self.device = device
+
+    def encode(self, text: str) -> np.ndarray:
+        return np.ones(2)
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        return np.ones((len(texts), 2))
+
+
+def sized(memory_mb: int) -> type:
+    return type(f"Model{memory_mb}", (SizedModel,), {"memory_mb": memory_mb})
+
+
+@pytest.fixture(autouse=True)
+def models(monkeypatch):
+    monkeypatch.setattr(embedding_factory, "MODELS", {
+        "Small": ModelSpec(sized(100), memory_mb=100, source="small"),
+        "Medium": ModelSpec(sized(150), memory_mb=150, source="medium"),
+        "Large": ModelSpec(sized(200), memory_mb=200, source="large"),
+    })
+
+
+@pytest.fixture
+def make_factory():
+    factories = []
+
+    def make(**values) -> EmbeddingFactory:
+        factories.append(EmbeddingFactory(**values))
+        return factories[-1]
+
+    yield make
+    for factory in factories:
+        factory.close()
+
+
+def resident(factory: EmbeddingFactory) -> set:
+    return {name for name, model in factory.models()["models"].items() if model["resident"]}
+
+
+def test_handles_load_their_model_on_first_use(make_factory):
+    factory = make_factory()
+    model = factory.get("Small")
+    assert resident(factory) == set()
+
+    np.testing.assert_array_equal(model.encode_queries(["a", "b"]), np.ones((2, 2)))
+
+    assert resident(factory) == {"Small"}
+    assert factory.get("Small") is model
+
+
+def test_loading_past_the_budget_evicts_the_least_recently_used_model(make_factory):
+    factory = make_factory(memory_budget_mb=300)
+    factory.get("Small").encode("a")
+    factory.get("Medium").encode("a")
+    factory.get("Small").encode("a")
+
+    factory.get("Large").encode("a")
+
+    assert resident(factory) == {"Small", "Large"}
+    assert factory.models()["used_mb"] == 300
+
+
+def test_a_model_in_use_is_not_evicted(make_factory):
+    factory = make_factory(memory_budget_mb=300)
+
+    with factory.use("Medium"):
+        with pytest.raises(MemoryError, match="No idle embedding model"):
+            factory.get("Large").encode("a")
+        assert resident(factory) == {"Medium"}
+
+
+def test_a_model_larger_than_the_budget_is_refused(make_factory):
+    factory = make_factory(memory_budget_mb=150)
+
+    with pytest.raises(MemoryError, match="more than the budget"):
+        factory.get("Large").encode("a")
+
+
+def test_evict_idle_unloads_models_unused_for_long_enough(make_factory):
+    factory = make_factory(max_batch_size=8)
+    factory.get("Small").encode("a")
+    with factory.use("Medium") as held:
+        scheduler = factory._resident["Small"].runner
+
+        assert factory.evict_idle(0) == ["Small"]
+
+        assert resident(factory) == {"Medium"}
+        assert isinstance(held, EmbeddingScheduler)
+    with pytest.raises(RuntimeError, match="stopped"):
+        scheduler.submit(["a"])
+    assert factory.evict_idle(3600) == []
+
+
+def test_models_are_torn_down_outside_the_registry_lock(make_factory, monkeypatch):
+    # Stopping a scheduler and collecting the weights is slow, get() must not wait on it
+    factory = make_factory(memory_budget_mb=300, max_batch_size=8)
+    lock_free_during_teardown = []
+
+    def collect():
+        acquired = factory._lock.acquire(blocking=False)
+        lock_free_during_teardown.append(acquired)
+        if acquired:
+            factory._lock.release()
+
+    monkeypatch.setattr(embedding_factory.gc, "collect", collect)
+    factory.get("Medium").encode("a")
+
+    factory.get("Large").encode("a")
+    factory.evict_idle(0)
+
+    assert lock_free_during_teardown == [True, True]
@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+import pytest
+
+from rag.embedding import BaseEmbeddingModel
+from rag.embedding.embedding_scheduler import EmbeddingScheduler
+
+
+class NumberModel(BaseEmbeddingModel):
+    """
+    Embeds a numeric text as the vector [n, 2n], recording the size of every forward pass.
+    """
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batch_sizes = []
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.encode_queries([text])[0]
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        if self.fail:
+            raise ValueError("model failed")
+        self.batch_sizes.append(len(texts))
+        return np.array([[float(text), 2 * float(text)] for text in texts])
+
+
+def expected(texts: List[str]) -> np.ndarray:
+    return np.array([[float(text), 2 * float(text)] for text in texts])
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(model: BaseEmbeddingModel, **values) -> EmbeddingScheduler:
+        schedulers.append(EmbeddingScheduler(model, **values))
+        return schedulers[-1]
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop(timeout=5)
+
+
+def test_concurrent_callers_get_their_own_vectors_in_order(make_scheduler):
+    model = NumberModel()
+    scheduler = make_scheduler(model, max_batch_size=16, max_wait_ms=20)
+    requests = [[str(caller * 10 + index) for index in range(1 + caller % 4)] for caller in range(40)]
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(scheduler.encode_queries, requests))
+
+    for texts, vectors in zip(requests, results):
+        np.testing.assert_array_equal(vectors, expected(texts))
+    stats = scheduler.stats()
+    assert stats["requests"] == len(requests)
+    assert stats["batches"] < len(requests)
+    assert max(model.batch_sizes) <= 16
+
+
+def test_a_request_larger_than_the_batch_runs_on_its_own(make_scheduler):
+    model = NumberModel()
+    scheduler = make_scheduler(model, max_batch_size=4)
+    texts = [str(index) for index in range(10)]
+
+    np.testing.assert_array_equal(scheduler.encode_queries(texts), expected(texts))
+    assert model.batch_sizes == [10]
+
+
+def test_a_model_error_fails_every_caller_of_the_batch(make_scheduler):
+    scheduler = make_scheduler(NumberModel(fail=True), max_wait_ms=50)
+    futures = [scheduler.submit([str(index)]) for index in range(3)]
+
+    for future in futures:
+        with pytest.raises(ValueError, match="model failed"):
+            future.result(timeout=5)
+
+
+def test_stop_refuses_new_requests(make_scheduler):
+    scheduler = make_scheduler(NumberModel())
+    scheduler.stop(timeout=5)
+
+    with pytest.raises(RuntimeError, match="stopped"):
+        scheduler.submit(["1"])
+
+
+def test_requests_racing_stop_are_answered_or_failed(make_scheduler):
+    # Every request submitted around stop must settle, none may be left waiting on the stopped thread
+    for _ in range(20):
+        scheduler = make_scheduler(NumberModel(), max_batch_size=2, max_wait_ms=1)
+        futures, submitting = [], threading.Event()
+
+        def submit():
+            for index in range(1000):
+                try:
+                    futures.append(scheduler.submit([str(index)]))
+                except RuntimeError:
+                    return
+                submitting.set()
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        submitting.wait(timeout=5)
+        scheduler.stop(timeout=5)
+        for thread in threads:
+            thread.join()
+
+        for future in futures:
+            assert future.exception(timeout=5) is None or "stopped" in str(future.exception())
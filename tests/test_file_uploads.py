@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import ConflictError
+from app.models.file_uploads import FileUploads
+from app.repositories.file_uploads_repository import FileUploadsRepository
+from app.schema.file_schema import InitiateUploadRequest
+from app.services.file_uploads_service import FileUploadsService
+
+
+@pytest.fixture
+def service(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(type(settings), "FILE_PATH", str(tmp_path))
+    yield FileUploadsService(FileUploadsRepository(session_factory), files_service=None)
+    FileUploadsService._hashers.clear()
+
+
+@pytest.fixture
+def initiate(service, make_collection):
+    collection_id = make_collection().id
+
+    def make(file_size: int = 8) -> FileUploads:
+        return service.initiate(InitiateUploadRequest(collection_id=collection_id, file_name="document.pdf",
+                                                      file_size=file_size))
+
+    return make
+
+
+def write(service: FileUploadsService, upload: FileUploads, data: bytes) -> FileUploads:
+    async def stream():
+        yield data
+
+    content_range = f"bytes {upload.received_bytes}-{upload.received_bytes + len(data) - 1}/{upload.file_size}"
+    return asyncio.run(service.write_range(upload.id, content_range, stream()))
+
+
+def backdate(session_factory, id, seconds: float):
+    with session_factory() as session:
+        session.get(FileUploads, id).updated_at = datetime.now() - timedelta(seconds=seconds)
+        session.commit()
+
+
+def test_expire_abandoned_aborts_idle_uploads_and_removes_their_part_files(service, initiate, session_factory):
+    idle, active = initiate(), initiate()
+    write(service, idle, b"idle")
+    write(service, active, b"acti")
+    backdate(session_factory, idle.id, 7200)
+
+    assert service.expire_abandoned(3600) == 1
+
+    assert service.get_by_id(idle.id).status == "aborted"
+    assert not os.path.exists(idle.part_path)
+    assert idle.id not in FileUploadsService._hashers
+    assert service.get_by_id(active.id).status == "uploading"
+    assert os.path.exists(active.part_path)
+    assert FileUploadsService._hashers[active.id][0] == 4
+
+
+def test_an_expired_upload_rejects_further_ranges(service, initiate, session_factory):
+    upload = initiate()
+    backdate(session_factory, upload.id, 7200)
+    service.expire_abandoned(3600)
+
+    with pytest.raises(ConflictError, match="aborted"):
+        write(service, upload, b"late")
+
+
+def test_expire_abandoned_drops_stale_running_hashes(service, initiate):
+    # Another process may have received the later ranges, this one only holds the outdated hash
+    upload = initiate()
+    FileUploadsService._hashers[upload.id] = (4, hashlib.sha256(b"data"), time.monotonic() - 7200)
+
+    assert service.expire_abandoned(3600) == 0
+
+    assert upload.id not in FileUploadsService._hashers
+    assert service.get_by_id(upload.id).status == "uploading"
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from app.core.exceptions import ConflictError
+
+
+def test_archive_and_restore_round_trip(files_service, chroma, make_collection, make_file):
+    collection = make_collection()
+    files = make_file(collection.id, metadatas={"chunk_count": 3})
+    chroma.add_chunks("documents", files.id, 3)
+    indexed = dict(chroma.collections["documents"])
+
+    archived = files_service.archive(files.id)
+
+    assert archived.status == "archived"
+    assert archived.metadatas["archive"]["chunks"] == 3
+    assert chroma.collections["documents"] == {}
+
+    restored = files_service.restore(files.id)
+
+    assert restored.status == "completed"
+    assert "archive" not in restored.metadatas
+    assert chroma.collections["documents"] == indexed
+    with pytest.raises(FileNotFoundError):
+        files_service.vector_archive.read(files.id)
+
+
+def test_archive_refuses_an_original_whose_duplicates_are_in_use(files_service, chroma, make_collection,
+                                                                 make_file):
+    collection = make_collection()
+    original = make_file(collection.id)
+    duplicate = make_file(collection.id, metadatas={"duplicate_of": str(original.id)})
+    chroma.add_chunks("documents", original.id, 2)
+
+    with pytest.raises(ConflictError):
+        files_service.archive(original.id)
+
+    assert files_service.archive(duplicate.id).status == "archived"
+    assert files_service.archive(original.id).status == "archived"
+    with pytest.raises(ConflictError):
+        files_service.restore(duplicate.id)
+    files_service.restore(original.id)
+    assert files_service.restore(duplicate.id).status == "completed"
+
+
+def test_concurrent_archives_of_a_file_do_not_clobber_each_other(files_service, chroma, make_collection,
+                                                                 make_file):
+    collection = make_collection()
+    files = make_file(collection.id)
+    chroma.add_chunks("documents", files.id, 50, dimensions=64)
+    records = chroma.get_records("documents", list(chroma.collections["documents"]))
+    errors = []
+
+    def write():
+        try:
+            files_service.vector_archive.write(files.id, records, files_service.embedding_signature(collection.id))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert files_service.vector_archive.read(files.id)["ids"] == records["ids"]
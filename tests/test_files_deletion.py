@@ -0,0 +1,52 @@
+import uuid
+
+
+def test_delete_removes_the_chunks_and_the_stored_object(files_service, chroma, make_collection, make_file,
+                                                         tmp_path):
+    stored = tmp_path / "object.pdf"
+    stored.write_bytes(b"%PDF")
+    collection = make_collection(shadow_name="documents_shadow")
+    files = make_file(collection.id, file_path=str(stored))
+    other = make_file(collection.id)
+    chroma.add_chunks("documents", files.id, 3)
+    chroma.add_chunks("documents_shadow", files.id, 3)
+    kept = chroma.add_chunks("documents", other.id, 2)
+
+    deleted = files_service.delete(files.id)
+
+    assert deleted.status == "deleted"
+    assert list(chroma.collections["documents"]) == kept
+    assert chroma.collections["documents_shadow"] == {}
+    assert not stored.exists()
+
+
+def test_chunks_of_an_original_outlive_it_while_a_duplicate_uses_them(files_service, chroma, make_collection,
+                                                                       make_file):
+    collection = make_collection()
+    original = make_file(collection.id)
+    duplicate = make_file(collection.id, metadatas={"duplicate_of": str(original.id)})
+    chroma.add_chunks("documents", original.id, 3)
+
+    files_service.delete(original.id)
+    assert len(chroma.collections["documents"]) == 3
+
+    files_service.delete(duplicate.id)
+    assert chroma.collections["documents"] == {}
+
+
+def test_purge_reclaims_only_orphaned_chunks(files_service, chroma, make_collection, make_file):
+    collection = make_collection()
+    live = make_file(collection.id)
+    deleted = make_file(collection.id, status="deleted")
+    live_ids = chroma.add_chunks("documents", live.id, 2)
+    chroma.add_chunks("documents", deleted.id, 2)
+    chroma.add_chunks("documents", uuid.uuid4(), 3)
+    chroma.upsert_documents("documents", ["external"], documents=["added elsewhere"], metadatas=[{}],
+                            embeddings=[[0.0] * 4])
+
+    report = files_service.purge_orphan_chunks()
+
+    assert report["scanned"] == 8
+    assert report["reclaimed"] == 5
+    assert report["collections"]["documents"] == {"scanned": 8, "reclaimed": 5}
+    assert sorted(chroma.collections["documents"]) == sorted(live_ids + ["external"])
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.ingestion_jobs import IngestionJobs
+from app.repositories.ingestion_jobs_repository import IngestionJobsRepository
+
+
+@pytest.fixture
+def repository(session_factory):
+    return IngestionJobsRepository(session_factory)
+
+
+@pytest.fixture
+def file_id(make_collection, make_file):
+    return make_file(make_collection().id, status="pending").id
+
+
+def read(session_factory, id) -> IngestionJobs:
+    with session_factory() as session:
+        return session.get(IngestionJobs, id)
+
+
+def expire_lease(session_factory, id):
+    with session_factory() as session:
+        session.get(IngestionJobs, id).lease_expires_at = datetime.now() - timedelta(seconds=1)
+        session.commit()
+
+
+def test_claim_leases_the_shortest_job_first(repository, file_id):
+    large = repository.enqueue(file_id, priority=2048)
+    small = repository.enqueue(file_id, priority=16)
+
+    job = repository.claim("worker-1", lease_seconds=60)
+
+    assert job.id == small.id
+    assert job.status == "running"
+    assert job.locked_by == "worker-1"
+    assert job.attempts == 1
+    assert job.lease_expires_at > datetime.now() + timedelta(seconds=50)
+    assert repository.claim("worker-2", lease_seconds=60).id == large.id
+    assert repository.claim("worker-3", lease_seconds=60) is None
+
+
+def test_claim_skips_jobs_not_available_yet(repository, session_factory, file_id):
+    job = repository.enqueue(file_id)
+    with session_factory() as session:
+        session.get(IngestionJobs, job.id).available_at = datetime.now() + timedelta(minutes=5)
+        session.commit()
+
+    assert repository.claim("worker-1", lease_seconds=60) is None
+
+
+def test_heartbeat_only_extends_the_lease_of_its_holder(repository, session_factory, file_id):
+    job = repository.enqueue(file_id)
+    repository.claim("worker-1", lease_seconds=1)
+
+    assert repository.heartbeat(job.id, "worker-2", lease_seconds=600) is False
+    assert repository.heartbeat(job.id, "worker-1", lease_seconds=600) is True
+    assert read(session_factory, job.id).lease_expires_at > datetime.now() + timedelta(seconds=500)
+
+
+def test_retry_requeues_after_the_delay(repository, session_factory, file_id):
+    job = repository.enqueue(file_id)
+    repository.claim("worker-1", lease_seconds=60)
+
+    assert repository.retry(job.id, "worker-1", "Chroma unavailable", delay_seconds=300) is True
+
+    retried = read(session_factory, job.id)
+    assert retried.status == "queued"
+    assert retried.last_error == "Chroma unavailable"
+    assert retried.locked_by is None and retried.lease_expires_at is None
+    assert retried.available_at > datetime.now() + timedelta(seconds=200)
+    assert repository.claim("worker-1", lease_seconds=60) is None
+
+    with session_factory() as session:
+        session.get(IngestionJobs, job.id).available_at = datetime.now()
+        session.commit()
+    assert repository.claim("worker-1", lease_seconds=60).attempts == 2
+
+
+def test_complete_and_fail_release_the_lease(repository, session_factory, file_id):
+    completed = repository.enqueue(file_id)
+    failed = repository.enqueue(file_id)
+    repository.claim("worker-1", lease_seconds=60)
+    repository.claim("worker-2", lease_seconds=60)
+
+    assert repository.complete(completed.id, "worker-1") is True
+    assert repository.fail(failed.id, "worker-2", "Not a PDF") is True
+
+    assert read(session_factory, completed.id).status == "completed"
+    failed = read(session_factory, failed.id)
+    assert failed.status == "failed"
+    assert failed.last_error == "Not a PDF"
+    assert failed.locked_by is None
+    assert repository.count_active() == 0
+
+
+def test_a_previous_owner_cannot_finish_a_reclaimed_job(repository, session_factory, file_id):
+    job = repository.enqueue(file_id)
+    repository.claim("worker-1", lease_seconds=60)
+    expire_lease(session_factory, job.id)
+    repository.recover_expired()
+    repository.claim("worker-2", lease_seconds=60)
+
+    assert repository.complete(job.id, "worker-1") is False
+    assert repository.retry(job.id, "worker-1", "Timed out", delay_seconds=0) is False
+    assert repository.fail(job.id, "worker-1", "Timed out") is False
+
+    reclaimed = read(session_factory, job.id)
+    assert reclaimed.status == "running"
+    assert reclaimed.locked_by == "worker-2"
+    assert repository.complete(job.id, "worker-2") is True
+    assert read(session_factory, job.id).status == "completed"
+
+
+def test_recover_expired_requeues_or_fails_by_attempts_left(repository, session_factory, make_collection,
+                                                             make_file):
+    collection_id = make_collection().id
+    retried_file = make_file(collection_id, status="processing").id
+    exhausted_file = make_file(collection_id, status="processing").id
+    retried = repository.enqueue(retried_file, max_attempts=3)
+    exhausted = repository.enqueue(exhausted_file, max_attempts=1)
+    live = repository.enqueue(retried_file)
+    for worker_id in ("worker-1", "worker-2", "worker-3"):
+        repository.claim(worker_id, lease_seconds=60)
+    expire_lease(session_factory, retried.id)
+    expire_lease(session_factory, exhausted.id)
+
+    requeued, failed = repository.recover_expired()
+
+    assert requeued == [retried_file]
+    assert failed == [exhausted_file]
+    assert read(session_factory, retried.id).status == "queued"
+    assert read(session_factory, retried.id).last_error.startswith("Lease held by worker-")
+    assert read(session_factory, exhausted.id).status == "failed"
+    assert read(session_factory, live.id).status == "running"
+    assert repository.count_active() == 2
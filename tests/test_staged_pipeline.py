@@ -0,0 +1,72 @@
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pypdf")
+
+from app.models.files import Files
+from app.pipeline.pipeline_service import IngestionRun, PipelineService
+from app.pipeline.staged_pipeline import StagedPipeline
+
+CLEAN_SECONDS = 0.1
+
+
+class PageChunker:
+    """
+    A chunker making one chunk of every page.
+    """
+
+    def chunk_pages(self, pages, stats: dict = None):
+        for page in pages:
+            yield page
+
+
+class SlowCleaningService(PipelineService):
+    """
+    The chunk stage of PipelineService over in-memory pages, with a slow cleaner and no vector store.
+    """
+
+    def __init__(self, pages: list):
+        self.pages = pages
+        self.doc_chunker = PageChunker()
+        self.runs = []
+
+    def begin(self, files: Files, collection_name: str = None) -> IngestionRun:
+        run = IngestionRun(files, "documents", existing_ids=set())
+        self.runs.append(run)
+        return run
+
+    def extract_pages(self, run: IngestionRun):
+        for page in self.pages:
+            run.progress["page_count"] += 1
+            yield page
+
+    def _clean_window(self, window: list) -> list:
+        time.sleep(CLEAN_SECONDS)
+        return window
+
+    def embed_batch(self, run: IngestionRun, batch: list):
+        return np.zeros((len(batch), 4))
+
+    def write_batch(self, run: IngestionRun, batch: list, embeddings):
+        pass
+
+    def finish(self, run: IngestionRun):
+        pass
+
+
+def test_chunk_time_excludes_the_wait_for_the_clean_workers():
+    service = SlowCleaningService([f"Halaman {index}" for index in range(6)])
+    pipeline = StagedPipeline(lambda: service, clean_workers=1, chunk_workers=1, window_pages=1,
+                              poll_interval_seconds=0.05)
+    try:
+        progress = pipeline.submit(Files(id=uuid.uuid4(), file_name="document.pdf")).result(timeout=10)
+    finally:
+        pipeline.stop()
+
+    stages = service.runs[0].metrics.as_dict()
+    assert progress["chunk_count"] == 6
+    assert stages["clean"]["wall_seconds"] >= 6 * CLEAN_SECONDS
+    assert stages["chunk"]["wall_seconds"] < CLEAN_SECONDS
@@ -0,0 +1,84 @@
+import pytest
+
+from rag.nlp.tokenizers import NLTKTokenizer, RegexTokenizer, Tokenizer, get_tokenizer
+
+# Tokens of nltk.word_tokenize (NLTKWordTokenizer, NLTK 3.10) on single sentences
+GOLDEN_WORDS = [
+    ('Pendaftaran dibuka tanggal 10 Juni 2025, pukul 08.00 WIB.',
+     ['Pendaftaran', 'dibuka', 'tanggal', '10', 'Juni', '2025', ',', 'pukul', '08.00', 'WIB', '.']),
+    ('Calon peserta didik (CPD) wajib mengunggah dokumen: KK, akta kelahiran, dan rapor.',
+     ['Calon', 'peserta', 'didik', '(', 'CPD', ')', 'wajib', 'mengunggah', 'dokumen', ':', 'KK', ',', 'akta',
+      'kelahiran', ',', 'dan', 'rapor', '.']),
+    ('Biaya pendaftaran Rp 150.000,- dibayar melalui bank; bukti disimpan!',
+     ['Biaya', 'pendaftaran', 'Rp', '150.000', ',', '-', 'dibayar', 'melalui', 'bank', ';', 'bukti', 'disimpan', '!']),
+    ('Apakah nilai rapor semester 1-5 digunakan?',
+     ['Apakah', 'nilai', 'rapor', 'semester', '1-5', 'digunakan', '?']),
+    ('Informasi lebih lanjut: https://spmb.jatimprov.go.id atau email info@dindik.jatimprov.go.id.',
+     ['Informasi', 'lebih', 'lanjut', ':', 'https', ':', '//spmb.jatimprov.go.id', 'atau', 'email', 'info', '@',
+      'dindik.jatimprov.go.id', '.']),
+    ('Jalur afirmasi [15%] dan jalur prestasi {20%} ditetapkan oleh Dinas...',
+     ['Jalur', 'afirmasi', '[', '15', '%', ']', 'dan', 'jalur', 'prestasi', '{', '20', '%', '}', 'ditetapkan', 'oleh',
+      'Dinas', '...']),
+    ('Kuota "zonasi" adalah 50 persen -- sisanya untuk jalur lain.',
+     ['Kuota', '``', 'zonasi', "''", 'adalah', '50', 'persen', '--', 'sisanya', 'untuk', 'jalur', 'lain', '.']),
+    ('Nilai akhir = (rata-rata rapor x 60%) + (nilai tes x 40%).',
+     ['Nilai', 'akhir', '=', '(', 'rata-rata', 'rapor', 'x', '60', '%', ')', '+', '(', 'nilai', 'tes', 'x', '40', '%',
+      ')', '.']),
+    ("Siswa 'berprestasi' mendapat poin tambahan.",
+     ['Siswa', "'", 'berprestasi', "'", 'mendapat', 'poin', 'tambahan', '.']),
+    ('Lihat Lampiran 2 dan Pasal 12 ayat (3) huruf a.',
+     ['Lihat', 'Lampiran', '2', 'dan', 'Pasal', '12', 'ayat', '(', '3', ')', 'huruf', 'a', '.']),
+    ('Sekolah #1 & sekolah #2 menerima 30 siswa/rombel.',
+     ['Sekolah', '#', '1', '&', 'sekolah', '#', '2', 'menerima', '30', 'siswa/rombel', '.']),
+    ('“Ketentuan ini berlaku,” kata Kepala Dinas.',
+     ['“', 'Ketentuan', 'ini', 'berlaku', ',', '”', 'kata', 'Kepala', 'Dinas', '.']),
+    ('Jadwal: 1) verifikasi, 2) seleksi, 3) pengumuman.',
+     ['Jadwal', ':', '1', ')', 'verifikasi', ',', '2', ')', 'seleksi', ',', '3', ')', 'pengumuman', '.']),
+    ('Nomor telepon +62 31 8290000 dapat dihubungi pada hari kerja.',
+     ['Nomor', 'telepon', '+62', '31', '8290000', 'dapat', 'dihubungi', 'pada', 'hari', 'kerja', '.']),
+    ('Kepala sekolah – bukan komite — menetapkan kuota.',
+     ['Kepala', 'sekolah', '–', 'bukan', 'komite', '—', 'menetapkan', 'kuota', '.']),
+    ('Nilai *wajib* dilampirkan, lihat catatan (a)...',
+     ['Nilai', '*', 'wajib', '*', 'dilampirkan', ',', 'lihat', 'catatan', '(', 'a', ')', '...']),
+    ('Dokumen "asli" dan \'salinan\' diserahkan ke panitia.',
+     ['Dokumen', '``', 'asli', "''", 'dan', "'", 'salinan', "'", 'diserahkan', 'ke', 'panitia', '.']),
+]
+
+GOLDEN_SENTENCES = [
+    ("Pendaftaran dibuka oleh Dr. Budi dan Prof. Ani. Peserta wajib hadir.",
+     ["Pendaftaran dibuka oleh Dr. Budi dan Prof. Ani.", "Peserta wajib hadir."]),
+    ("Surat ditujukan Yth. Bpk. Kepala Dinas di Jl. Pahlawan No. 5. Mohon segera dibalas!",
+     ["Surat ditujukan Yth. Bpk. Kepala Dinas di Jl. Pahlawan No. 5.", "Mohon segera dibalas!"]),
+    ("Syarat: 1. pendaftaran online 2. verifikasi berkas. Hasil diumumkan kemudian.",
+     ["Syarat: 1. pendaftaran online 2. verifikasi berkas.", "Hasil diumumkan kemudian."]),
+    ("Disusun oleh A. Wijaya, S.Pd. dan tim. Apakah sudah lengkap? Ya.",
+     ["Disusun oleh A. Wijaya, S.Pd. dan tim.", "Apakah sudah lengkap?", "Ya."]),
+    ("Tunggu sebentar... lalu lanjutkan. Tunggu... Selesai.",
+     ["Tunggu sebentar... lalu lanjutkan.", "Tunggu...", "Selesai."]),
+    ('Nilai akhir dihitung (lihat Lamp. 2). "Hasilnya final." Tidak ada banding.',
+     ["Nilai akhir dihitung (lihat Lamp. 2).", '"Hasilnya final."', "Tidak ada banding."]),
+    ("Dokumen disimpan oleh ibu. Kemudian diarsipkan.",
+     ["Dokumen disimpan oleh ibu.", "Kemudian diarsipkan."]),
+]
+
+
+@pytest.mark.parametrize("sentence,expected", GOLDEN_WORDS)
+def test_regex_word_tokenize_matches_nltk(sentence, expected):
+    assert RegexTokenizer().word_tokenize(sentence) == expected
+
+
+@pytest.mark.parametrize("text,expected", GOLDEN_SENTENCES)
+def test_regex_sent_tokenize_keeps_abbreviations_in_their_sentence(text, expected):
+    assert RegexTokenizer().sent_tokenize(text) == expected
+
+
+def test_get_tokenizer_resolves_backends():
+    regex = RegexTokenizer()
+
+    assert get_tokenizer(regex) is regex
+    assert isinstance(get_tokenizer("regex"), RegexTokenizer)
+    assert isinstance(get_tokenizer("nltk"), NLTKTokenizer)
+    with pytest.raises(ValueError):
+        get_tokenizer("spacy")
+    with pytest.raises(TypeError):
+        Tokenizer()